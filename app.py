@@ -1,15 +1,27 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 import os
-from utils.json_processor import JSONProcessor
-from utils.gemini_client import GeminiClient
-from utils.text_processor import TextProcessor
-from utils.cache import LRUCache
+import json
+import asyncio
+import functools
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from data.persona import get_saudacao
+from utils.cache import DEFAULT_NAMESPACE, create_cache
+from utils.semantic_cache import SemanticCache
 from utils.keyword_mapper import KeywordMapper
+from utils.index_watcher import IndexWatcher
+from utils.session_store import MAX_SESSION_ID_LENGTH, create_session_store
+from utils.startup import StartupManager
 from config import (
     EMBEDDING_MODEL, FAISS_INDEX_DIR, FAISS_JSON_INDEX_PATH, FAISS_JSON_MAPPING_PATH,
     EMBEDDING_BATCH_SIZE, RAG_CHUNK_SIZE, RAG_CHUNK_OVERLAP,
     JSON_SIMILARITY_THRESHOLD, CACHE_SIZE, SIMILARITY_THRESHOLD,
-    MAX_CHUNK_SIZE, MIN_CHUNK_SIZE, MAX_USER_MESSAGE_LENGTH, SPACY_MODEL, GEMINI_MODEL
+    MAX_CHUNK_SIZE, MIN_CHUNK_SIZE, MAX_USER_MESSAGE_LENGTH, SPACY_MODEL, GEMINI_MODEL,
+    INDEX_WATCH_INTERVAL, ADMIN_TOKEN, SEMANTIC_CACHE_ENABLED, CHAT_EXECUTOR_WORKERS, RETRIEVAL_MODE,
+    RERANKER_ENABLED, RERANKER_OVERFETCH, STARTUP_REQUEST_TIMEOUT, PRELOAD_MODE, FAISS_INDEX_MMAP,
+    FILTER_INCLUSIVE_VALUES,
+    ensure_directories
 )
 import logging
 
@@ -26,22 +38,341 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-logger.info(f"Inicializando processadores e clientes...")
-json_processor = JSONProcessor()
-gemini_client = GeminiClient()
-text_processor = TextProcessor()
-keyword_mapper = KeywordMapper()
-cache = LRUCache(CACHE_SIZE)
+ensure_directories()
+cache = create_cache(capacity=CACHE_SIZE)
+semantic_cache = SemanticCache() if SEMANTIC_CACHE_ENABLED else None
+sessions = create_session_store()
 
-conversation_history = {}
+# Trabalho de CPU das requisições assíncronas (ver chat_async e asgi.py)
+chat_executor = ThreadPoolExecutor(max_workers=CHAT_EXECUTOR_WORKERS, thread_name_prefix="chat-cpu")
+
+# Componentes pesados: carregados em paralelo pelo StartupManager e publicados em _on_startup_ready.
+# Até lá, só a página inicial, os arquivos estáticos e /healthz e /readyz respondem de imediato.
+json_processor = None
+gemini_client = None
+text_processor = None
+keyword_mapper = None
+reranker = None
+index_watcher = None
+
+def _load_json_processor():
+    from utils.json_processor import JSONProcessor
+    return JSONProcessor(mmap=FAISS_INDEX_MMAP)
+
+def _load_text_processor():
+    from utils.text_processor import TextProcessor
+    return TextProcessor()
+
+def _load_gemini_client():
+    from utils.gemini_client import GeminiClient
+    return GeminiClient()
+
+def _load_reranker():
+    from utils.reranker import Reranker
+    return Reranker()
+
+def _on_index_reload(previous, current):
+    # As respostas em cache foram geradas com o corpus anterior
+    cache.clear()
+    logger.info(f"Cache de respostas limpo após recarga do índice ({current.index.ntotal} vetores)")
+    if semantic_cache is not None:
+        changed = json_processor.changed_chunk_ids(previous, current)
+        removed = semantic_cache.invalidate_chunks(changed, include_ungrounded=True)
+        logger.info(f"{removed} respostas removidas do cache semântico ({len(changed)} chunks alterados)")
+    if reranker is not None:
+        reranker.clear()
+
+def _on_startup_ready(components):
+    global json_processor, gemini_client, text_processor, keyword_mapper, reranker, index_watcher
+    json_processor = components['json_processor']
+    gemini_client = components['gemini_client']
+    text_processor = components['text_processor']
+    keyword_mapper = components['keyword_mapper']
+    reranker = components.get('reranker')
+
+    json_processor.add_reload_listener(_on_index_reload)
+    index_watcher = IndexWatcher(json_processor)
+    # No modo pre-fork, threads do mestre não sobrevivem ao fork; cada worker
+    # inicia as suas em start_background_tasks (ver gunicorn.conf.py)
+    if not PRELOAD_MODE:
+        start_background_tasks()
+
+def start_background_tasks():
+    """Inicia as tarefas de segundo plano do processo (observador do índice)."""
+    if index_watcher is not None and INDEX_WATCH_INTERVAL:
+        index_watcher.start()
+
+startup = StartupManager()
+startup.add('json_processor', _load_json_processor)
+startup.add('text_processor', _load_text_processor)
+startup.add('keyword_mapper', KeywordMapper)
+startup.add('gemini_client', _load_gemini_client)
+if RERANKER_ENABLED:
+    startup.add('reranker', _load_reranker)
+startup.on_ready(_on_startup_ready)
+startup.start()
+
+def _requires_startup(view):
+    """Faz a rota aguardar o fim da inicialização (até STARTUP_REQUEST_TIMEOUT) ou responder 503; após uma falha, 503 na hora."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not startup.wait(STARTUP_REQUEST_TIMEOUT):
+            return _starting_response()
+        return view(*args, **kwargs)
+    return wrapper
+
+def _starting_response():
+    response = jsonify(_unavailable_body())
+    response.status_code = 503
+    if not startup.failed:
+        response.headers['Retry-After'] = '5'
+    return response
+
+def _unavailable_body():
+    if startup.failed:
+        return {'error': 'Falha na inicialização do serviço', 'startup': startup.status()}
+    return {'error': 'Serviço inicializando, tente novamente em instantes', 'startup': startup.status()}
+
+def _log_results(label, results):
+    logger.info(f"{label} (primeiros k={len(results)}):")
+    for i, res in enumerate(results):
+        logger.info(f"  [{i+1}] ID: {res['id']}, Score: {res['score']:.4f}, Texto: {res['text'][:100]}...")
+
+def _start_turn(data):
+    """
+    Lê a mensagem da requisição, resume se for longa e a registra no histórico.
+
+    Returns:
+        tuple: (session_id, mensagem usada na busca e no prompt)
+    """
+    user_message = data.get('message', '')
+    session_id = _request_session_id(data)
+    original_message = user_message
+
+    if len(user_message.split()) > MAX_USER_MESSAGE_LENGTH:
+        logger.info(f"Mensagem longa detectada ({len(user_message.split())} palavras). Resumindo...")
+        user_message = text_processor.summarize(user_message, MAX_USER_MESSAGE_LENGTH)
+        logger.info(f"Mensagem resumida para {len(user_message.split())} palavras")
+
+    sessions.append(session_id, 'user', original_message)
+    return session_id, user_message
+
+def _request_error(data):
+    """
+    Valida o corpo JSON de uma requisição de chat.
+
+    Returns:
+        str: Mensagem de erro para a resposta 400, ou None se o corpo for válido
+    """
+    if not isinstance(data, dict):
+        return "O corpo da requisição deve ser um objeto JSON"
+    message = data.get('message', '')
+    if not isinstance(message, str):
+        return "'message' deve ser um texto"
+    if not message.strip():
+        return 'Mensagem vazia'
+    return None
+
+def _request_session_id(data):
+    """
+    Lê o identificador de sessão da requisição ('default' se ausente).
+
+    Raises:
+        ValueError: Se o identificador não for um texto ou passar de MAX_SESSION_ID_LENGTH caracteres
+    """
+    session_id = data.get('session_id', 'default')
+    if not isinstance(session_id, str):
+        raise ValueError("'session_id' deve ser um texto")
+    if len(session_id) > MAX_SESSION_ID_LENGTH:
+        raise ValueError(f"'session_id' deve ter no máximo {MAX_SESSION_ID_LENGTH} caracteres")
+    return session_id
+
+def _request_filters(data):
+    """
+    Lê o filtro de metadados opcional da requisição.
+
+    Formato: {"campo": "valor"} ou {"campo": ["valor", ...]}, com campos de
+    metadata dos chunks (nivel_educacional, assunto_principal, ...). Os valores
+    de FILTER_INCLUSIVE_VALUES do campo (ex.: "Todos os Níveis") são sempre aceitos.
+
+    Returns:
+        dict: Campo -> lista de valores aceitos, ou None sem filtro
+
+    Raises:
+        ValueError: Se o filtro não estiver no formato esperado
+    """
+    filters = data.get('filters')
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("'filters' deve ser um objeto campo -> valores")
+
+    known_fields = json_processor.metadata_index.fields()
+    parsed = {}
+    for field, values in filters.items():
+        if field not in known_fields:
+            raise ValueError(f"Campo de filtro desconhecido: {field}")
+        values = values if isinstance(values, list) else [values]
+        if not values or not all(isinstance(value, str) for value in values):
+            raise ValueError(f"Valores do filtro '{field}' devem ser textos")
+        parsed[field] = values + [value for value in FILTER_INCLUSIVE_VALUES.get(field, []) if value not in values]
+    return parsed
+
+def _plan_response(user_message, filters=None):
+    """
+    Resolve tudo o que antecede a geração: despedida, caches e busca nos JSONs.
+
+    Args:
+        user_message (str): Mensagem do usuário
+        filters (dict): Filtro de metadados pedido pelo cliente (ver _request_filters);
+            a busca fica restrita aos chunks que o atendem
+
+    Returns:
+        dict: 'response' (já pronta, ou None se o Gemini precisa gerar), 'source',
+              'json_results' e as consultas usadas no cache semântico
+    """
+    # Respostas com filtro ficam em um namespace próprio e fora do cache semântico
+    cache_namespace = DEFAULT_NAMESPACE
+    if filters:
+        cache_namespace = "filters:" + json.dumps(filters, sort_keys=True, ensure_ascii=False)
+    plan = {'response': None, 'json_results': [], 'queries': [], 'query_embeddings': [],
+            'cache_namespace': cache_namespace, 'filtered': bool(filters)}
+
+    if any(word in user_message.lower() for word in ['tchau', 'adeus', 'até logo', 'até mais']):
+        plan.update(response=gemini_client.get_goodbye_message(), source="persona")
+        return plan
+
+    cached_response = cache.get(user_message, namespace=cache_namespace)
+    if cached_response:
+        logger.info("Resposta encontrada no cache")
+        plan.update(response=cached_response, source="cache")
+        return plan
+
+    processed_user_message = text_processor.preprocess(user_message)
+    expanded_message = keyword_mapper.expand_query(processed_user_message)
+    logger.info(f"Mensagem processada antes da expansão: {processed_user_message}")
+    logger.info(f"Mensagem expandida: {expanded_message}")
+
+    if expanded_message != processed_user_message:
+        logger.info(f"Consulta expandida com termos relacionados: {expanded_message}")
+        related_terms = keyword_mapper.get_related_terms(processed_user_message)
+        if related_terms:
+            logger.info(f"Termos relacionados encontrados: {', '.join(related_terms)}")
+
+    # No modo híbrido, o BM25 já cobre os termos exatos e uma única busca fundida basta.
+    # No vetorial, a consulta expandida e a variante com termos explícitos são buscadas
+    # juntas, em um único encode e uma única busca no FAISS.
+    queries = [expanded_message]
+    fallback_terms = keyword_mapper.get_related_terms(user_message) if RETRIEVAL_MODE == "vector" else []
+    if fallback_terms:
+        explicit_query = user_message + " " + " ".join(fallback_terms[:3])  #  3 termos
+        logger.info(f"Consulta explícita candidata: {explicit_query}")
+        queries.append(explicit_query)
+
+    query_embeddings = json_processor.embed_queries(queries)
+    plan.update(queries=queries, query_embeddings=query_embeddings)
+
+    if semantic_cache is not None and not filters and query_embeddings[0] is not None:
+        semantic_hit = semantic_cache.get(query_embeddings[0])
+        if semantic_hit:
+            logger.info(
+                f"Resposta encontrada no cache semântico (similaridade {semantic_hit['similarity']:.3f} "
+                f"com '{semantic_hit['query']}')"
+            )
+            cache.put(user_message, semantic_hit['response'])
+            plan.update(response=semantic_hit['response'], source="cache")
+            return plan
+
+    # Temas reconhecidos na mensagem priorizam os chunks do assunto correspondente, mas
+    # são só uma preferência: sem resultado relevante no tema, a busca vale para todo o corpus.
+    # O filtro pedido pelo cliente, ao contrário, é obrigatório
+    filters = filters or {}
+    # Com re-ranking, a busca traz mais candidatos e o cross-encoder escolhe os que vão ao prompt
+    k = 5 * RERANKER_OVERFETCH if reranker is not None else 5
+    assuntos = keyword_mapper.get_assuntos(user_message)
+    if filters:
+        logger.info(f"Busca restrita ao filtro {filters}")
+    if assuntos and 'assunto_principal' not in filters:
+        logger.info(f"Busca priorizando assunto_principal: {', '.join(assuntos)}")
+        search_results = json_processor.retrieve(
+            queries, query_embeddings, k=k, filters=dict(filters, assunto_principal=assuntos), filter_fallback=not filters
+        )
+        if not any(hits and _is_grounded(hits[0]) for hits in search_results):
+            logger.info("Nenhum resultado relevante no assunto priorizado; buscando sem o tema")
+            search_results = json_processor.retrieve(queries, query_embeddings, k=k, filters=filters or None)
+    else:
+        search_results = json_processor.retrieve(queries, query_embeddings, k=k, filters=filters or None)
+    if reranker is not None:
+        search_results = [
+            reranker.rerank(user_message, hits, embedding)
+            for hits, embedding in zip(search_results, query_embeddings)
+        ]
+    json_results = search_results[0]
+    _log_results("Resultados da busca JSON", json_results)
+
+    if json_results and _is_grounded(json_results[0]):
+        logger.info(f"Informações encontradas nos JSONs (score: {json_results[0]['score']})")
+        source = "json+gemini"
+    elif len(search_results) > 1 and search_results[1] and _is_grounded(search_results[1][0]):
+        json_results = search_results[1][:3]
+        _log_results("Resultados da busca JSON com termos explícitos", json_results)
+        logger.info(f"Informações encontradas nos JSONs com termos explícitos (score: {json_results[0]['score']})")
+        source = "json+gemini+keywords"
+    else:
+        json_results = []
+        source = "gemini"
+
+    plan.update(source=source, json_results=json_results)
+    if json_results:
+        logger.info(f"Chunks enviados ao Gemini: {', '.join(result['id'] for result in json_results)}")
+    else:
+        logger.info("Nenhuma informação relevante encontrada. Gerando resposta com Gemini API")
+    return plan
+
+def _is_grounded(hit):
+    # Candidatos que sobraram do re-ranking já passaram pelo corte do cross-encoder
+    return 'rerank_score' in hit or json_processor.is_relevant_hit(hit)
+
+def _finish_turn(session_id, user_message, plan, response, generated=True):
+    """
+    Guarda nos caches uma resposta recém-gerada e a registra no histórico.
+
+    A resposta padrão da persona após uma falha do Gemini (generated=False) só vai para
+    o histórico: em cache, seria servida a perguntas parecidas durante todo o TTL.
+    """
+    if plan['response'] is None and generated and response and len(response) > 10:
+        cache.put(user_message, response, namespace=plan['cache_namespace'])
+        # Só respostas com contexto dos documentos: uma resposta genérica do Gemini ("não encontrei...")
+        # seria servida para toda a vizinhança de perguntas parecidas
+        grounded = bool(plan['json_results'])
+        if semantic_cache is not None and grounded and not plan['filtered'] and plan['query_embeddings'][0] is not None:
+            semantic_cache.put(plan['queries'][0], plan['query_embeddings'][0], response,
+                               [result['id'] for result in plan['json_results']], plan['source'])
+
+    sessions.append(session_id, 'assistant', response)
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 @app.route('/')
 def index():
     """Renderiza a página principal do chatbot."""
-    initial_message = gemini_client.get_initial_greeting()
+    initial_message = get_saudacao()
     return render_template('index.html', initial_message=initial_message)
 
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Sonda de vida: o processo está de pé e atendendo requisições."""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Sonda de prontidão: estado e tempo de carga de cada componente; 503 até todos carregarem ou após uma falha."""
+    status = startup.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @app.route('/api/chat', methods=['POST'])
+@_requires_startup
 def chat():
     """
     Endpoint para processar mensagens do usuário e retornar respostas.
@@ -49,139 +380,38 @@ def chat():
     Fluxo:
     1. Verifica se a mensagem é longa e resume se necessário
     2. Expande a consulta com termos relacionados usando o KeywordMapper
-    3. Verifica se a resposta está no cache
-    4. Busca nos JSONs
+    3. Verifica se a resposta está no cache (texto exato, depois consulta semelhante)
+    4. Busca nos JSONs (FAISS + BM25 fundidos, ou só FAISS com a variante de termos
+       explícitos quando RETRIEVAL_MODE = "vector"), restrita ao campo opcional 'filters' do corpo (ex.: {"nivel_educacional": "Graduação"})
     5. Se não encontrar nos JSONs ou similaridade baixa, usa a API do Gemini
     """
     try:
         data = request.json
-        user_message = data.get('message', '')
-        session_id = data.get('session_id', 'default')
-        
-        if not user_message.strip():
-            return jsonify({'error': 'Mensagem vazia'}), 400
-        
-        original_message = user_message
-            
-        if len(user_message.split()) > MAX_USER_MESSAGE_LENGTH:
-            logger.info(f"Mensagem longa detectada ({len(user_message.split())} palavras). Resumindo...")
-            user_message = text_processor.summarize(user_message, MAX_USER_MESSAGE_LENGTH)
-            logger.info(f"Mensagem resumida para {len(user_message.split())} palavras")
-            
-        if session_id not in conversation_history:
-            conversation_history[session_id] = []
-            
-        conversation_history[session_id].append({
-            'role': 'user',
-            'content': original_message
-        })
-        
-        if any(word in user_message.lower() for word in ['tchau', 'adeus', 'até logo', 'até mais']):
-            response = gemini_client.get_goodbye_message()
-            source = "persona"
-        else:
-            cached_response = cache.get(user_message)
-            if cached_response:
-                logger.info("Resposta encontrada no cache")
-                response = cached_response
-                source = "cache"
-            else:
-                processed_user_message = text_processor.preprocess(user_message)
-                expanded_message = keyword_mapper.expand_query(processed_user_message)
-                logger.info(f"Mensagem processada antes da expansão: {processed_user_message}")
-                logger.info(f"Mensagem expandida: {expanded_message}")
-                
-                if expanded_message != processed_user_message: 
-                    logger.info(f"Consulta expandida com termos relacionados: {expanded_message}")
-                    related_terms = keyword_mapper.get_related_terms(processed_user_message)
-                    if related_terms:
-                        logger.info(f"Termos relacionados encontrados: {', '.join(related_terms)}")
-                
-
-                processed_message = text_processor.preprocess(expanded_message)
-                
-                json_results = json_processor.search(expanded_message, k=5)
-                logger.info(f"Resultados da busca JSON (primeiros k={len(json_results)}):")
-                for i, res in enumerate(json_results):
-                    logger.info(f"  [{i+1}] ID: {res['id']}, Score: {res['score']:.4f}, Texto: {res['text'][:100]}...")
-                
-                if json_results and json_results[0]['score'] <= JSON_SIMILARITY_THRESHOLD:
-                    logger.info(f"Informações encontradas nos JSONs (score: {json_results[0]['score']})")
-                    
-                    json_context = "Baseado nas seguintes informações dos nossos documentos:\n\n"
-                    for result in json_results:
-                        # Adiciona o ID do chunk e o sub_assunto ao contexto
-                        sub_assunto = result['metadata'].get('sub_assunto', 'N/A')
-                        json_context += f"- ID: {result['id']}\n"
-                        json_context += f"  Subtópico: {sub_assunto}\n"
-                        json_context += f"  Texto: {result['text']}\n"
-                        json_context += f"  (Fonte: {result['id']})\n\n"
-                    logger.info(f"Contexto JSON enviado ao Gemini:\n{json_context}")
-                    
-                    response = gemini_client.generate_response(
-                        user_message,
-                        conversation_history[session_id],
-                        json_context
-                    )
-                    source = "json+gemini"
-                else:
-                    related_terms = keyword_mapper.get_related_terms(user_message)
-                    if related_terms:
-                        explicit_query = user_message + " " + " ".join(related_terms[:3])  #  3 termos
-                        logger.info(f"Tentando busca com consulta explícita: {explicit_query}")
-                        json_results = json_processor.search(explicit_query, k=3)
-                        logger.info(f"Resultados da busca JSON (segunda tentativa, primeiros k={len(json_results)}):")
-                        for i, res in enumerate(json_results):
-                            logger.info(f"  [{i+1}] ID: {res['id']}, Score: {res['score']:.4f}, Texto: {res['text'][:100]}...")
-                        
-                        if json_results and json_results[0]['score'] <= JSON_SIMILARITY_THRESHOLD:
-                            logger.info(f"Informações encontradas nos JSONs com termos explícitos (score: {json_results[0]['score']})")
-                            
-                            json_context = "Baseado nas seguintes informações dos nossos documentos:\n\n"
-                            for result in json_results:
-                                # Adiciona o ID do chunk e o sub_assunto ao contexto (segunda tentativa)
-                                sub_assunto = result['metadata'].get('sub_assunto', 'N/A')
-                                json_context += f"- ID: {result['id']}\n"
-                                json_context += f"  Subtópico: {sub_assunto}\n"
-                                json_context += f"  Texto: {result['text']}\n"
-                                json_context += f"  (Fonte: {result['id']})\n\n"
-                            logger.info(f"Contexto JSON (segunda tentativa) enviado ao Gemini:\n{json_context}")
-                            
-                            response = gemini_client.generate_response(
-                                user_message,
-                                conversation_history[session_id],
-                                json_context
-                            )
-                            source = "json+gemini+keywords"
-                        else:
-                            logger.info("Nenhuma informação relevante encontrada. Gerando resposta com Gemini API")
-                            response = gemini_client.generate_response(
-                                user_message, 
-                                conversation_history[session_id]
-                            )
-                            source = "gemini"
-                    else:
-                        logger.info("Nenhuma informação relevante encontrada. Gerando resposta com Gemini API")
-                        response = gemini_client.generate_response(
-                            user_message, 
-                            conversation_history[session_id]
-                        )
-                        source = "gemini"
-                
-                if response and len(response) > 10:
-                    cache.put(user_message, response)
-        
-        conversation_history[session_id].append({
-            'role': 'assistant',
-            'content': response
-        })
-        
-        if len(conversation_history[session_id]) > 50:
-            conversation_history[session_id] = conversation_history[session_id][-50:]
+        error = _request_error(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        try:
+            filters = _request_filters(data)
+            _request_session_id(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        session_id, user_message = _start_turn(data)
+        plan = _plan_response(user_message, filters)
+        response, generated = plan['response'], True
+        if response is None:
+            response, generated = gemini_client.generate_response(
+                user_message,
+                sessions.history(session_id),
+                plan['json_results'],
+                source=plan['source']
+            )
+        _finish_turn(session_id, user_message, plan, response, generated)
             
         return jsonify({
             'response': response,
-            'source': source
+            'source': plan['source']
         })
         
     except Exception as e:
@@ -191,15 +421,151 @@ def chat():
             'response': gemini_client.persona['comportamento']['nao_entendeu']
         }), 500
 
+async def chat_async(data):
+    """
+    Versão assíncrona de /api/chat, servida pelo asgi.py.
+
+    Pré-processamento, embeddings e busca rodam no chat_executor (limitado a
+    CHAT_EXECUTOR_WORKERS threads); a chamada ao Gemini é aguardada sem ocupar
+    nenhuma thread.
+
+    Args:
+        data (dict): Corpo JSON da requisição
+
+    Returns:
+        tuple: (corpo da resposta, status HTTP)
+    """
+    data = data or {}
+    error = _request_error(data)
+    if error:
+        return {'error': error}, 400
+    if not await startup.wait_async(STARTUP_REQUEST_TIMEOUT):
+        return _unavailable_body(), 503
+
+    # Validação, histórico (SQLite com SESSION_BACKEND="sqlite"), embeddings e busca
+    # rodam no chat_executor; o event loop só aguarda
+    loop = asyncio.get_running_loop()
+    try:
+        filters = await loop.run_in_executor(chat_executor, _request_filters, data)
+        _request_session_id(data)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    try:
+        session_id, user_message = await loop.run_in_executor(chat_executor, _start_turn, data)
+        plan = await loop.run_in_executor(chat_executor, _plan_response, user_message, filters)
+        response, generated = plan['response'], True
+        if response is None:
+            history = await loop.run_in_executor(chat_executor, sessions.history, session_id)
+            response, generated = await gemini_client.generate_response_async(
+                user_message,
+                history,
+                plan['json_results'],
+                source=plan['source']
+            )
+        await loop.run_in_executor(chat_executor, _finish_turn, session_id, user_message, plan, response, generated)
+        return {'response': response, 'source': plan['source']}, 200
+
+    except Exception as e:
+        logger.error(f"Erro ao processar mensagem: {e}")
+        return {
+            'error': str(e),
+            'response': gemini_client.persona['comportamento']['nao_entendeu']
+        }, 500
+
+@app.route('/api/chat/stream', methods=['POST'])
+@_requires_startup
+def chat_stream():
+    """
+    Mesmo fluxo de /api/chat, com a resposta enviada como Server-Sent Events.
+
+    Eventos: 'meta' (origem da resposta), 'delta' (trecho do texto, na ordem),
+    'done' (fim) e 'error'. A resposta completa vai para os caches e para o
+    histórico quando a geração termina; se o Gemini falhar no meio, o cliente
+    recebe 'error' e o texto parcial é descartado.
+    """
+    data = request.json or {}
+    error = _request_error(data)
+    if error:
+        return jsonify({'error': error}), 400
+    try:
+        filters = _request_filters(data)
+        _request_session_id(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def events():
+        try:
+            session_id, user_message = _start_turn(data)
+            plan = _plan_response(user_message, filters)
+            yield _sse('meta', {'source': plan['source']})
+
+            if plan['response'] is not None:
+                response = plan['response']
+                yield _sse('delta', {'text': response})
+            else:
+                parts = []
+                for text in gemini_client.generate_response_stream(
+                    user_message,
+                    sessions.history(session_id),
+                    plan['json_results'],
+                    source=plan['source']
+                ):
+                    parts.append(text)
+                    yield _sse('delta', {'text': text})
+                response = "".join(parts)
+
+            _finish_turn(session_id, user_message, plan, response)
+            yield _sse('done', {'source': plan['source']})
+        except Exception as e:
+            logger.error(f"Erro ao processar mensagem em streaming: {e}")
+            yield _sse('error', {
+                'error': str(e),
+                'response': gemini_client.persona['comportamento']['nao_entendeu']
+            })
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Retorna métricas de busca, embeddings e caches para ajuste de desempenho."""
+    return jsonify({
+        'startup': startup.status(),
+        'json_processor': json_processor.stats() if json_processor is not None else None,
+        'text_processor': text_processor.cache_stats() if text_processor is not None else None,
+        'response_cache': cache.stats(),
+        'token_usage': gemini_client.token_usage.stats() if gemini_client is not None else None,
+        'sessions': sessions.stats(),
+        'semantic_cache': semantic_cache.stats() if semantic_cache is not None else None,
+        'reranker': reranker.stats() if reranker is not None else None
+    })
+
+@app.route('/api/admin/reload-index', methods=['POST'])
+@_requires_startup
+def reload_index():
+    """Recarrega o índice JSON do disco em segundo plano, sem reiniciar o app."""
+    token = request.headers.get('X-Admin-Token', '')
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        return jsonify({'error': 'Não autorizado'}), 403
+
+    threading.Thread(target=json_processor.reload_index, name="index-reload", daemon=True).start()
+    return jsonify({'status': 'reloading'}), 202
+
 @app.route('/api/clear-history', methods=['POST'])
 def clear_history():
     """Limpa o histórico de conversa de uma sessão específica."""
     try:
         data = request.json
-        session_id = data.get('session_id', 'default')
-        
-        if session_id in conversation_history:
-            conversation_history[session_id] = []
+        try:
+            session_id = _request_session_id(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        sessions.clear(session_id)
             
         return jsonify({'status': 'success'})
     except Exception as e:
@@ -208,8 +574,4 @@ def clear_history():
 
 if __name__ == '__main__':
     logger.info("APP.PY INICIADO: Lendo as últimas modificações do código.")
-    text_processor = TextProcessor()
-    json_processor = JSONProcessor()
-    keyword_mapper = KeywordMapper()
-    gemini_client = GeminiClient()
     app.run(debug=True)
\ No newline at end of file
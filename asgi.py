@@ -0,0 +1,83 @@
+"""
+Ponto de entrada ASGI do chatbot.
+
+POST /api/chat é atendido de forma assíncrona (ver app.chat_async): enquanto
+a resposta do Gemini não chega, a requisição não ocupa nenhuma thread. As
+demais rotas continuam no app Flask, adaptado com WsgiToAsgi.
+
+Execução:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+
+import json
+import logging
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app, chat_async
+
+logger = logging.getLogger(__name__)
+
+# Tamanho máximo do corpo aceito em /api/chat
+MAX_BODY_BYTES = 64 * 1024
+
+flask_application = WsgiToAsgi(app)
+
+
+async def application(scope, receive, send):
+    """Roteia /api/chat para o pipeline assíncrono e o restante para o Flask."""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+
+    if scope['type'] == 'http' and scope['path'] == '/api/chat' and scope['method'] == 'POST':
+        await _chat(receive, send)
+        return
+
+    await flask_application(scope, receive, send)
+
+
+async def _chat(receive, send):
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        body.extend(message.get('body', b''))
+        if len(body) > MAX_BODY_BYTES:
+            await _send_json(send, {'error': 'Mensagem muito longa'}, 413)
+            return
+        if not message.get('more_body'):
+            break
+
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        await _send_json(send, {'error': 'JSON inválido'}, 400)
+        return
+
+    payload, status = await chat_async(data)
+    await _send_json(send, payload, status)
+
+
+async def _send_json(send, payload, status):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json; charset=utf-8'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
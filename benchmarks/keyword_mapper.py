@@ -0,0 +1,100 @@
+"""
+Microbenchmark da expansão de consultas do KeywordMapper.
+
+Compara a trie compilada com os laços originais (substring sobre cada termo
+e cada sinônimo do synonym_map), reproduzidos aqui como referência.
+
+Uso:
+    python benchmarks/keyword_mapper.py [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.keyword_mapper import KeywordMapper
+
+QUERIES = [
+    "como faço para trancar a matrícula?",
+    "onde fica achados e perdidos",
+    "quero saber do abono de faltas por atestado médico",
+    "tenho dp em cálculo, como funciona a recuperação?",
+    "qual o vencimento do boleto da mensalidade",
+    "como pedir a carteirinha de ônibus da SPTrans",
+    "o curso é EAD ou presencial?",
+    "quando é a colação de grau",
+    "preciso de uma declaração de matrícula para o estágio",
+    "olá, bom dia",
+]
+
+
+def legacy_expand_query(synonym_map, query):
+    original_query = query.lower()
+    expanded_terms = []
+    for official_term, synonyms in synonym_map.items():
+        if official_term.lower() in original_query:
+            expanded_terms.extend(synonyms)
+    for official_term, synonyms in synonym_map.items():
+        for synonym in synonyms:
+            if synonym.lower() in original_query:
+                expanded_terms.append(official_term)
+                expanded_terms.extend([s for s in synonyms if s.lower() != synonym.lower()])
+                break
+    expanded_terms = list(set(expanded_terms))
+    expanded_terms = [term for term in expanded_terms if term.lower() not in original_query]
+    if not expanded_terms:
+        return query
+    return query + " " + " ".join(expanded_terms)
+
+
+def legacy_get_related_terms(synonym_map, query):
+    query_lower = query.lower()
+    related_terms = []
+    for official_term, synonyms in synonym_map.items():
+        if official_term.lower() in query_lower:
+            related_terms.extend(synonyms)
+        else:
+            for synonym in synonyms:
+                if synonym.lower() in query_lower:
+                    related_terms.append(official_term)
+                    related_terms.extend([s for s in synonyms if s.lower() != synonym.lower()])
+                    break
+    return list(set(related_terms))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark do KeywordMapper")
+    parser.add_argument('--repeat', type=int, default=2000, help="Repetições do conjunto de consultas")
+    args = parser.parse_args()
+
+    mapper = KeywordMapper()
+    synonym_map = mapper.synonym_map
+
+    def legacy():
+        for query in QUERIES:
+            legacy_expand_query(synonym_map, query)
+            legacy_get_related_terms(synonym_map, query)
+
+    def compiled():
+        for query in QUERIES:
+            mapper.expand_query(query)
+            mapper.get_related_terms(query)
+
+    calls = args.repeat * len(QUERIES)
+    for name, func in (('laços originais', legacy), ('trie compilada', compiled)):
+        elapsed = min(timeit.repeat(func, number=args.repeat, repeat=3))
+        print(f"{name:<16} {elapsed * 1e6 / calls:8.2f} µs por consulta (expand_query + get_related_terms)")
+
+    print("\nDiferenças de termos (trie x laços originais):")
+    for query in QUERIES:
+        new = set(mapper.get_related_terms(query))
+        old = set(legacy_get_related_terms(synonym_map, query))
+        if new != old:
+            print(f"  {query!r}: +{sorted(new - old)} -{sorted(old - new)}")
+
+
+if __name__ == "__main__":
+    main()
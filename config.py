@@ -12,11 +12,52 @@ INDEX_DIR = os.path.join(DATA_DIR, "indices")
 # --- API ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = "gemini-2.0-flash"
+# Requisições recentes mantidas individualmente na contabilidade de tokens (/api/metrics)
+TOKEN_USAGE_RECENT = 100
+
+# --- Sessões ---
+# "memory" (por processo) ou "sqlite" (arquivo local compartilhado pelos workers e preservado entre reinícios)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_SQLITE_PATH = os.path.join(DATA_DIR, "cache", "sessions.sqlite3")
+SESSION_MAX_SESSIONS = 10000
+SESSION_IDLE_TTL_SECONDS = 2 * 60 * 60
+# Limites por sessão: mensagens (pergunta + resposta contam 2) e caracteres
+SESSION_MAX_MESSAGES = 20
+SESSION_MAX_CHARS = 20000
+
+# --- Servidor ---
+# Threads que executam o trabalho de CPU (spaCy, embeddings, FAISS) das requisições assíncronas (asgi.py)
+CHAT_EXECUTOR_WORKERS = os.cpu_count() or 4
+# Componentes pesados (modelos, índice) carregados em paralelo na inicialização (ver utils/startup.py)
+STARTUP_WORKERS = 4
+# Tempo máximo (s) que uma requisição espera o fim da inicialização antes de receber 503
+STARTUP_REQUEST_TIMEOUT = 30
+# Modo pre-fork (gunicorn --preload, ver gunicorn.conf.py): os componentes são carregados
+# no processo mestre e as tarefas de segundo plano só iniciam nos workers
+PRELOAD_MODE = os.getenv("PRELOAD_MODE") == "1"
 
 # --- Embeddings ---
 EMBEDDING_MODEL = "distiluse-base-multilingual-cased-v2"
 EMBEDDING_BATCH_SIZE = 100
 
+# Backend de inferência dos embeddings: "torch" (float32), "torch-int8" (quantização
+# dinâmica) ou "onnx" (ONNX Runtime; exporte com process_json.py export-onnx).
+# Ao trocar, reprocesse os JSONs e confira com process_json.py parity
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_DIR = os.path.join(DATA_DIR, "models", "embedding_onnx")
+# Threads intra-op da inferência por processo (0 mantém o padrão da biblioteca)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "4"))
+
+# Embeddings de consultas memorizados pelo texto pré-processado (0 desativa)
+EMBEDDING_CACHE_SIZE = 4096
+
+# Micro-lotes de embeddings das consultas sob carga concorrente
+EMBEDDING_SCHEDULER_ENABLED = True
+EMBEDDING_SCHEDULER_MAX_BATCH = 32
+EMBEDDING_SCHEDULER_WINDOW_MS = 5
+# Tempo máximo (s) que uma requisição espera pelos embeddings do seu lote
+EMBEDDING_SCHEDULER_TIMEOUT = 10
+
 # --- RAG ---
 RAG_TOP_K = 5
 RAG_CHUNK_SIZE = 1000
@@ -25,18 +66,99 @@ RAG_CHUNK_OVERLAP = 100
 FAISS_INDEX_DIR = os.path.join(DATA_DIR, "indices")
 FAISS_JSON_INDEX_PATH = os.path.join(FAISS_INDEX_DIR, "json_docs.index")
 FAISS_JSON_MAPPING_PATH = os.path.join(FAISS_INDEX_DIR, "json_mapping.pkl")
+FAISS_JSON_CHUNKS_PATH = os.path.join(FAISS_INDEX_DIR, "json_chunks.bin")
+FAISS_JSON_META_PATH = os.path.join(FAISS_INDEX_DIR, "json_docs.meta.json")
+# Embeddings por hash de conteúdo, reaproveitados na reindexação incremental
+FAISS_JSON_EMBEDDINGS_PATH = os.path.join(FAISS_INDEX_DIR, "json_embeddings.npz")
+
+# Métrica: "l2" (distância euclidiana, menor é melhor) ou "cosine"
+# (embeddings normalizados + produto interno, maior é melhor)
+FAISS_METRIC = "l2"
+
+# Tipo de índice: flat, ivf, hnsw, sq8, pq ou ivfpq (ver utils/index_factory.py)
+FAISS_INDEX_TYPE = "flat"
+FAISS_IVF_NLIST = 100
+FAISS_IVF_NPROBE = 10
+FAISS_HNSW_M = 32
+FAISS_HNSW_EF_CONSTRUCTION = 40
+FAISS_HNSW_EF_SEARCH = 64
+FAISS_PQ_M = 64
+FAISS_PQ_NBITS = 8
+
+# Índice FAISS e chunks mapeados do disco (somente leitura) no app, em vez de
+# copiados para a memória: os workers compartilham as páginas do page cache
+FAISS_INDEX_MMAP = os.getenv("FAISS_INDEX_MMAP", "1") == "1"
+
+# Recarga do índice sem reiniciar o app: verificação do arquivo do índice
+# (segundos; 0 desativa) e token exigido no endpoint administrativo
+INDEX_WATCH_INTERVAL = 30
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Candidatos buscados por resultado quando a busca tem filtro de metadata
+SEARCH_FILTER_OVERFETCH = 4
+# Valores que valem para qualquer valor filtrado do campo: um filtro por
+# nivel_educacional "Graduação" também traz os chunks de "Todos os Níveis"
+FILTER_INCLUSIVE_VALUES = {"nivel_educacional": ["Todos os Níveis"]}
+
+# Busca: "vector" (só FAISS) ou "hybrid" (FAISS + BM25 fundidos por reciprocal rank fusion)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Índice lexical BM25 dos chunks, salvo junto do índice FAISS
+FAISS_JSON_BM25_PATH = os.path.join(FAISS_INDEX_DIR, "json_bm25.npz")
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Constante da fusão (1 / (RRF_K + posição)) e candidatos de cada busca que entram na fusão
+RRF_K = 60
+HYBRID_CANDIDATES = 20
+# Um chunk é relevante pelo BM25, mesmo com similaridade vetorial baixa, se tiver score de ao
+# menos BM25_MIN_SCORE e contiver termos que somem BM25_MIN_COVERAGE do IDF da consulta.
+# Só o score não basta: um único termo raro do corpus já vale ~3.4, e consultas fora do
+# escopo ("horário biblioteca", "valor da prova") passavam por casar uma palavra só
+BM25_MIN_SCORE = 3.0
+BM25_MIN_COVERAGE = 0.8
+
+# Re-ranking dos candidatos com um cross-encoder (ver utils/reranker.py)
+RERANKER_ENABLED = False
+RERANKER_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+# Candidatos buscados por chunk mantido, chunks mantidos e score mínimo (0 a 1) do cross-encoder
+RERANKER_OVERFETCH = 4
+RERANKER_TOP_K = 3
+RERANKER_MIN_SCORE = 0.3
+# Scores memorizados por (bucket LSH do embedding da consulta, chunk)
+RERANKER_CACHE_SIZE = 10000
+RERANKER_LSH_BITS = 16
 
 CACHE_SIZE = 1000
+# Validade das respostas em cache (s), memória máxima estimada (bytes) e shards com lock próprio
+CACHE_TTL_SECONDS = 6 * 60 * 60
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_SHARDS = 16
+# "memory" (um cache por processo) ou "sqlite" (arquivo local compartilhado pelos workers)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_SQLITE_PATH = os.path.join(DATA_DIR, "cache", "responses.sqlite3")
+# Cache semântico: reaproveita respostas de consultas parecidas (cosseno entre embeddings)
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_SIZE = 1000
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_TTL_SECONDS = 24 * 60 * 60
 SIMILARITY_THRESHOLD = 0.75
 JSON_SIMILARITY_THRESHOLD = 1.30
+# Similaridade mínima quando FAISS_METRIC = "cosine" (ver process_json.py calibrate)
+JSON_COSINE_SIMILARITY_THRESHOLD = 0.45
 #JSON_SIMILARITY_THRESHOLD = 1.0
 
+# Sinônimos e grupos temáticos do KeywordMapper (synonyms.json e themes.json)
+KEYWORD_VOCABULARY_DIR = os.path.join(DATA_DIR, "vocabulary")
+
 SPACY_MODEL = "pt_core_news_md"
+# Componentes que o preprocess não usa (lemas, stopwords e entidades não dependem do parser)
+SPACY_PREPROCESS_DISABLE = ["parser"]
+TEXT_PROCESSOR_CACHE_SIZE = 4096
 
 MAX_CHUNK_SIZE = 400
 MIN_CHUNK_SIZE = 50
 CHUNK_OVERLAP = 100
 
+# Orçamento (tokens estimados) de histórico + chunks no prompt e turnos de histórico enviados
 MAX_CONTEXT_LENGTH = 2000
 MAX_HISTORY_LENGTH = 5
 MAX_USER_MESSAGE_LENGTH = 100
@@ -44,6 +166,8 @@ MAX_USER_MESSAGE_LENGTH = 100
 MIN_SIMILARITY_SCORE = 0.7
 MAX_CHUNK_SIMILARITY = 0.8
 
-for directory in [DATA_DIR, JSON_DIR, FAISS_INDEX_DIR]:
-    os.makedirs(directory, exist_ok=True)
-    print(f"Diretório criado/verificado: {directory}")
\ No newline at end of file
+
+def ensure_directories():
+    """Cria os diretórios de dados e de índices, se ainda não existirem."""
+    for directory in [DATA_DIR, JSON_DIR, FAISS_INDEX_DIR]:
+        os.makedirs(directory, exist_ok=True)
@@ -0,0 +1,53 @@
+"""
+Configuração do gunicorn em modo pre-fork.
+
+O app é importado uma única vez no processo mestre (preload_app), que
+carrega os modelos (SentenceTransformer, spaCy, cross-encoder) e mapeia o
+índice FAISS e os chunks do disco antes de criar os workers. Os workers
+herdam essas páginas por copy-on-write, então a memória por worker fica
+restrita ao que cada um aloca ao atender requisições.
+
+Nenhuma inferência roda no mestre (torch/OpenMP não sobrevivem bem a um
+fork depois de usados); threads de segundo plano, conexões SQLite e o
+agendador de embeddings são criados em cada worker.
+
+Execução:
+    gunicorn -c gunicorn.conf.py app:app
+"""
+
+import gc
+import os
+import sys
+
+# Lido por config.py quando o app é importado (logo depois deste arquivo)
+os.environ["PRELOAD_MODE"] = "1"
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = True
+# Tempo máximo (s) que o mestre espera a carga dos componentes antes de desistir
+STARTUP_TIMEOUT = float(os.getenv("GUNICORN_STARTUP_TIMEOUT", "600"))
+
+
+def when_ready(server):
+    """Espera o fim da carga no mestre e congela os objetos antes do fork; encerra o servidor se ela falhar."""
+    import app
+
+    if not app.startup.wait(STARTUP_TIMEOUT):
+        reason = "falhou" if app.startup.failed else f"não terminou em {STARTUP_TIMEOUT:.0f}s"
+        server.log.error(f"Inicialização {reason}: {app.startup.status()}")
+        sys.exit(1)
+    # Objetos congelados não são percorridos pelo coletor de ciclos, que
+    # tocaria (e copiaria) as páginas compartilhadas em cada worker
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Componentes carregados no mestre: {app.startup.status()}")
+
+
+def post_fork(server, worker):
+    """Inicia em cada worker as tarefas de segundo plano que não passam pelo fork."""
+    import app
+
+    app.start_background_tasks()
@@ -1,11 +1,17 @@
 import os
 import sys
+import json
+import argparse
 import logging
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
 
 from utils.json_processor import JSONProcessor
-from config import JSON_DIR, DATA_DIR, INDEX_DIR
+from utils.index_factory import INDEX_TYPES, benchmark_backends
+from utils.calibration import evaluate_thresholds, propose_thresholds
+from utils.embedding_backends import EMBEDDING_BACKENDS, create_embedding_model, export_onnx, parity_report
+from config import JSON_DIR, DATA_DIR, INDEX_DIR, FAISS_METRIC, EMBEDDING_BACKEND, EMBEDDING_ONNX_DIR
+import faiss
 
 logging.basicConfig(
     level=logging.INFO,
@@ -17,20 +23,189 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def read_queries(path):
+    """Lê um arquivo de consultas de teste, uma por linha."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def test_queries(json_processor, chunks, path=None):
+    """Consultas de teste pré-processadas: do arquivo informado ou o sub_assunto de cada chunk."""
+    if path:
+        queries = read_queries(path)
+    else:
+        # Sem arquivo de consultas, usa o sub_assunto de cada chunk como consulta curta
+        queries = [chunk['metadata'].get('sub_assunto') or chunk['text'][:100] for chunk in chunks]
+    queries = [json_processor.text_processor.preprocess(q) for q in queries]
+    return [q for q in queries if q]
+
+def run_index(json_processor, args):
+    json_processor.process_json_directory(JSON_DIR, incremental=args.incremental)
+
+def run_benchmark(json_processor, args):
+    """Imprime recall@k e latência de cada tipo de índice contra a busca exata (flat)."""
+    chunks = json_processor.load_chunks(JSON_DIR)
+    if not chunks:
+        logger.warning("Nenhum chunk encontrado para o benchmark.")
+        return
+
+    queries = test_queries(json_processor, chunks, args.queries)
+
+    vectors = json_processor.embed_texts([chunk['text'] for chunk in chunks])
+    query_vectors = json_processor.embed_texts(queries)
+    if FAISS_METRIC == 'cosine':
+        faiss.normalize_L2(vectors)
+        faiss.normalize_L2(query_vectors)
+
+    report = benchmark_backends(vectors, query_vectors, args.k, args.types, FAISS_METRIC)
+
+    print(f"\nBenchmark com {len(vectors)} vetores e {len(queries)} consultas "
+          f"(recall@{args.k} contra flat, métrica {FAISS_METRIC})\n")
+    print(f"{'tipo':<8} {'recall':>8} {'lat. (ms)':>10} {'build (s)':>10} {'tamanho (KB)':>13}  parâmetros")
+    for row in report:
+        print(
+            f"{row['index_type']:<8} {row['recall']:>8.3f} {row['latency_ms']:>10.4f} "
+            f"{row['build_s']:>10.3f} {row['size_bytes'] / 1024:>13.1f}  {row['params']}"
+        )
+
+def run_export_onnx(json_processor, args):
+    """Exporta o modelo de embeddings para o backend onnx."""
+    path = export_onnx(output_dir=args.output, opset=args.opset)
+    print(f"\nModelo exportado para {path}. Use EMBEDDING_BACKEND=onnx e confira com 'parity --backend onnx'.")
+
+def run_parity(json_processor, args):
+    """Confere se um backend de embeddings recupera o mesmo top-k que o modelo float no corpus de FAQ."""
+    chunks = json_processor.load_chunks(JSON_DIR)
+    if not chunks:
+        logger.warning("Nenhum chunk encontrado para a verificação de paridade.")
+        return
+    queries = test_queries(json_processor, chunks, args.queries)
+
+    reference = json_processor.embedding_model if EMBEDDING_BACKEND == 'torch' else create_embedding_model('torch')
+    candidate = json_processor.embedding_model if args.backend == EMBEDDING_BACKEND else create_embedding_model(args.backend)
+    report = parity_report(reference, candidate, [chunk['text'] for chunk in chunks], queries, args.k, FAISS_METRIC)
+
+    print(f"\nParidade de '{args.backend}' contra 'torch' com {report['documents']} chunks e "
+          f"{report['queries']} consultas (top-{report['k']}, métrica {FAISS_METRIC})\n")
+    print(f"sobreposição média do top-{report['k']}: {report['overlap']:.3f}")
+    print(f"consultas com top-{report['k']} idêntico:  {report['identical_topk']:.3f}")
+    print(f"concordância do top-1:          {report['top1_agreement']:.3f}")
+    print(f"cosseno médio das consultas:    {report['query_cosine']:.4f}")
+    print(f"latência por consulta (ms):     {report['reference_ms']:.2f} -> {report['candidate_ms']:.2f}")
+
+    if report['overlap'] < args.min_overlap:
+        print(f"\nFALHOU: sobreposição abaixo de {args.min_overlap:.3f}")
+        sys.exit(1)
+    print(f"\nOK: sobreposição >= {args.min_overlap:.3f}")
+
+def run_calibrate(json_processor, args):
+    """
+    Reexecuta consultas rotuladas contra o índice atual e propõe limiares de relevância.
+
+    O arquivo tem uma consulta JSON por linha:
+    {"query": "como tranco a matrícula?", "expected_ids": ["chunk_6_1"]}
+    Consultas sem expected_ids representam perguntas fora dos documentos.
+    """
+    with open(args.labeled, 'r', encoding='utf-8') as f:
+        labeled = [json.loads(line) for line in f if line.strip()]
+
+    # O limiar calibrado vale para o score vetorial; a busca híbrida usa a fusão de posições
+    results = json_processor.search_many([item['query'] for item in labeled], k=args.k, mode='vector')
+    top_scores, correct = [], []
+    for item, hits in zip(labeled, results):
+        if not hits:
+            continue
+        expected = set(item.get('expected_ids') or [])
+        top_scores.append(hits[0]['score'])
+        correct.append(bool(expected & {hit['id'] for hit in hits}))
+
+    if not top_scores:
+        logger.warning("Nenhuma consulta rotulada retornou resultados.")
+        return
+
+    higher_is_better = json_processor.metric == 'cosine'
+    rows = evaluate_thresholds(top_scores, correct, higher_is_better)
+    proposals = propose_thresholds(rows, args.min_precision)
+
+    print(f"\nCalibração com {len(top_scores)} consultas (métrica {json_processor.metric}, "
+          f"limiar atual {json_processor.similarity_threshold:.4f})\n")
+    print(f"{'limiar':>8} {'precisão':>9} {'recall':>8} {'f1':>6} {'aceitas':>8}")
+    for row in rows:
+        print(f"{row['threshold']:>8.4f} {row['precision']:>9.3f} {row['recall']:>8.3f} "
+              f"{row['f1']:>6.3f} {row['accepted']:>8}")
+
+    for name, row in proposals.items():
+        if row:
+            print(f"\nProposta {name}: {row['threshold']:.4f} "
+                  f"(precisão {row['precision']:.3f}, recall {row['recall']:.3f})")
+
+    chosen = proposals['high_precision'] or proposals['best_f1']
+    if args.apply and chosen:
+        json_processor.save_threshold(chosen['threshold'])
+        logger.info(f"Limiar {chosen['threshold']:.4f} salvo nos metadados do índice.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Indexação e avaliação dos JSONs do chatbot.")
+    subparsers = parser.add_subparsers(dest='command')
+
+    index = subparsers.add_parser('index', help="(padrão) Processa os JSONs e reconstrói o índice")
+    index.add_argument('--incremental', action='store_true',
+                       help="Reaproveita embeddings de chunks inalterados e atualiza o índice existente")
+
+    benchmark = subparsers.add_parser('benchmark', help="Compara recall@k e latência dos tipos de índice")
+    benchmark.add_argument('--k', type=int, default=5, help="Número de vizinhos avaliados")
+    benchmark.add_argument('--queries', help="Arquivo com consultas de teste, uma por linha")
+    benchmark.add_argument('--types', nargs='+', choices=INDEX_TYPES, default=list(INDEX_TYPES),
+                           help="Tipos de índice a comparar")
+
+    calibrate = subparsers.add_parser('calibrate', help="Propõe limiares de relevância a partir de consultas rotuladas")
+    calibrate.add_argument('labeled', help="Arquivo JSONL com 'query' e 'expected_ids'")
+    calibrate.add_argument('--k', type=int, default=5, help="Número de resultados considerados por consulta")
+    calibrate.add_argument('--min-precision', type=float, default=0.95,
+                           help="Precisão mínima da proposta conservadora")
+    calibrate.add_argument('--apply', action='store_true',
+                           help="Salva o limiar proposto nos metadados do índice")
+
+    export = subparsers.add_parser('export-onnx', help="Exporta o modelo de embeddings para o ONNX Runtime")
+    export.add_argument('--output', default=EMBEDDING_ONNX_DIR, help="Diretório do modelo exportado")
+    export.add_argument('--opset', type=int, default=14, help="Versão do opset ONNX")
+
+    parity = subparsers.add_parser('parity', help="Compara o top-k de um backend de embeddings com o modelo float")
+    parity.add_argument('--backend', choices=EMBEDDING_BACKENDS, default=EMBEDDING_BACKEND,
+                        help="Backend avaliado (padrão: EMBEDDING_BACKEND)")
+    parity.add_argument('--k', type=int, default=5, help="Número de resultados comparados por consulta")
+    parity.add_argument('--queries', help="Arquivo com consultas de teste, uma por linha")
+    parity.add_argument('--min-overlap', type=float, default=0.95,
+                        help="Sobreposição média mínima do top-k para aprovar o backend")
+
+    # Sem subcomando (inclusive "process_json.py --incremental"), executa 'index'
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or (argv[0].startswith('-') and argv[0] not in ('-h', '--help')):
+        argv = ['index'] + argv
+    return parser.parse_args(argv)
+
 def main():
+    args = parse_args()
     logger.info("Iniciando o processamento de JSONs...")
-    
+
     for directory in [DATA_DIR, JSON_DIR, INDEX_DIR]:
         os.makedirs(directory, exist_ok=True)
         logger.info(f"Diretório verificado/criado: {directory}")
-        
-    json_processor = JSONProcessor()
-    
+
+    # A exportação não usa o índice nem o backend configurado (que pode ser o próprio onnx ainda não exportado)
+    json_processor = None if args.command == 'export-onnx' else JSONProcessor()
+    commands = {
+        'index': run_index,
+        'benchmark': run_benchmark,
+        'calibrate': run_calibrate,
+        'export-onnx': run_export_onnx,
+        'parity': run_parity,
+    }
+
     try:
-        json_processor.process_json_directory(JSON_DIR)
+        commands[args.command](json_processor, args)
         logger.info("Processamento de JSONs concluído com sucesso.")
     except Exception as e:
         logger.error(f"Erro durante o processamento de JSONs: {e}", exc_info=True)
-        
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
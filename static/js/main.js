@@ -4,7 +4,14 @@ document.addEventListener('DOMContentLoaded', function() {
     const sendButton = document.getElementById('send-button');
     const clearChatButton = document.getElementById('clear-chat');
     
-    const sessionId = 'session_' + Date.now();
+    // Uma sessão por aba: sobrevive a recarregar a página, mas não é compartilhada entre abas
+    let sessionId = sessionStorage.getItem('chatSessionId');
+    if (!sessionId) {
+        sessionId = window.crypto && crypto.randomUUID
+            ? crypto.randomUUID()
+            : 'session_' + Date.now() + '_' + Math.random().toString(36).slice(2);
+        sessionStorage.setItem('chatSessionId', sessionId);
+    }
     
     userInput.addEventListener('input', function() {
         this.style.height = 'auto';
@@ -41,7 +48,31 @@ document.addEventListener('DOMContentLoaded', function() {
         
         showTypingIndicator();
         
-        fetch('/api/chat', {
+        streamMessage(message)
+        .catch(error => {
+            if (error.streamStarted) {
+                throw error;
+            }
+            // Sem suporte a streaming (navegador ou proxy): usa a resposta completa
+            console.warn('Streaming indisponível, usando /api/chat:', error);
+            return requestMessage(message);
+        })
+        .catch(error => {
+            console.error('Erro:', error);
+            
+            removeTypingIndicator();
+            
+            addMessageToChat('bot', 'Desculpe, ocorreu um erro ao processar sua solicitação. Por favor, tente novamente.', 'erro');
+        })
+        .finally(() => {
+            userInput.disabled = false;
+            sendButton.disabled = false;
+            userInput.focus();
+        });
+    }
+    
+    function requestMessage(message) {
+        return fetch('/api/chat', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -63,18 +94,86 @@ document.addEventListener('DOMContentLoaded', function() {
             addMessageToChat('bot', data.response, data.source);
             
             scrollToBottom();
+        });
+    }
+    
+    function streamMessage(message) {
+        return fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                message: message,
+                session_id: sessionId
+            })
         })
-        .catch(error => {
-            console.error('Erro:', error);
+        .then(response => {
+            if (!response.ok || !response.body) {
+                throw new Error('Erro na comunicação com o servidor');
+            }
             
-            removeTypingIndicator();
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let text = '';
+            let source = '';
+            let paragraph = null;
             
-            addMessageToChat('bot', 'Desculpe, ocorreu um erro ao processar sua solicitação. Por favor, tente novamente.', 'erro');
-        })
-        .finally(() => {
-            userInput.disabled = false;
-            sendButton.disabled = false;
-            userInput.focus();
+            function handleEvent(raw) {
+                let event = 'message';
+                let data = '';
+                raw.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) {
+                        event = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        data += line.slice(5).trim();
+                    }
+                });
+                if (!data) return;
+                
+                const payload = JSON.parse(data);
+                if (event === 'meta') {
+                    source = payload.source;
+                } else if (event === 'delta') {
+                    if (!paragraph) {
+                        removeTypingIndicator();
+                        paragraph = addMessageToChat('bot', '', source);
+                    }
+                    text += payload.text;
+                    paragraph.innerHTML = formatMessage(text);
+                    scrollToBottom();
+                } else if (event === 'error') {
+                    // o servidor já processou a mensagem; não reenviar para /api/chat
+                    const error = new Error(payload.error);
+                    error.streamStarted = true;
+                    throw error;
+                }
+            }
+            
+            function pump() {
+                return reader.read().then(({ done, value }) => {
+                    if (done) {
+                        if (!paragraph) {
+                            throw new Error('Resposta vazia do servidor');
+                        }
+                        return;
+                    }
+                    buffer += decoder.decode(value, { stream: true });
+                    let boundary;
+                    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                        handleEvent(buffer.slice(0, boundary));
+                        buffer = buffer.slice(boundary + 2);
+                    }
+                    return pump();
+                });
+            }
+            
+            return pump().catch(error => {
+                // Parte da resposta já foi exibida: não repetir a pergunta em /api/chat
+                error.streamStarted = error.streamStarted || paragraph !== null;
+                throw error;
+            });
         });
     }
     
@@ -107,6 +206,8 @@ document.addEventListener('DOMContentLoaded', function() {
         chatMessages.appendChild(messageDiv);
         
         scrollToBottom();
+        
+        return paragraph;
     }
     
     function showTypingIndicator() {
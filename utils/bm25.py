@@ -0,0 +1,194 @@
+"""
+Índice lexical BM25 dos chunks.
+
+Complementa a busca vetorial em consultas com siglas, nomes e códigos
+exatos ("FIES", "PROUNI", "TCC", nomes de portais), que os embeddings
+densos ranqueiam mal. Os documentos são os textos já pré-processados pelo
+TextProcessor (lematizados e sem stopwords), e as consultas devem passar
+pelo mesmo pré-processamento. Os termos do índice e das consultas são
+normalizados por ``keyword_mapper.fold`` (minúsculas e sem acentos), já que
+os lemas preservam a caixa dos nomes próprios ("Portal", "FIES", "Prouni").
+
+O peso BM25 de cada par (termo, chunk) não depende da consulta e é
+calculado na construção. A pontuação de uma consulta é só a soma dos pesos
+das listas de seus termos. O índice é salvo em .npz ao lado do índice FAISS.
+"""
+
+import logging
+import os
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import BM25_K1, BM25_B
+from utils.file_utils import atomic_path
+from utils.keyword_mapper import fold
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato salvo; índices de outra versão são reconstruídos
+BM25_FORMAT_VERSION = 2
+
+
+class BM25Index:
+    def __init__(self, terms: List[str], offsets: np.ndarray, rows: np.ndarray, weights: np.ndarray,
+                 size: int, k1: float = BM25_K1, b: float = BM25_B):
+        """
+        Inicializa o índice a partir das listas invertidas já montadas.
+
+        Args:
+            terms (list): Vocabulário, na ordem das listas
+            offsets (numpy.ndarray): Início da lista de cada termo em rows/weights (int64, tamanho termos + 1)
+            rows (numpy.ndarray): Linhas do ChunkStore de cada ocorrência (int32)
+            weights (numpy.ndarray): Peso BM25 de cada ocorrência (float32)
+            size (int): Número de chunks indexados
+            k1 (float): Saturação da frequência do termo
+            b (float): Normalização pelo tamanho do chunk
+        """
+        self.vocabulary: Dict[str, int] = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.rows = rows
+        self.weights = weights
+        self.size = size
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, texts: List[str], k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        """
+        Constrói o índice sobre textos já pré-processados.
+
+        Args:
+            texts (list): Texto de cada chunk, na ordem das linhas do ChunkStore
+            k1 (float): Saturação da frequência do termo
+            b (float): Normalização pelo tamanho do chunk
+
+        Returns:
+            BM25Index: Índice construído
+        """
+        frequencies = [Counter(fold(text).split()) for text in texts]
+        lengths = np.array([sum(counts.values()) for counts in frequencies], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for row, counts in enumerate(frequencies):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((row, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        rows, weights = [], []
+        n = len(texts)
+        for i, term in enumerate(terms):
+            found = postings[term]
+            idf = np.log(1.0 + (n - len(found) + 0.5) / (len(found) + 0.5))
+            for row, tf in found:
+                norm = k1 * (1.0 - b + b * lengths[row] / average_length)
+                rows.append(row)
+                weights.append(idf * tf * (k1 + 1.0) / (tf + norm))
+            offsets[i + 1] = len(rows)
+
+        return cls(terms, offsets, np.array(rows, dtype=np.int32), np.array(weights, dtype=np.float32), n, k1, b)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def scores(self, tokens: List[str]) -> np.ndarray:
+        """
+        Pontua todos os chunks para uma consulta.
+
+        Args:
+            tokens (list): Termos da consulta pré-processada (repetições contam uma vez;
+                caixa e acentos são ignorados)
+
+        Returns:
+            numpy.ndarray: Score BM25 por linha do ChunkStore (0 para chunks sem nenhum termo)
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in {fold(token) for token in tokens}:
+            i = self.vocabulary.get(term)
+            if i is not None:
+                start, end = self.offsets[i], self.offsets[i + 1]
+                scores[self.rows[start:end]] += self.weights[start:end]
+        return scores
+
+    def coverage(self, tokens: List[str], rows: List[int]) -> np.ndarray:
+        """
+        Mede quanto de uma consulta cada chunk contém.
+
+        Args:
+            tokens (list): Termos da consulta pré-processada
+            rows (list): Linhas do ChunkStore avaliadas
+
+        Returns:
+            numpy.ndarray: Para cada linha, a fração do IDF dos termos da consulta presentes
+                no chunk (termos fora do vocabulário contam com o IDF máximo)
+        """
+        rows = np.asarray(rows, dtype=np.int32)
+        matched = np.zeros(len(rows), dtype=np.float32)
+        total = 0.0
+        for term in {fold(token) for token in tokens}:
+            i = self.vocabulary.get(term)
+            found = 0 if i is None else int(self.offsets[i + 1] - self.offsets[i])
+            idf = float(np.log(1.0 + (self.size - found + 0.5) / (found + 0.5)))
+            total += idf
+            if i is not None:
+                matched += idf * np.isin(rows, self.rows[self.offsets[i]:self.offsets[i + 1]])
+        return matched / total if total > 0 else matched
+
+    def top_k(self, tokens: List[str], k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Retorna os chunks de maior score BM25 para uma consulta.
+
+        Args:
+            tokens (list): Termos da consulta pré-processada
+            k (int): Número máximo de resultados
+            mask (numpy.ndarray): Linhas permitidas (bool por linha), por exemplo por filtro de metadata
+
+        Returns:
+            list: Tuplas (linha, score), do maior para o menor score; só chunks com score > 0
+        """
+        scores = self.scores(tokens)
+        if mask is not None:
+            scores[~mask] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(row), float(scores[row])) for row in ordered]
+
+    def save(self, path: str):
+        """Salva o índice atomicamente em formato .npz."""
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        with atomic_path(path) as tmp_path:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    terms=np.array(terms, dtype=str),
+                    offsets=self.offsets,
+                    rows=self.rows,
+                    weights=self.weights,
+                    params=np.array([self.size, self.k1, self.b, BM25_FORMAT_VERSION], dtype=np.float64),
+                )
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        """
+        Carrega o índice salvo por ``save``.
+
+        Args:
+            path (str): Caminho do arquivo .npz
+
+        Returns:
+            BM25Index: Índice carregado, ou None se o arquivo não existir ou for de outra versão
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            params = data["params"].tolist()
+            if len(params) < 4 or int(params[3]) != BM25_FORMAT_VERSION:
+                logger.info(f"Índice BM25 em {path} está em outro formato e será reconstruído")
+                return None
+            size, k1, b = params[:3]
+            return cls(data["terms"].tolist(), data["offsets"], data["rows"], data["weights"], int(size), k1, b)
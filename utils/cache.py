@@ -1,53 +1,410 @@
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
 from collections import OrderedDict
 
-class LRUCache:
-    def __init__(self, capacity):
+from config import (
+    CACHE_SIZE, CACHE_TTL_SECONDS, CACHE_MAX_BYTES, CACHE_SHARDS, CACHE_BACKEND, CACHE_SQLITE_PATH
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAMESPACE = "default"
+
+# Gravações no SQLite entre duas limpezas de itens expirados e excedentes
+SQLITE_TRIM_INTERVAL = 100
+# Intervalo mínimo (s) entre duas atualizações de last_used do mesmo item no SQLite,
+# para que leituras frequentes não disputem a trava de escrita do WAL
+SQLITE_TOUCH_INTERVAL = 60
+
+
+class CacheBackend(ABC):
+    """
+    Interface comum dos caches de respostas.
+
+    Implementações: LRUCache (memória do processo) e SQLiteCache
+    (arquivo local compartilhado entre os workers). Use create_cache()
+    para obter a configurada em config.CACHE_BACKEND.
+    """
+
+    @abstractmethod
+    def get(self, key, namespace=DEFAULT_NAMESPACE):
+        ...
+
+    @abstractmethod
+    def put(self, key, value, namespace=DEFAULT_NAMESPACE, ttl=None):
+        ...
+
+    @abstractmethod
+    def invalidate_namespace(self, namespace):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def stats(self):
+        ...
+
+    @abstractmethod
+    def __len__(self):
+        ...
+
+
+class _Shard:
+    """Parte do cache com seu próprio lock, LRU e orçamento de memória."""
+
+    def __init__(self, capacity, max_bytes):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (namespace, key) -> (valor, expira_em, bytes)
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.bytes = 0
+
+
+class LRUCache(CacheBackend):
+    def __init__(self, capacity, ttl=CACHE_TTL_SECONDS, max_bytes=CACHE_MAX_BYTES, shards=CACHE_SHARDS):
         """
         Inicializa o cache LRU (Least Recently Used).
-        
+
+        As chaves são distribuídas entre shards independentes, cada um com seu
+        lock, para que requisições concorrentes não disputem um único lock.
+
         Args:
-            capacity (int): Capacidade máxima do cache
+            capacity (int): Capacidade máxima do cache (número de itens)
+            ttl (float): Validade padrão (s) de cada item; 0 ou None desativa a expiração
+            max_bytes (int): Memória máxima estimada dos itens; 0 ou None desativa o limite
+            shards (int): Número de shards
         """
-        self.cache = OrderedDict()
+        shards = max(1, min(shards, capacity))
         self.capacity = capacity
-        
-    def get(self, key):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._shards = [
+            _Shard(-(-capacity // shards), -(-max_bytes // shards) if max_bytes else None)
+            for _ in range(shards)
+        ]
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def _shard(self, key):
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key, namespace=DEFAULT_NAMESPACE):
         """
         Obtém um valor do cache, atualizando sua posição como mais recentemente usado.
-        
+
         Args:
             key (str): Chave a ser buscada
-            
+            namespace (str): Grupo da chave (ver invalidate_namespace)
+
         Returns:
-            any: Valor associado à chave ou None se não encontrado
+            any: Valor associado à chave ou None se não encontrado ou expirado
         """
-        if key not in self.cache:
-            return None
-            
-        value = self.cache.pop(key)
-        self.cache[key] = value
-        return value
-        
-    def put(self, key, value):
+        full_key = (namespace, key)
+        shard = self._shard(full_key)
+        expired = False
+        with shard.lock:
+            entry = shard.entries.get(full_key)
+            if entry is not None and entry[1] <= time.time():
+                self._remove(shard, full_key)
+                entry, expired = None, True
+            elif entry is not None:
+                shard.entries.move_to_end(full_key)
+
+        with self._stats_lock:
+            if entry is None:
+                self._misses += 1
+                self._expirations += expired
+            else:
+                self._hits += 1
+        return entry[0] if entry is not None else None
+
+    def put(self, key, value, namespace=DEFAULT_NAMESPACE, ttl=None):
         """
         Insere ou atualiza um valor no cache.
-        
+
         Args:
             key (str): Chave a ser inserida/atualizada
             value (any): Valor a ser armazenado
+            namespace (str): Grupo da chave (ver invalidate_namespace)
+            ttl (float): Validade (s) deste item; usa o padrão do cache se None
+        """
+        full_key = (namespace, key)
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else float('inf')
+        size = sys.getsizeof(key) + sys.getsizeof(value)
+        shard = self._shard(full_key)
+
+        evicted = 0
+        with shard.lock:
+            if full_key in shard.entries:
+                self._remove(shard, full_key)
+            shard.entries[full_key] = (value, expires_at, size)
+            shard.bytes += size
+            while len(shard.entries) > 1 and (
+                len(shard.entries) > shard.capacity
+                or (shard.max_bytes and shard.bytes > shard.max_bytes)
+            ):
+                self._remove(shard, next(iter(shard.entries)))
+                evicted += 1
+
+        if evicted:
+            with self._stats_lock:
+                self._evictions += evicted
+
+    def invalidate_namespace(self, namespace):
+        """
+        Remove todos os itens de um namespace.
+
+        Args:
+            namespace (str): Namespace a ser invalidado
+
+        Returns:
+            int: Número de itens removidos
+        """
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                for full_key in [k for k in shard.entries if k[0] == namespace]:
+                    self._remove(shard, full_key)
+                    removed += 1
+        return removed
+
+    def clear(self):
+        """Limpa todo o cache."""
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.bytes = 0
+
+    def stats(self):
+        """
+        Retorna métricas de uso do cache.
+
+        Returns:
+            dict: hits, misses, taxa de acerto, evicções, expirações, itens e memória estimada
+        """
+        entries = sum(len(shard.entries) for shard in self._shards)
+        used_bytes = sum(shard.bytes for shard in self._shards)
+        with self._stats_lock:
+            lookups = self._hits + self._misses
+            return {
+                'backend': 'memory',
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'size': entries,
+                'capacity': self.capacity,
+                'bytes': used_bytes,
+                'max_bytes': self.max_bytes,
+                'shards': len(self._shards)
+            }
+
+    @staticmethod
+    def _remove(shard, full_key):
+        # Deve ser chamado com o lock do shard adquirido
+        _, _, size = shard.entries.pop(full_key)
+        shard.bytes -= size
+
+    def __len__(self):
+        """Retorna o número de itens no cache."""
+        return sum(len(shard.entries) for shard in self._shards)
+
+
+class SQLiteCache(CacheBackend):
+    def __init__(self, path=CACHE_SQLITE_PATH, capacity=CACHE_SIZE, ttl=CACHE_TTL_SECONDS):
         """
-        if key in self.cache:
-            self.cache.pop(key)
-        elif len(self.cache) >= self.capacity:
-            self.cache.popitem(last=False)
-            
-        # add o novo item
-        self.cache[key] = value
-        
+        Inicializa um cache em SQLite compartilhado pelos processos da mesma máquina.
+
+        O banco usa WAL, de modo que leituras de um worker não bloqueiam a
+        escrita de outro. Os valores são serializados em JSON. Itens expirados
+        e excedentes são removidos a cada SQLITE_TRIM_INTERVAL gravações de cada
+        processo, então o banco pode passar um pouco da capacidade entre limpezas.
+        O último uso de um item só é regravado em uma leitura se tiver mais de
+        SQLITE_TOUCH_INTERVAL segundos, o que basta para a ordem de descarte.
+
+        Args:
+            path (str): Arquivo do banco
+            capacity (int): Capacidade máxima do cache (número de itens)
+            ttl (float): Validade padrão (s) de cada item; 0 ou None desativa a expiração
+        """
+        self.path = path
+        self.capacity = capacity
+        self.ttl = ttl
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, last_used REAL NOT NULL, size INTEGER NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_last_used ON cache (last_used)")
+
+    def _connection(self):
+        # sqlite3 não permite compartilhar conexões entre threads nem entre processos após fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, namespace=DEFAULT_NAMESPACE):
+        """
+        Obtém um valor do cache, atualizando seu último uso se estiver defasado.
+
+        Args:
+            key (str): Chave a ser buscada
+            namespace (str): Grupo da chave (ver invalidate_namespace)
+
+        Returns:
+            any: Valor associado à chave ou None se não encontrado ou expirado
+        """
+        now = time.time()
+        value = None
+        try:
+            with self._connection() as conn:
+                row = conn.execute(
+                    "SELECT value, last_used FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                    (namespace, str(key), now)
+                ).fetchone()
+                if row is not None:
+                    if now - row[1] >= SQLITE_TOUCH_INTERVAL:
+                        conn.execute("UPDATE cache SET last_used = ? WHERE namespace = ? AND key = ?",
+                                     (now, namespace, str(key)))
+                    value = json.loads(row[0])
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao ler o cache SQLite: {e}")
+
+        with self._stats_lock:
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return value
+
+    def put(self, key, value, namespace=DEFAULT_NAMESPACE, ttl=None):
+        """
+        Insere ou atualiza um valor no cache.
+
+        Args:
+            key (str): Chave a ser inserida/atualizada
+            value (any): Valor serializável em JSON
+            namespace (str): Grupo da chave (ver invalidate_namespace)
+            ttl (float): Validade (s) deste item; usa o padrão do cache se None
+        """
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = now + ttl if ttl else float('inf')
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._stats_lock:
+            self._writes += 1
+            trim = self._writes % SQLITE_TRIM_INTERVAL == 0
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, last_used, size) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, str(key), payload, expires_at, now, len(payload))
+                )
+                if trim:
+                    self._trim(conn, now)
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao gravar no cache SQLite: {e}")
+
+    def _trim(self, conn, now):
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        (entries,) = conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if entries > self.capacity:
+            # Os menos usados recentemente saem primeiro (índice em last_used)
+            conn.execute(
+                "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY last_used ASC LIMIT ?)",
+                (entries - self.capacity,)
+            )
+
+    def invalidate_namespace(self, namespace):
+        """
+        Remove todos os itens de um namespace.
+
+        Args:
+            namespace (str): Namespace a ser invalidado
+
+        Returns:
+            int: Número de itens removidos
+        """
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,)).rowcount
+
     def clear(self):
         """Limpa todo o cache."""
-        self.cache.clear()
-        
+        with self._connection() as conn:
+            conn.execute("DELETE FROM cache")
+
+    def stats(self):
+        """
+        Retorna métricas de uso do cache.
+
+        Os hits e misses são deste processo; itens e bytes são do banco compartilhado.
+
+        Returns:
+            dict: hits, misses, taxa de acerto, itens e tamanho dos valores
+        """
+        entries, used_bytes = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        with self._stats_lock:
+            lookups = self._hits + self._misses
+            return {
+                'backend': 'sqlite',
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'size': entries,
+                'capacity': self.capacity,
+                'bytes': used_bytes,
+                'path': self.path
+            }
+
     def __len__(self):
         """Retorna o número de itens no cache."""
-        return len(self.cache)
\ No newline at end of file
+        return self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+def create_cache(backend=CACHE_BACKEND, capacity=CACHE_SIZE):
+    """
+    Cria o cache de respostas configurado.
+
+    Args:
+        backend (str): "memory" (LRUCache do processo) ou "sqlite" (compartilhado entre workers)
+        capacity (int): Capacidade máxima do cache
+
+    Returns:
+        CacheBackend: Instância do cache
+    """
+    if backend == "memory":
+        return LRUCache(capacity)
+    if backend == "sqlite":
+        logger.info(f"Usando cache de respostas compartilhado em {CACHE_SQLITE_PATH}")
+        return SQLiteCache(CACHE_SQLITE_PATH, capacity)
+    raise ValueError(f"Backend de cache desconhecido: {backend}. Opções: memory, sqlite")
@@ -0,0 +1,64 @@
+"""
+Calibração do limiar de relevância da busca nos JSONs.
+
+A partir de consultas rotuladas (com os IDs de chunk esperados, ou nenhum
+quando a pergunta não está coberta pelos documentos), avalia cada limiar
+candidato e propõe os valores com melhor F1 e com alta precisão.
+"""
+
+from typing import Any, Dict, List
+
+
+def evaluate_thresholds(top_scores: List[float], correct: List[bool], higher_is_better: bool) -> List[Dict[str, Any]]:
+    """
+    Calcula precisão, recall e F1 para cada limiar candidato.
+
+    Uma consulta é aceita quando seu melhor score passa o limiar; o acerto é
+    um verdadeiro positivo quando os resultados contêm um chunk esperado.
+
+    Args:
+        top_scores (list): Melhor score de cada consulta
+        correct (list): Se os resultados da consulta contêm um chunk esperado
+        higher_is_better (bool): True para similaridade (cosseno), False para distância (L2)
+
+    Returns:
+        list: Linhas com threshold, precision, recall, f1 e accepted, na ordem dos limiares
+    """
+    total_correct = sum(correct)
+    rows = []
+    for threshold in sorted(set(top_scores), reverse=higher_is_better):
+        if higher_is_better:
+            accepted = [score >= threshold for score in top_scores]
+        else:
+            accepted = [score <= threshold for score in top_scores]
+        tp = sum(1 for a, c in zip(accepted, correct) if a and c)
+        n_accepted = sum(accepted)
+        precision = tp / n_accepted if n_accepted else 0.0
+        recall = tp / total_correct if total_correct else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        rows.append({
+            'threshold': float(threshold),
+            'precision': precision,
+            'recall': recall,
+            'f1': f1,
+            'accepted': n_accepted
+        })
+    return rows
+
+
+def propose_thresholds(rows: List[Dict[str, Any]], min_precision: float = 0.95) -> Dict[str, Any]:
+    """
+    Escolhe limiares a partir da avaliação de evaluate_thresholds.
+
+    Args:
+        rows (list): Saída de evaluate_thresholds
+        min_precision (float): Precisão mínima para a proposta conservadora
+
+    Returns:
+        dict: 'best_f1' (maior F1) e 'high_precision' (maior recall com precisão >= min_precision);
+              cada um pode ser None se não houver candidato
+    """
+    best_f1 = max(rows, key=lambda r: (r['f1'], r['recall']), default=None)
+    precise = [r for r in rows if r['precision'] >= min_precision and r['accepted']]
+    high_precision = max(precise, key=lambda r: (r['recall'], r['precision']), default=None)
+    return {'best_f1': best_f1, 'high_precision': high_precision}
@@ -0,0 +1,255 @@
+"""
+Armazenamento posicional dos chunks indexados no FAISS.
+
+Cada linha guarda um chunk e o rótulo (label) com que seu vetor foi
+adicionado ao índice FAISS. Em índices sem IDMap o rótulo é a própria
+posição do vetor; em índices com IDMap é um inteiro estável derivado do
+hash do conteúdo. A resolução de um resultado da busca (rótulo -> linha) é
+uma busca binária em arrays montados na construção, que no modo pre-fork
+ficam no processo mestre e são compartilhados pelos workers. Os textos e metadados ficam em colunas compactas (bytes
+UTF-8 concatenados + offsets), salvas em um único arquivo binário ao lado
+do ``json_docs.index``, que pode ser mapeado do disco em vez de lido
+(``load(path, mmap=True)``).
+"""
+
+import hashlib
+import json
+import struct
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+MAGIC = b"CRCHUNK1"
+ALIGNMENT = 64
+
+
+class ChunkStore:
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        """
+        Inicializa o store a partir das colunas já codificadas.
+
+        Args:
+            columns (dict): Para cada coluna textual, os arrays ``<nome>.data``
+                (uint8) e ``<nome>.offsets`` (int64, tamanho n + 1); ``labels`` (int64)
+        """
+        self.columns = columns
+        self._size = len(columns["ids.offsets"]) - 1
+        if "labels" not in self.columns:
+            # stores anteriores aos rótulos: o rótulo é a posição no índice
+            self.columns["labels"] = np.arange(self._size, dtype=np.int64)
+        # Arrays e não um dict: objetos Python teriam a contagem de referências
+        # alterada a cada consulta, copiando as páginas herdadas em cada worker
+        self._label_rows = np.argsort(self.labels, kind="stable")
+        self._sorted_labels = np.ascontiguousarray(self.labels[self._label_rows])
+
+    @classmethod
+    def from_records(cls, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]],
+                     labels: Optional[List[int]] = None, hashes: Optional[List[str]] = None) -> "ChunkStore":
+        """
+        Cria o store a partir de listas alinhadas.
+
+        Args:
+            ids (list): IDs dos chunks
+            texts (list): Textos dos chunks
+            metadatas (list): Metadados dos chunks
+            labels (list): Rótulos dos vetores no índice; por padrão, a posição de cada chunk
+            hashes (list): Hash de conteúdo de cada chunk (ver content_hash)
+
+        Returns:
+            ChunkStore: Store com as colunas codificadas
+        """
+        if not (len(ids) == len(texts) == len(metadatas)):
+            raise ValueError("ids, texts e metadatas devem ter o mesmo tamanho")
+
+        values = {
+            "ids": ids,
+            "texts": texts,
+            "metadata": [json.dumps(m, ensure_ascii=False) for m in metadatas],
+            "hashes": hashes if hashes is not None else [""] * len(ids),
+        }
+        columns = {}
+        for name, items in values.items():
+            data, offsets = _encode_strings(items)
+            columns[f"{name}.data"] = data
+            columns[f"{name}.offsets"] = offsets
+        if labels is not None:
+            columns["labels"] = np.asarray(labels, dtype=np.int64)
+        return cls(columns)
+
+    @classmethod
+    def from_mapping(cls, mapping: Dict[str, Dict[str, Any]]) -> "ChunkStore":
+        """
+        Converte o mapeamento legado ``id -> {'text', 'metadata'}`` (json_mapping.pkl).
+
+        A ordem das linhas é a ordem de inserção do dicionário, que era a
+        convenção implícita usada para casar o pickle com o índice.
+        """
+        ids = list(mapping.keys())
+        return cls.from_records(
+            ids,
+            [mapping[i]["text"] for i in ids],
+            [mapping[i]["metadata"] for i in ids],
+        )
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _string_at(self, column: str, row: int) -> str:
+        offsets = self.columns[f"{column}.offsets"]
+        start, end = offsets[row], offsets[row + 1]
+        return self.columns[f"{column}.data"][start:end].tobytes().decode("utf-8")
+
+    @property
+    def labels(self) -> np.ndarray:
+        """Rótulos dos vetores no índice, na ordem das linhas."""
+        return self.columns["labels"]
+
+    def row_for_label(self, label: int) -> int:
+        """
+        Converte o rótulo retornado pelo FAISS na linha do store.
+
+        Args:
+            label (int): Rótulo do vetor no índice
+
+        Returns:
+            int: Linha correspondente, ou -1 se o rótulo não existir
+        """
+        i = int(np.searchsorted(self._sorted_labels, label))
+        if i < self._size and self._sorted_labels[i] == label:
+            return int(self._label_rows[i])
+        return -1
+
+    def hash_at(self, row: int) -> str:
+        """Retorna o hash de conteúdo do chunk da linha informada (vazio em stores antigos)."""
+        if "hashes.offsets" not in self.columns:
+            return ""
+        return self._string_at("hashes", row)
+
+    def id_at(self, row: int) -> str:
+        """Retorna o ID do chunk da linha informada."""
+        return self._string_at("ids", row)
+
+    def text_at(self, row: int) -> str:
+        """Retorna o texto do chunk da linha informada."""
+        return self._string_at("texts", row)
+
+    def metadata_at(self, row: int) -> Dict[str, Any]:
+        """Retorna os metadados do chunk da linha informada."""
+        return json.loads(self._string_at("metadata", row))
+
+    def get(self, row: int) -> Dict[str, Any]:
+        """
+        Obtém o chunk armazenado em uma linha do índice.
+
+        Args:
+            row (int): Posição do vetor no índice FAISS
+
+        Returns:
+            dict: Chunk com 'id', 'text' e 'metadata'
+        """
+        if row < 0 or row >= self._size:
+            raise IndexError(f"Linha {row} fora do intervalo do ChunkStore ({self._size} chunks)")
+        return {
+            "id": self.id_at(row),
+            "text": self.text_at(row),
+            "metadata": self.metadata_at(row),
+        }
+
+    def ids(self) -> List[str]:
+        """Retorna todos os IDs na ordem das linhas."""
+        return [self.id_at(row) for row in range(self._size)]
+
+    def to_mapping(self) -> Dict[str, Dict[str, Any]]:
+        """Gera o mapeamento legado ``id -> {'text', 'metadata'}``."""
+        return {
+            self.id_at(row): {"text": self.text_at(row), "metadata": self.metadata_at(row)}
+            for row in range(self._size)
+        }
+
+    def save(self, path: str):
+        """
+        Salva as colunas em um único arquivo binário.
+
+        Formato: ``MAGIC`` + tamanho do cabeçalho (uint64) + cabeçalho JSON
+        descrevendo dtype, shape e offset de cada coluna, seguido dos arrays
+        brutos alinhados em 64 bytes.
+        """
+        layout = {}
+        offset = 0
+        for name, array in self.columns.items():
+            offset = _align(offset)
+            layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += array.nbytes
+
+        header = json.dumps({"rows": self._size, "columns": layout}).encode("utf-8")
+        data_start = _align(len(MAGIC) + 8 + len(header))
+
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for name, array in self.columns.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "ChunkStore":
+        """
+        Carrega o store salvo por ``save``.
+
+        Args:
+            path (str): Caminho do arquivo de chunks
+            mmap (bool): Mapeia as colunas do arquivo (somente leitura) em vez de
+                copiá-las para a memória; processos que abrem o mesmo arquivo
+                compartilham as páginas
+
+        Returns:
+            ChunkStore: Store carregado
+        """
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Arquivo de chunks inválido: {path}")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+            data_start = _align(len(MAGIC) + 8 + header_len)
+
+            columns = {}
+            for name, spec in header["columns"].items():
+                dtype = np.dtype(spec["dtype"])
+                count = int(np.prod(spec["shape"]))
+                if mmap and count > 0:
+                    columns[name] = np.memmap(f, dtype=dtype, mode="r", offset=data_start + spec["offset"],
+                                              shape=tuple(spec["shape"]))
+                    continue
+                f.seek(data_start + spec["offset"])
+                columns[name] = np.fromfile(f, dtype=dtype, count=count).reshape(spec["shape"])
+        return cls(columns)
+
+
+def content_hash(chunk_id: str, text: str, metadata: Dict[str, Any]) -> str:
+    """
+    Calcula o hash do conteúdo bruto de um chunk (ID, texto original e metadados).
+
+    Returns:
+        str: Hash SHA-1 em hexadecimal
+    """
+    payload = json.dumps({"id": chunk_id, "text": text, "metadata": metadata}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def label_from_hash(digest: str) -> int:
+    """Deriva um rótulo int64 positivo e estável para o IDMap do FAISS a partir do hash."""
+    return int(digest[:16], 16) & 0x7FFFFFFFFFFFFFFF
+
+
+def _encode_strings(items: List[str]):
+    encoded = [s.encode("utf-8") for s in items]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).copy()
+    return data, offsets
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
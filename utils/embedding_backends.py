@@ -0,0 +1,267 @@
+"""
+Backends de inferência do modelo de embeddings em CPU.
+
+- ``torch``: SentenceTransformer em float32 (padrão)
+- ``torch-int8``: o mesmo modelo com as camadas Linear quantizadas
+  dinamicamente para int8 (``torch.quantization.quantize_dynamic``)
+- ``onnx``: o modelo exportado por ``process_json.py export-onnx`` (transformer,
+  pooling e camada densa em um único grafo), executado no ONNX Runtime sem
+  carregar o PyTorch
+
+Todos expõem a interface do SentenceTransformer usada pelo JSONProcessor e
+pelo EmbeddingScheduler: ``encode`` e ``get_sentence_embedding_dimension``.
+O número de threads intra-op é fixado em EMBEDDING_THREADS, para que vários
+workers na mesma máquina não disputem os núcleos.
+
+Trocar de backend muda levemente os vetores; ``process_json.py parity``
+confere se a recuperação top-k continua a mesma do modelo float.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List
+
+import faiss
+import numpy as np
+
+from config import EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_ONNX_DIR, EMBEDDING_THREADS
+from utils.file_utils import atomic_path
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx")
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_META_FILE = "embedding_meta.json"
+
+
+def create_embedding_model(backend=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL,
+                           threads=EMBEDDING_THREADS, onnx_dir=EMBEDDING_ONNX_DIR):
+    """
+    Carrega o modelo de embeddings no backend configurado.
+
+    Args:
+        backend (str): "torch", "torch-int8" ou "onnx"
+        model_name (str): Modelo SentenceTransformer (nos backends torch)
+        threads (int): Threads intra-op da inferência; 0 mantém o padrão da biblioteca
+        onnx_dir (str): Diretório gerado por export_onnx (no backend onnx)
+
+    Returns:
+        Modelo com ``encode`` e ``get_sentence_embedding_dimension``
+    """
+    if backend in ("torch", "torch-int8"):
+        return _load_torch_model(model_name, threads, quantize=backend == "torch-int8")
+    if backend == "onnx":
+        return OnnxEmbeddingModel(onnx_dir, threads)
+    raise ValueError(f"Backend de embeddings desconhecido: {backend}. Opções: {', '.join(EMBEDDING_BACKENDS)}")
+
+
+def embedding_model_id(model_name=EMBEDDING_MODEL, backend=EMBEDDING_BACKEND) -> str:
+    """Identifica o espaço dos vetores gerados (modelo e backend), para os embeddings salvos."""
+    return model_name if backend == "torch" else f"{model_name}+{backend}"
+
+
+def _load_torch_model(model_name: str, threads: int, quantize: bool):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if threads:
+        torch.set_num_threads(threads)
+    if quantize:
+        # Pesos int8 só têm kernels em CPU
+        model = SentenceTransformer(model_name, device="cpu")
+        model.eval()
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        logger.info("Camadas Linear do modelo de embeddings quantizadas para int8")
+    else:
+        model = SentenceTransformer(model_name)
+    logger.info(f"Modelo de embeddings em PyTorch com {torch.get_num_threads()} threads intra-op")
+    return model
+
+
+class OnnxEmbeddingModel:
+    def __init__(self, model_dir: str, threads: int = EMBEDDING_THREADS):
+        """
+        Carrega o modelo exportado e o tokenizador salvo ao lado dele.
+
+        Args:
+            model_dir (str): Diretório gerado por export_onnx
+            threads (int): Threads intra-op do ONNX Runtime; 0 mantém o padrão
+
+        Raises:
+            FileNotFoundError: Se o modelo ainda não foi exportado
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_path = os.path.join(model_dir, ONNX_MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"Modelo ONNX não encontrado em {model_path}. Execute 'python process_json.py export-onnx'."
+            )
+        with open(os.path.join(model_dir, ONNX_META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = self.meta["max_seq_length"]
+        self.do_lower_case = self.meta.get("do_lower_case", False)
+        logger.info(f"Modelo de embeddings ONNX carregado de {model_path} ({self.meta['model_name']})")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.meta["dimension"]
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """
+        Gera os embeddings, como ``SentenceTransformer.encode``.
+
+        Args:
+            sentences (str | list): Texto ou lista de textos
+            batch_size (int): Textos por execução do modelo
+
+        Returns:
+            numpy.ndarray: Vetor float32 (texto único) ou matriz com um vetor por texto
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if self.do_lower_case:
+            texts = [text.lower() for text in texts]
+
+        embeddings = np.zeros((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        # Textos de tamanho parecido no mesmo lote reduzem o padding
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            features = self.tokenizer(
+                [texts[row] for row in rows], padding=True, truncation=True,
+                max_length=self.max_seq_length, return_tensors="np"
+            )
+            (output,) = self.session.run(None, {
+                "input_ids": features["input_ids"].astype(np.int64),
+                "attention_mask": features["attention_mask"].astype(np.int64),
+            })
+            embeddings[rows] = output
+        return embeddings[0] if single else embeddings
+
+
+def export_onnx(model_name=EMBEDDING_MODEL, output_dir=EMBEDDING_ONNX_DIR, opset: int = 14) -> str:
+    """
+    Exporta o SentenceTransformer completo (transformer, pooling e camadas densas) para ONNX.
+
+    Args:
+        model_name (str): Modelo SentenceTransformer
+        output_dir (str): Diretório de saída (modelo, tokenizador e metadados)
+        opset (int): Versão do opset ONNX
+
+    Returns:
+        str: Caminho do modelo exportado
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    model.eval()
+
+    class _SentenceEmbedding(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model({"input_ids": input_ids, "attention_mask": attention_mask})["sentence_embedding"]
+
+    features = model.tokenize(["exemplo de consulta para a exportação"])
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    logger.info(f"Exportando {model_name} para {model_path}...")
+    with torch.no_grad(), atomic_path(model_path) as tmp_path:
+        torch.onnx.export(
+            _SentenceEmbedding(model),
+            (features["input_ids"], features["attention_mask"]),
+            tmp_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["sentence_embedding"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "sentence_embedding": {0: "batch"},
+            },
+            opset_version=opset,
+        )
+    model.tokenizer.save_pretrained(output_dir)
+    meta = {
+        "model_name": model_name,
+        "dimension": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "do_lower_case": bool(getattr(model[0], "do_lower_case", False)),
+    }
+    with atomic_path(os.path.join(output_dir, ONNX_META_FILE)) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+    logger.info(f"Modelo ONNX exportado para {output_dir}")
+    return model_path
+
+
+def parity_report(reference, candidate, documents: List[str], queries: List[str], k: int = 5,
+                  metric: str = "l2", batch_size: int = 32) -> Dict[str, Any]:
+    """
+    Compara a recuperação top-k de dois modelos de embeddings sobre o mesmo corpus.
+
+    Cada modelo indexa os documentos e busca as consultas no seu próprio
+    espaço (busca exata), como aconteceria após reindexar com o backend.
+
+    Args:
+        reference: Modelo de referência (float32)
+        candidate: Modelo avaliado (quantizado ou ONNX)
+        documents (list): Textos pré-processados dos chunks
+        queries (list): Consultas pré-processadas
+        k (int): Número de resultados comparados
+        metric (str): "l2" ou "cosine"
+        batch_size (int): Textos por lote na codificação dos documentos
+
+    Returns:
+        dict: Sobreposição média do top-k, concordância do top-1, similaridade de
+              cosseno média entre os vetores das consultas e latência por consulta (ms)
+    """
+    k = min(k, len(documents))
+    results = {}
+    for name, model in (("reference", reference), ("candidate", candidate)):
+        doc_vectors = np.asarray(model.encode(documents, batch_size=batch_size, show_progress_bar=False), dtype=np.float32)
+        started = time.perf_counter()
+        query_vectors = np.stack([
+            np.asarray(model.encode([query], show_progress_bar=False), dtype=np.float32)[0] for query in queries
+        ])
+        latency_ms = (time.perf_counter() - started) * 1000.0 / len(queries)
+        if metric == "cosine":
+            faiss.normalize_L2(doc_vectors)
+            faiss.normalize_L2(query_vectors)
+            index = faiss.IndexFlatIP(doc_vectors.shape[1])
+        else:
+            index = faiss.IndexFlatL2(doc_vectors.shape[1])
+        index.add(doc_vectors)
+        _, labels = index.search(query_vectors, k)
+        results[name] = (labels, query_vectors, latency_ms)
+
+    reference_labels, reference_queries, reference_ms = results["reference"]
+    candidate_labels, candidate_queries, candidate_ms = results["candidate"]
+    overlaps = [len(set(a.tolist()) & set(b.tolist())) / k for a, b in zip(reference_labels, candidate_labels)]
+    norms = np.linalg.norm(reference_queries, axis=1) * np.linalg.norm(candidate_queries, axis=1)
+    cosines = np.sum(reference_queries * candidate_queries, axis=1) / np.maximum(norms, 1e-12)
+    return {
+        "queries": len(queries),
+        "documents": len(documents),
+        "k": k,
+        "overlap": float(np.mean(overlaps)),
+        "top1_agreement": float(np.mean(reference_labels[:, 0] == candidate_labels[:, 0])),
+        "identical_topk": float(np.mean([o == 1.0 for o in overlaps])),
+        "query_cosine": float(np.mean(cosines)),
+        "reference_ms": reference_ms,
+        "candidate_ms": candidate_ms,
+    }
@@ -0,0 +1,118 @@
+"""
+Cache dos embeddings de consultas, indexado pelo texto pré-processado.
+
+A chave é a saída de ``TextProcessor.preprocess`` (minúscula, lematizada e
+sem stopwords). Assim, variações de caixa e pontuação e paráfrases que se
+reduzem aos mesmos lemas reaproveitam o vetor sem passar pelo modelo.
+
+Os vetores ficam em uma matriz float32 pré-alocada (capacidade x
+dimensão), ocupada como um buffer circular. Quando ela enche, a entrada
+usada há mais tempo é descartada e sua linha é reaproveitada.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import EMBEDDING_CACHE_SIZE
+
+
+class EmbeddingCache:
+    def __init__(self, dimension: int, capacity: int = EMBEDDING_CACHE_SIZE):
+        """
+        Pré-aloca o buffer de vetores.
+
+        Args:
+            dimension (int): Dimensão dos embeddings
+            capacity (int): Número máximo de consultas armazenadas
+        """
+        self.dimension = dimension
+        self.capacity = capacity
+        self._vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        self._slots: "OrderedDict[str, int]" = OrderedDict()  # texto -> linha, do menos ao mais recente
+        self._next = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Busca os embeddings de vários textos pré-processados.
+
+        Args:
+            texts (list): Textos pré-processados
+
+        Returns:
+            list: Para cada texto, uma cópia do vetor float32, ou None se não estiver no cache
+        """
+        found = []
+        with self._lock:
+            for text in texts:
+                slot = self._slots.get(text)
+                if slot is None:
+                    self._misses += 1
+                    found.append(None)
+                    continue
+                self._slots.move_to_end(text)
+                self._hits += 1
+                # Cópia: a linha pode ser reaproveitada por outra consulta depois do retorno
+                found.append(self._vectors[slot].copy())
+        return found
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """
+        Armazena os embeddings de vários textos pré-processados.
+
+        Args:
+            texts (list): Textos pré-processados
+            vectors (numpy.ndarray): Um vetor por texto, na mesma ordem
+        """
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                slot = self._slots.get(text)
+                if slot is None:
+                    slot = self._allocate()
+                    self._slots[text] = slot
+                else:
+                    self._slots.move_to_end(text)
+                self._vectors[slot] = vector
+
+    def _allocate(self) -> int:
+        if self._next < self.capacity:
+            slot = self._next
+            self._next += 1
+            return slot
+        _, slot = self._slots.popitem(last=False)
+        self._evictions += 1
+        return slot
+
+    def clear(self):
+        """Descarta todos os vetores (por exemplo, ao trocar o modelo de embeddings)."""
+        with self._lock:
+            self._slots.clear()
+            self._next = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Retorna métricas de uso do cache.
+
+        Returns:
+            dict: hits, misses, taxa de acerto, evicções, itens, capacidade e bytes do buffer
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'size': len(self._slots),
+                'capacity': self.capacity,
+                'bytes': self._vectors.nbytes
+            }
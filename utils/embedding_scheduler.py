@@ -0,0 +1,192 @@
+"""
+Agendador de micro-lotes para embeddings de consultas.
+
+Requisições concorrentes enfileiram suas consultas; uma thread em segundo
+plano agrupa o que chegar dentro de uma janela curta (ou até o tamanho
+máximo do lote), faz um único ``encode`` e entrega a cada chamador o seu
+vetor por meio de um ``Future``.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError
+from typing import List
+
+import numpy as np
+
+from config import EMBEDDING_SCHEDULER_MAX_BATCH, EMBEDDING_SCHEDULER_WINDOW_MS, EMBEDDING_SCHEDULER_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Quantidade de amostras recentes usadas nos percentis de espera na fila
+_WAIT_SAMPLES = 2048
+
+
+class EmbeddingScheduler:
+    def __init__(self, model, max_batch_size=EMBEDDING_SCHEDULER_MAX_BATCH, window_ms=EMBEDDING_SCHEDULER_WINDOW_MS,
+                 timeout=EMBEDDING_SCHEDULER_TIMEOUT):
+        """
+        Inicializa o agendador.
+
+        Args:
+            model: Modelo com a interface ``encode`` do SentenceTransformer
+            max_batch_size (int): Tamanho máximo de cada lote
+            window_ms (float): Tempo máximo (ms) aguardando novas consultas após a primeira do lote
+            timeout (float): Tempo máximo (s) que encode espera pelos vetores
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000.0
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+        self._batches = 0
+        self._requests = 0
+        self._max_batch_seen = 0
+        self._waits = deque(maxlen=_WAIT_SAMPLES)
+
+    def submit(self, text: str) -> Future:
+        """
+        Enfileira uma consulta já pré-processada.
+
+        Args:
+            text (str): Texto a ser codificado
+
+        Returns:
+            Future: Resolve para o vetor float32 da consulta
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Codifica uma lista de textos pelo agendador, bloqueando até o resultado.
+
+        Args:
+            texts (list): Textos a serem codificados
+
+        Returns:
+            numpy.ndarray: Matriz float32 com um vetor por texto
+
+        Raises:
+            TimeoutError: Se os vetores não ficarem prontos em ``timeout`` segundos
+        """
+        futures = [self.submit(text) for text in texts]
+        deadline = time.monotonic() + self.timeout
+        try:
+            return np.vstack([
+                future.result(timeout=max(0.0, deadline - time.monotonic())) for future in futures
+            ]).astype('float32')
+        except TimeoutError:
+            for future in futures:
+                future.cancel()
+            logger.error(f"Embeddings de {len(texts)} consultas não ficaram prontos em {self.timeout}s")
+            raise
+
+    def _ensure_worker(self):
+        # A thread não sobrevive a um fork; recria no processo filho se necessário.
+        pid = os.getpid()
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == pid:
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == pid:
+                return
+            if self._worker_pid != pid:
+                self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, name="embedding-scheduler", daemon=True)
+            self._worker_pid = pid
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # Qualquer erro falha as consultas do lote, mas não pode encerrar a thread
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"Erro ao processar lote de embeddings ({len(batch)} consultas): {e}", exc_info=True)
+                for _, future, _ in batch:
+                    self._resolve(future, exception=e)
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        texts = [text for text, _, _ in batch]
+        try:
+            embeddings = self.model.encode(texts, show_progress_bar=False)
+            embeddings = np.asarray(embeddings, dtype='float32')
+        except Exception as e:
+            logger.error(f"Erro ao gerar embeddings do lote ({len(batch)} consultas): {e}")
+            for _, future, _ in batch:
+                self._resolve(future, exception=e)
+            return
+
+        for i, (_, future, _) in enumerate(batch):
+            self._resolve(future, result=embeddings[i])
+
+        with self._lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._waits.extend(started - enqueued for _, _, enqueued in batch)
+
+    @staticmethod
+    def _resolve(future: Future, result=None, exception: Exception = None):
+        # O chamador pode ter cancelado (timeout) enquanto o lote era processado
+        if future.done():
+            return
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def stats(self):
+        """
+        Retorna métricas de tamanho de lote e espera na fila.
+
+        Returns:
+            dict: Lotes, consultas, tamanho médio e maior lote e percentis de espera (ms)
+        """
+        with self._lock:
+            waits = np.array(self._waits, dtype='float64') * 1000.0
+            batches = self._batches
+            requests = self._requests
+            max_batch = self._max_batch_seen
+
+        stats = {
+            'batches': batches,
+            'requests': requests,
+            'mean_batch_size': requests / batches if batches else 0.0,
+            'largest_batch': max_batch,
+            'queue_depth': self._queue.qsize(),
+            'window_ms': self.window * 1000.0,
+            'max_batch_size': self.max_batch_size,
+        }
+        if len(waits):
+            stats['queue_wait_ms'] = {
+                'p50': float(np.percentile(waits, 50)),
+                'p95': float(np.percentile(waits, 95)),
+                'p99': float(np.percentile(waits, 99)),
+                'max': float(waits.max()),
+            }
+        return stats
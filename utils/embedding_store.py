@@ -0,0 +1,93 @@
+"""
+Store persistente de embeddings dos chunks, indexado pelo hash do conteúdo.
+
+Permite que a reindexação incremental reaproveite o texto pré-processado e
+o vetor de chunks que não mudaram, gerando embeddings apenas para os novos
+ou alterados.
+"""
+
+import logging
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from utils.file_utils import atomic_path
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingStore:
+    def __init__(self, model_name: str):
+        """
+        Inicializa um store vazio.
+
+        Args:
+            model_name (str): Modelo que gerou os vetores; stores de outro modelo são descartados
+        """
+        self.model_name = model_name
+        self._entries: Dict[str, Tuple[str, np.ndarray]] = {}
+
+    @classmethod
+    def load(cls, path: str, model_name: str) -> "EmbeddingStore":
+        """
+        Carrega o store salvo, ou retorna um store vazio se não existir ou for de outro modelo.
+
+        Args:
+            path (str): Caminho do arquivo .npz
+            model_name (str): Modelo de embeddings atual
+
+        Returns:
+            EmbeddingStore: Store carregado
+        """
+        store = cls(model_name)
+        if not os.path.exists(path):
+            return store
+
+        with np.load(path, allow_pickle=False) as data:
+            saved_model = str(data["model"])
+            if saved_model != model_name:
+                logger.warning(f"Embeddings salvos são do modelo '{saved_model}'; serão regenerados com '{model_name}'")
+                return store
+            for digest, text, vector in zip(data["hashes"], data["texts"], data["vectors"]):
+                store._entries[str(digest)] = (str(text), vector)
+        logger.info(f"{len(store)} embeddings reaproveitáveis carregados de {path}")
+        return store
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._entries
+
+    def get(self, digest: str) -> Optional[Tuple[str, np.ndarray]]:
+        """Retorna (texto pré-processado, vetor) do chunk com o hash informado, se existir."""
+        return self._entries.get(digest)
+
+    def texts(self) -> Dict[str, str]:
+        """Retorna o mapeamento hash -> texto pré-processado."""
+        return {digest: text for digest, (text, _) in self._entries.items()}
+
+    def put(self, digest: str, text: str, vector: np.ndarray):
+        """Armazena o texto pré-processado e o vetor de um chunk."""
+        self._entries[digest] = (text, np.asarray(vector, dtype=np.float32))
+
+    def retain(self, digests: Iterable[str]):
+        """Descarta as entradas cujos hashes não estão em ``digests`` (chunks removidos)."""
+        keep = set(digests)
+        self._entries = {d: entry for d, entry in self._entries.items() if d in keep}
+
+    def save(self, path: str):
+        """Salva o store atomicamente em formato .npz."""
+        digests = list(self._entries)
+        texts = [self._entries[d][0] for d in digests]
+        vectors = np.vstack([self._entries[d][1] for d in digests]) if digests else np.zeros((0, 0), np.float32)
+        with atomic_path(path) as tmp_path:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    model=np.array(self.model_name),
+                    hashes=np.array(digests, dtype=str),
+                    texts=np.array(texts, dtype=str),
+                    vectors=vectors.astype(np.float32),
+                )
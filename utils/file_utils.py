@@ -0,0 +1,25 @@
+"""Utilitários de escrita segura de arquivos."""
+
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_path(path: str):
+    """
+    Fornece um caminho temporário no mesmo diretório de ``path`` e, se o bloco
+    terminar sem erro, substitui ``path`` atomicamente com ``os.replace``.
+
+    Leitores concorrentes veem sempre o arquivo antigo completo ou o novo
+    completo, nunca uma escrita pela metade.
+
+    Args:
+        path (str): Caminho final do arquivo
+    """
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -1,6 +1,8 @@
 import google.generativeai as genai
 from config import GEMINI_API_KEY, GEMINI_MODEL
 from data.persona import get_persona, get_saudacao, get_despedida, get_resposta_contextual
+from utils.token_usage import TokenUsageTracker
+from utils.prompt_builder import PromptBuilder
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,95 +22,107 @@ class GeminiClient:
                 }
             )
             self.persona = get_persona()
+            self.prompt_builder = PromptBuilder(self.persona)
+            self.token_usage = TokenUsageTracker()
             print(f"Cliente Gemini inicializado com modelo: {GEMINI_MODEL}")
         except Exception as e:
             print(f"Erro ao inicializar cliente Gemini: {e}")
             raise
             
-    def generate_response(self, prompt, conversation_history=None, json_context=None):
+    def generate_response(self, prompt, conversation_history=None, results=None, source="gemini"):
         """
         Gera uma resposta usando a API do Gemini.
         
         Args:
             prompt (str): Prompt do usuário
             conversation_history (list): Histórico da conversa
-            json_context (str): Contexto extraído dos documentos JSON
+            results (list): Chunks encontrados nos JSONs, do mais para o menos relevante
+            source (str): Origem da resposta, usada na contabilidade de tokens
             
         Returns:
-            str: Resposta gerada pelo modelo
+            tuple: (resposta, gerada). gerada é False quando a resposta é a mensagem
+                   padrão da persona, devolvida após uma falha do modelo
         """
         try:
-            context = ""
-            if conversation_history and len(conversation_history) > 0:
-                for message in conversation_history[-10:]:  # últimas 10 mensagens como contexto
-                    role = "Usuário" if message['role'] == 'user' else "Assistente"
-                    context += f"{role}: {message['content']}\n"
-
-            # persona
-            persona_instructions = f"""
-            Você é {self.persona['nome']}, uma {self.persona['cargo']} de {self.persona['idade']}.
-            
-            Suas características de personalidade são:
-            - Tom de voz: {self.persona['personalidade']['tom_de_voz']}
-            - Nível de formalidade: {self.persona['personalidade']['nivel_formalidade']}
-            - Traços principais: {', '.join(self.persona['personalidade']['tracos_principais'])}
-            
-            Suas especialidades incluem:
-            {', '.join(self.persona['especialidades'])}
-            
-            Diretrizes de comunicação:
-            - Usar linguagem acadêmica apropriada
-            - usar emojis
-            - Manter profissionalismo e empatia
-            - Priorizar soluções claras e objetivas
-            
-            Se a pergunta envolver temas sensíveis ou restritos como {', '.join(self.persona['restricoes']['nao_fornecer'])}, 
-            você deve informar que não pode fornecer essas informações por questões de segurança e privacidade.
-            
-            Se a situação exigir encaminhamento como em casos de {', '.join(self.persona['restricoes']['encaminhar_para_humano'])}, 
-            você deve sugerir o contato com o setor apropriado.
-            """
-            
-            if json_context:
-                structured_context = """
-                VOCÊ É UM ASSISTENTE DE ALUNOS E DEVE RESPONDER ÀS PERGUNTAS **SOMENTE** BASEANDO-SE NAS "INFORMAÇÕES RELEVANTES DOS DOCUMENTOS" FORNECIDAS ABAIXO. NÃO INVENTE INFORMAÇÕES NEM USE CONHECIMENTO PRÉVIO. SE A RESPOSTA NÃO PUDER SER FORMULADA DIRETAMENTE DO CONTEXTO, INDIQUE CLARAMENTE QUE A INFORMAÇÃO NÃO FOI ENCONTRADA.
-                
-                INFORMAÇÕES RELEVANTES DOS DOCUMENTOS:
-                """
-                structured_context += json_context
-
-                structured_context += """\nDIRETRIZES ADICIONAIS DE RESPOSTA:\n"
-                structured_context += "1. Ao responder sobre abono de faltas, baseie-se estritamente nas informações dos documentos, especialmente no chunk_4_2 e chunk_5_1_1. Se o motivo da ausência não estiver explicitamente listado como justificativa para ABONO (apenas reservista ou luto), informe que o abono não é possível. Se a informação sobre 'Licença Médica' (chunk_5_1_1) for relevante para a pergunta do usuário e a duração do afastamento for de 7 dias ou mais (para graduação), forneça os detalhes sobre o 'Regime Especial de Trabalhos Domiciliares' e a necessidade de protocolar o atestado original em até 72 horas via Portal Acadêmico. Doenças simples ou \"fiquei doente\" sem atestado e sem atender aos critérios de duração de licença médica NÃO são motivos válidos para abono de faltas ou regime especial.\n"
-                structured_context += "2. Se a pergunta for sobre 'Achados e Perdidos' e o contexto incluir o chunk_1_1, informe que o local para procurar e registrar itens perdidos é a Central de Atendimento ao Aluno.\n"
-                structured_context += "3. Extrema importância: Responda de forma concisa e direta, extraindo a informação principal do contexto.\n"
-                structured_context += "4. Mantenha um tom profissional e empático, utilizando linguagem acadêmica apropriada.\n"
-                structured_context += "5. Ao citar informações que contenham links (URLs), evite repetir a URL explicitamente se ela já estiver incorporada em uma frase ou instrução no texto do documento. Em vez disso, foque em integrar a informação do link na sua explicação de forma fluida, referenciando o local ou a ação sem duplicar a URL literal.\n"
-                structured_context += "6. Se as informações fornecidas não forem suficientes para uma resposta completa ou não abordarem a pergunta, use a frase EXATA: 'Peço desculpas, mas não encontrei informações detalhadas sobre isso em meus documentos. Recomendo que você procure em outros canais de comunicação oficial para obter a informação completa.'\n"
-                structured_context += "7. Evite generalizações ou conselhos que não estejam explicitamente nos documentos."
-                structured_context += "8. Seja compreensivo e auxilie o usuário, caso ele não entenda a resposta, tente explicar de forma clara e objetiva."
-                """
-
-
-                full_prompt = f"{persona_instructions}\n\n{structured_context}\n\nHistórico da conversa:\n{context}\nUsuário: {prompt}\nAssistente:"
-            else:
-                full_prompt = f"{persona_instructions}\n\nHistórico da conversa:\n{context}\nUsuário: {prompt}\nAssistente:"
+            full_prompt = self.prompt_builder.build(prompt, conversation_history, results)
             
             try:
-                token_count = self.model.count_tokens(full_prompt).total_tokens
-                logger.info(f"Tokens enviados para a API do Gemini: {token_count}")
                 response = self.model.generate_content(full_prompt)
                 if response and hasattr(response, 'text'):
-                    return response.text
+                    self.token_usage.record_response(source, response, full_prompt, response.text)
+                    return response.text, True
                 else:
                     print("Resposta vazia ou inválida do modelo")
-                    return self.persona['comportamento']['nao_entendeu']
+                    return self.persona['comportamento']['nao_entendeu'], False
             except Exception as e:
                 print(f"Erro específico na geração de conteúdo: {e}")
-                return self.persona['comportamento']['nao_entendeu']
+                return self.persona['comportamento']['nao_entendeu'], False
             
         except Exception as e:
             print(f"Erro ao gerar resposta com Gemini: {e}")
-            return self.persona['comportamento']['nao_entendeu']
+            return self.persona['comportamento']['nao_entendeu'], False
+
+    async def generate_response_async(self, prompt, conversation_history=None, results=None, source="gemini"):
+        """
+        Gera uma resposta usando a API assíncrona do Gemini, sem ocupar uma thread durante a chamada.
+        
+        Args:
+            prompt (str): Prompt do usuário
+            conversation_history (list): Histórico da conversa
+            results (list): Chunks encontrados nos JSONs, do mais para o menos relevante
+            source (str): Origem da resposta, usada na contabilidade de tokens
+            
+        Returns:
+            tuple: (resposta, gerada), como em generate_response
+        """
+        try:
+            full_prompt = self.prompt_builder.build(prompt, conversation_history, results)
+            response = await self.model.generate_content_async(full_prompt)
+            if response and hasattr(response, 'text'):
+                self.token_usage.record_response(source, response, full_prompt, response.text)
+                return response.text, True
+            logger.warning("Resposta vazia ou inválida do modelo")
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta assíncrona com Gemini: {e}")
+        return self.persona['comportamento']['nao_entendeu'], False
+
+    def generate_response_stream(self, prompt, conversation_history=None, results=None, source="gemini"):
+        """
+        Gera uma resposta usando a API do Gemini, entregando o texto à medida que é produzido.
+        
+        Args:
+            prompt (str): Prompt do usuário
+            conversation_history (list): Histórico da conversa
+            results (list): Chunks encontrados nos JSONs, do mais para o menos relevante
+            source (str): Origem da resposta, usada na contabilidade de tokens
+            
+        Yields:
+            str: Trechos consecutivos da resposta
+
+        Raises:
+            Exception: Se a geração falhar ou terminar sem texto, inclusive depois de
+                alguns trechos já entregues; o texto parcial não é uma resposta completa
+        """
+        parts = []
+        try:
+            full_prompt = self.prompt_builder.build(prompt, conversation_history, results)
+            response = self.model.generate_content(full_prompt, stream=True)
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # trecho sem texto (ex.: bloqueado por segurança ou apenas metadados)
+                    continue
+                if text:
+                    parts.append(text)
+                    yield text
+            # usage_metadata fica disponível na resposta depois de consumido o stream
+            self.token_usage.record_response(source, response, full_prompt, "".join(parts))
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta em streaming com Gemini: {e}")
+            raise
+        if not parts:
+            raise ValueError("Resposta vazia ou inválida do modelo")
 
     def get_initial_greeting(self):
         """Retorna a saudação inicial da persona."""
@@ -0,0 +1,210 @@
+"""
+Construção dos índices FAISS usados na busca dos chunks.
+
+O tipo de índice é escolhido em ``config.FAISS_INDEX_TYPE``:
+
+- ``flat``: busca exata (força bruta), referência de qualidade
+- ``ivf``: IVF-Flat treinado com ``nlist`` centróides, busca em ``nprobe`` listas
+- ``hnsw``: grafo HNSW com ``M`` vizinhos e ``efSearch`` na consulta
+- ``sq8``: vetores quantizados escalarmente em 8 bits
+- ``pq``: quantização por produto com ``m`` subvetores
+- ``ivfpq``: IVF com listas comprimidas por PQ
+
+Com ``metric="cosine"`` os índices usam produto interno; os vetores devem
+chegar já normalizados (L2), de modo que o produto interno é o cosseno.
+"""
+
+import logging
+import math
+import time
+from typing import Any, Dict, List
+
+import faiss
+import numpy as np
+
+from config import (
+    FAISS_IVF_NLIST, FAISS_IVF_NPROBE, FAISS_HNSW_M, FAISS_HNSW_EF_CONSTRUCTION,
+    FAISS_HNSW_EF_SEARCH, FAISS_PQ_M, FAISS_PQ_NBITS
+)
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "sq8", "pq", "ivfpq")
+# Tipos cuja busca aceita IDSelector (IndexPQ não aceita)
+FILTERABLE_INDEX_TYPES = ("flat", "ivf", "hnsw", "sq8", "ivfpq")
+METRICS = {
+    "l2": faiss.METRIC_L2,
+    "cosine": faiss.METRIC_INNER_PRODUCT,
+}
+
+
+def build_index(index_type: str, dimension: int, vectors: np.ndarray, metric: str = "l2", ids=None):
+    """
+    Cria, treina (quando necessário) e popula um índice FAISS.
+
+    Args:
+        index_type (str): Um dos valores de INDEX_TYPES
+        dimension (int): Dimensão dos embeddings
+        vectors (numpy.ndarray): Vetores float32 a serem indexados, também usados no treino
+        metric (str): "l2" ou "cosine"
+        ids (array): Rótulos int64 dos vetores; quando informados, o índice é
+            envolvido em um IndexIDMap2, que permite ``remove_ids``/``add_with_ids``
+
+    Returns:
+        tuple: (índice populado, parâmetros efetivamente usados)
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Tipo de índice desconhecido: {index_type}. Opções: {', '.join(INDEX_TYPES)}")
+    if metric not in METRICS:
+        raise ValueError(f"Métrica desconhecida: {metric}. Opções: {', '.join(METRICS)}")
+
+    n = len(vectors)
+    params: Dict[str, Any] = {}
+
+    if index_type == "flat":
+        description = "Flat"
+    elif index_type == "hnsw":
+        description = f"HNSW{FAISS_HNSW_M}"
+        params.update(m=FAISS_HNSW_M, ef_construction=FAISS_HNSW_EF_CONSTRUCTION, ef_search=FAISS_HNSW_EF_SEARCH)
+    elif index_type == "sq8":
+        description = "SQ8"
+    elif index_type == "pq":
+        m, nbits = _pq_params(dimension, n)
+        description = f"PQ{m}x{nbits}"
+        params.update(m=m, nbits=nbits)
+    else:
+        nlist = _ivf_nlist(n)
+        params.update(nlist=nlist, nprobe=min(FAISS_IVF_NPROBE, nlist))
+        if index_type == "ivf":
+            description = f"IVF{nlist},Flat"
+        else:
+            m, nbits = _pq_params(dimension, n)
+            description = f"IVF{nlist},PQ{m}x{nbits}"
+            params.update(m=m, nbits=nbits)
+
+    index = faiss.index_factory(dimension, description, METRICS[metric])
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+
+    if not index.is_trained:
+        logger.info(f"Treinando índice '{index_type}' com {n} vetores...")
+        index.train(vectors)
+    if ids is not None:
+        index = faiss.IndexIDMap2(index)
+        index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+    else:
+        index.add(vectors)
+    configure_search(index, index_type, params)
+    return index, params
+
+
+def configure_search(index, index_type: str, params: Dict[str, Any]):
+    """
+    Aplica os parâmetros de busca (nprobe, efSearch) a um índice criado ou carregado do disco.
+
+    Args:
+        index: Índice FAISS
+        index_type (str): Tipo do índice
+        params (dict): Parâmetros salvos junto do índice
+    """
+    index = base_index(index)
+    if index_type in ("ivf", "ivfpq"):
+        faiss.extract_index_ivf(index).nprobe = params.get("nprobe", FAISS_IVF_NPROBE)
+    elif index_type == "hnsw":
+        index.hnsw.efSearch = params.get("ef_search", FAISS_HNSW_EF_SEARCH)
+
+
+def search_parameters(index, index_type: str, params: Dict[str, Any], selector):
+    """
+    Monta os SearchParameters que restringem uma busca aos rótulos de um IDSelector.
+
+    Os parâmetros por consulta substituem os do índice, então nprobe e
+    efSearch são repetidos a partir dos parâmetros salvos.
+
+    Args:
+        index: Índice FAISS (com ou sem IDMap)
+        index_type (str): Tipo do índice
+        params (dict): Parâmetros salvos junto do índice
+        selector: faiss.IDSelector com os rótulos permitidos
+
+    Returns:
+        faiss.SearchParameters ou None se o tipo de índice não aceita seletor (pq)
+    """
+    if index_type in FILTERABLE_INDEX_TYPES:
+        inner = base_index(index)
+        if isinstance(inner, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=params.get("nprobe", inner.nprobe))
+        if isinstance(inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=params.get("ef_search", inner.hnsw.efSearch))
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def base_index(index):
+    """Retorna o índice interno de um IndexIDMap/IndexIDMap2, ou o próprio índice."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def _ivf_nlist(n: int) -> int:
+    # não é possível treinar mais centróides do que vetores
+    nlist = min(FAISS_IVF_NLIST, max(1, n))
+    if nlist < FAISS_IVF_NLIST:
+        logger.warning(f"Corpus com {n} vetores: nlist reduzido de {FAISS_IVF_NLIST} para {nlist}")
+    return nlist
+
+
+def _pq_params(dimension: int, n: int):
+    m = FAISS_PQ_M
+    while dimension % m:
+        m -= 1
+    # cada subquantizador precisa de ao menos 2^nbits vetores de treino
+    nbits = min(FAISS_PQ_NBITS, max(1, int(math.log2(max(n, 2)))))
+    if (m, nbits) != (FAISS_PQ_M, FAISS_PQ_NBITS):
+        logger.warning(f"Parâmetros de PQ ajustados para m={m}, nbits={nbits} (dimensão {dimension}, {n} vetores)")
+    return m, nbits
+
+
+def benchmark_backends(vectors: np.ndarray, queries: np.ndarray, k: int,
+                       index_types: List[str] = INDEX_TYPES, metric: str = "l2") -> List[Dict[str, Any]]:
+    """
+    Compara recall@k e latência de cada tipo de índice contra a busca exata.
+
+    Args:
+        vectors (numpy.ndarray): Vetores do corpus
+        queries (numpy.ndarray): Vetores das consultas de teste
+        k (int): Número de vizinhos avaliados
+        index_types (list): Tipos de índice a comparar
+        metric (str): "l2" ou "cosine"
+
+    Returns:
+        list: Uma linha por tipo com recall@k, latência média por consulta (ms),
+              tempo de construção (s) e tamanho serializado (bytes)
+    """
+    dimension = vectors.shape[1]
+    k = min(k, len(vectors))
+    baseline, _ = build_index("flat", dimension, vectors, metric)
+    _, expected = baseline.search(queries, k)
+
+    report = []
+    for index_type in index_types:
+        started = time.perf_counter()
+        index, params = build_index(index_type, dimension, vectors, metric)
+        build_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        _, found = index.search(queries, k)
+        latency_ms = (time.perf_counter() - started) * 1000.0 / len(queries)
+
+        hits = sum(len(set(found[i]) & set(expected[i])) for i in range(len(queries)))
+        report.append({
+            'index_type': index_type,
+            'params': params,
+            'recall': hits / float(len(queries) * k),
+            'latency_ms': latency_ms,
+            'build_s': build_time,
+            'size_bytes': int(faiss.serialize_index(index).size),
+        })
+    return report
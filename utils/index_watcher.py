@@ -0,0 +1,80 @@
+"""
+Observa o arquivo do índice FAISS e recarrega o JSONProcessor quando ele muda.
+
+O process_json.py grava o arquivo do índice por último (via os.replace), então
+uma mudança no seu mtime indica que uma nova versão completa está em disco.
+"""
+
+import logging
+import os
+import threading
+
+from config import FAISS_JSON_INDEX_PATH, INDEX_WATCH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class IndexWatcher:
+    def __init__(self, json_processor, path=FAISS_JSON_INDEX_PATH, interval=INDEX_WATCH_INTERVAL):
+        """
+        Inicializa o observador.
+
+        Args:
+            json_processor: Instância de JSONProcessor a ser recarregada
+            path (str): Arquivo observado
+            interval (float): Intervalo (s) entre verificações do mtime
+        """
+        self.json_processor = json_processor
+        self.path = path
+        self.interval = interval
+        self._mtime = self._current_mtime()
+        self._stop = threading.Event()
+        self._thread = None
+        # Recargas feitas por outros caminhos (POST /api/admin/reload-index) também
+        # atualizam o mtime conhecido, para a próxima verificação não repeti-las
+        json_processor.add_reload_listener(self._on_reload)
+
+    def start(self):
+        """Inicia a verificação periódica em uma thread daemon."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="index-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Observando {self.path} a cada {self.interval}s")
+
+    def stop(self):
+        """Interrompe a verificação periódica."""
+        self._stop.set()
+
+    def check(self) -> bool:
+        """
+        Recarrega o índice se o arquivo mudou desde a última verificação.
+
+        Returns:
+            bool: True se uma nova versão foi publicada
+        """
+        mtime = self._current_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+        logger.info(f"Mudança detectada em {self.path}; recarregando índice...")
+        reloaded = self.json_processor.reload_index()
+        if reloaded:
+            self._mtime = mtime
+        return reloaded
+
+    def _on_reload(self, previous, current):
+        self._mtime = self._current_mtime()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Erro ao verificar o índice: {e}", exc_info=True)
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
@@ -3,72 +3,344 @@ import json
 import logging
 import pickle
 import re
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
+import threading
+from typing import List, Dict, Any, NamedTuple
 import faiss
 import numpy as np
 
 from config import (
-    EMBEDDING_MODEL, FAISS_INDEX_DIR, FAISS_JSON_INDEX_PATH, FAISS_JSON_MAPPING_PATH,
-    EMBEDDING_BATCH_SIZE, RAG_CHUNK_SIZE, RAG_CHUNK_OVERLAP,
-    SPACY_MODEL, MIN_CHUNK_SIZE, MAX_CHUNK_SIZE
+    EMBEDDING_MODEL, EMBEDDING_BACKEND, FAISS_INDEX_DIR, FAISS_JSON_INDEX_PATH, FAISS_JSON_MAPPING_PATH,
+    FAISS_JSON_CHUNKS_PATH, FAISS_JSON_META_PATH, FAISS_JSON_EMBEDDINGS_PATH, FAISS_INDEX_TYPE, FAISS_METRIC,
+    JSON_SIMILARITY_THRESHOLD, JSON_COSINE_SIMILARITY_THRESHOLD,
+    EMBEDDING_BATCH_SIZE, EMBEDDING_SCHEDULER_ENABLED, EMBEDDING_CACHE_SIZE, RAG_CHUNK_SIZE, RAG_CHUNK_OVERLAP,
+    MIN_CHUNK_SIZE, MAX_CHUNK_SIZE, SEARCH_FILTER_OVERFETCH, FAISS_JSON_BM25_PATH, BM25_K1, BM25_B,
+    RETRIEVAL_MODE, RRF_K, HYBRID_CANDIDATES, BM25_MIN_SCORE, BM25_MIN_COVERAGE
 )
+from utils.bm25 import BM25Index
+from utils.chunk_store import ChunkStore, content_hash, label_from_hash
+from utils.embedding_backends import create_embedding_model, embedding_model_id
+from utils.embedding_cache import EmbeddingCache
+from utils.embedding_scheduler import EmbeddingScheduler
+from utils.embedding_store import EmbeddingStore
+from utils.file_utils import atomic_path
+from utils.index_factory import build_index, configure_search, search_parameters
+from utils.metadata_index import MetadataIndex
 from utils.text_processor import TextProcessor
 
-try:
-    import spacy
-    nlp = spacy.load(SPACY_MODEL)
-except Exception as e:
-    logging.error(f"Erro ao carregar o modelo spaCy '{SPACY_MODEL}': {e}")
-    nlp = None
-
 logger = logging.getLogger(__name__)
 
+class IndexSnapshot(NamedTuple):
+    """Índice, chunks e metadados de uma mesma versão do corpus, trocados sempre juntos."""
+    index: Any
+    chunk_store: ChunkStore
+    meta: Dict[str, Any]
+    metadata_index: MetadataIndex
+    bm25: BM25Index
+
+    @classmethod
+    def create(cls, index, chunk_store: ChunkStore, meta: Dict[str, Any], bm25: BM25Index = None) -> "IndexSnapshot":
+        """
+        Monta o snapshot e o índice invertido dos metadados dos seus chunks.
+
+        O índice BM25 salvo é reaproveitado se corresponder aos chunks; caso
+        contrário, é reconstruído a partir dos textos pré-processados do store.
+        """
+        if bm25 is None or len(bm25) != len(chunk_store) or (bm25.k1, bm25.b) != (BM25_K1, BM25_B):
+            bm25 = BM25Index.build([chunk_store.text_at(row) for row in range(len(chunk_store))])
+        return cls(index, chunk_store, meta, MetadataIndex.from_chunk_store(chunk_store), bm25)
+
 class JSONProcessor:
-    def __init__(self):
+    def __init__(self, mmap: bool = False):
+        """
+        Carrega o modelo de embeddings e o índice salvo, se houver.
+
+        Args:
+            mmap (bool): Mapeia o índice FAISS e os chunks do disco, somente leitura
+                (app em produção, ver FAISS_INDEX_MMAP). Não use em process_json.py:
+                índices mapeados não podem ser atualizados
+        """
+        self.mmap = mmap
         self.embedding_model = self._load_embedding_model()
-        self.index = None
-        self.id_to_text_map = {}
+        self.embedding_scheduler = EmbeddingScheduler(self.embedding_model) if EMBEDDING_SCHEDULER_ENABLED else None
+        self.embedding_cache = (
+            EmbeddingCache(self.embedding_model.get_sentence_embedding_dimension(), EMBEDDING_CACHE_SIZE)
+            if EMBEDDING_CACHE_SIZE else None
+        )
+        # Read-copy-update: buscas leem a referência uma vez; recargas montam um
+        # snapshot novo e trocam a referência de uma só vez.
+        self._snapshot = IndexSnapshot.create(None, ChunkStore.from_records([], [], []), {})
+        self._reload_lock = threading.Lock()
+        self._reload_listeners = []
+        self._reloads = 0
         self.text_processor = TextProcessor()
         self._load_or_create_index()
         
     def _load_embedding_model(self):
         logger.info(f"Usando dispositivo: {'cuda' if os.environ.get('CUDA_VISIBLE_DEVICES', None) else 'cpu'}")
-        logger.info("Carregando modelo SentenceTransformer...")
+        logger.info(f"Carregando modelo de embeddings {EMBEDDING_MODEL} (backend {EMBEDDING_BACKEND})...")
         try:
-            model = SentenceTransformer(EMBEDDING_MODEL)
+            model = create_embedding_model()
             logger.info(f"Dimensão dos embeddings: {model.get_sentence_embedding_dimension()}")
-            logger.info("Modelo SentenceTransformer carregado com sucesso")
+            logger.info("Modelo de embeddings carregado com sucesso")
             return model
         except Exception as e:
-            logger.error(f"Erro ao carregar o modelo SentenceTransformer: {e}")
+            logger.error(f"Erro ao carregar o modelo de embeddings: {e}")
             raise
 
+    @property
+    def index(self):
+        return self._snapshot.index
+
+    @property
+    def chunk_store(self) -> ChunkStore:
+        return self._snapshot.chunk_store
+
+    @property
+    def index_meta(self) -> Dict[str, Any]:
+        return self._snapshot.meta
+
+    @property
+    def metadata_index(self) -> MetadataIndex:
+        return self._snapshot.metadata_index
+
+    @property
+    def bm25(self) -> BM25Index:
+        return self._snapshot.bm25
+
     def _load_or_create_index(self):
-        if os.path.exists(FAISS_JSON_INDEX_PATH) and os.path.exists(FAISS_JSON_MAPPING_PATH):
-            logger.info(f"Carregando índice JSON existente: {FAISS_JSON_INDEX_PATH}")
-            self.index = faiss.read_index(FAISS_JSON_INDEX_PATH)
-            with open(FAISS_JSON_MAPPING_PATH, 'rb') as f:
-                self.id_to_text_map = pickle.load(f)
-            logger.info(f"Índice carregado com sucesso. Total de vetores: {self.index.ntotal}")
+        snapshot = self._read_snapshot()
+        if snapshot is not None:
+            index_type = snapshot.meta.get('index_type', 'flat')
+            metric = snapshot.meta.get('metric', 'l2')
+            if index_type != FAISS_INDEX_TYPE or metric != FAISS_METRIC:
+                logger.warning(
+                    f"Índice salvo é '{index_type}'/{metric}, mas a configuração pede "
+                    f"'{FAISS_INDEX_TYPE}'/{FAISS_METRIC}. Reprocesse os JSONs para trocar o índice."
+                )
+            embedding_backend = snapshot.meta.get('embedding_backend', 'torch')
+            if embedding_backend != EMBEDDING_BACKEND:
+                logger.warning(
+                    f"Vetores do índice foram gerados com o backend '{embedding_backend}', mas as consultas usam "
+                    f"'{EMBEDDING_BACKEND}'. Reprocesse os JSONs (e confira com process_json.py parity)."
+                )
+            if not self._is_consistent(snapshot):
+                logger.error(
+                    f"Índice com {snapshot.index.ntotal} vetores não corresponde aos {len(snapshot.chunk_store)} "
+                    "chunks mapeados. Reprocesse os JSONs para sincronizar índice e chunks."
+                )
+            self._snapshot = snapshot
+            logger.info(f"Índice carregado com sucesso. Total de vetores: {snapshot.index.ntotal}")
         else:
             logger.info("Criando novo índice FAISS para JSONs...")
             embedding_dimension = self.embedding_model.get_sentence_embedding_dimension()
-            self.index = faiss.IndexFlatL2(embedding_dimension) # L2 para distância euclidiana
+            index = faiss.IndexFlatL2(embedding_dimension) # L2 para distância euclidiana
+            self._snapshot = IndexSnapshot.create(index, ChunkStore.from_records([], [], []),
+                                                  {'index_type': 'flat', 'metric': 'l2', 'params': {}})
             logger.info("Novo índice FAISS para JSONs criado.")
         os.makedirs(FAISS_INDEX_DIR, exist_ok=True)
 
-    def _save_index(self):
+    def _read_snapshot(self):
+        has_chunks = os.path.exists(FAISS_JSON_CHUNKS_PATH) or os.path.exists(FAISS_JSON_MAPPING_PATH)
+        if not (os.path.exists(FAISS_JSON_INDEX_PATH) and has_chunks):
+            return None
+
+        logger.info(f"Carregando índice JSON existente: {FAISS_JSON_INDEX_PATH}")
+        index = self._read_faiss_index(FAISS_JSON_INDEX_PATH)
+        if os.path.exists(FAISS_JSON_CHUNKS_PATH):
+            chunk_store = ChunkStore.load(FAISS_JSON_CHUNKS_PATH, mmap=self.mmap)
+        else:
+            logger.warning(
+                f"Arquivo de chunks {FAISS_JSON_CHUNKS_PATH} não encontrado. "
+                f"Usando a ordem do mapeamento legado {FAISS_JSON_MAPPING_PATH}; "
+                "execute process_json.py para gerá-lo."
+            )
+            with open(FAISS_JSON_MAPPING_PATH, 'rb') as f:
+                chunk_store = ChunkStore.from_mapping(pickle.load(f))
+        meta = self._load_index_meta()
+        configure_search(index, meta.get('index_type', 'flat'), meta.get('params', {}))
+        return IndexSnapshot.create(index, chunk_store, meta, BM25Index.load(FAISS_JSON_BM25_PATH))
+
+    def _read_faiss_index(self, path: str):
+        # Os arquivos são sempre substituídos com os.replace (atomic_path), então um
+        # mapeamento aberto continua apontando para a versão antiga até a recarga.
+        flags = getattr(faiss, 'IO_FLAG_MMAP_IFC', None)
+        if self.mmap and flags is not None:
+            try:
+                return faiss.read_index(path, flags | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                logger.warning(f"Não foi possível mapear o índice FAISS do disco ({e}); carregando em memória.")
+        elif self.mmap:
+            logger.warning(
+                f"faiss {faiss.__version__} não mapeia índices do disco (IO_FLAG_MMAP_IFC, faiss-cpu >= 1.11); "
+                "carregando em memória, sem compartilhar as páginas entre os workers."
+            )
+        return faiss.read_index(path)
+
+    @staticmethod
+    def _is_consistent(snapshot: IndexSnapshot) -> bool:
+        if snapshot.index.ntotal != len(snapshot.chunk_store):
+            return False
+        if snapshot.meta.get('id_map'):
+            id_map = faiss.vector_to_array(faiss.downcast_index(snapshot.index).id_map)
+            return set(id_map.tolist()) == set(snapshot.chunk_store.labels.tolist())
+        return True
+
+    def reload_index(self) -> bool:
+        """
+        Recarrega índice, chunks e metadados do disco e os publica atomicamente.
+
+        Buscas em andamento continuam usando o snapshot anterior até terminar.
+        Se os arquivos estiverem inconsistentes (por exemplo, no meio de uma
+        gravação), o snapshot atual é mantido.
+
+        Returns:
+            bool: True se uma nova versão foi publicada
+        """
+        with self._reload_lock:
+            try:
+                snapshot = self._read_snapshot()
+            except Exception as e:
+                logger.error(f"Erro ao recarregar o índice JSON: {e}", exc_info=True)
+                return False
+            if snapshot is None:
+                logger.warning("Arquivos do índice JSON não encontrados; recarga ignorada.")
+                return False
+            if not self._is_consistent(snapshot):
+                logger.warning("Índice e chunks em disco ainda não correspondem (gravação em andamento?); recarga adiada.")
+                return False
+
+            previous = self._snapshot
+            self._snapshot = snapshot
+            self._reloads += 1
+            logger.info(f"Índice JSON recarregado: {previous.index.ntotal} -> {snapshot.index.ntotal} vetores")
+
+        for listener in self._reload_listeners:
+            try:
+                listener(previous, snapshot)
+            except Exception as e:
+                logger.error(f"Erro em listener de recarga do índice: {e}", exc_info=True)
+        return True
+
+    @staticmethod
+    def changed_chunk_ids(previous: IndexSnapshot, current: IndexSnapshot) -> set:
+        """
+        Retorna os IDs de chunks alterados ou removidos entre dois snapshots.
+
+        Args:
+            previous (IndexSnapshot): Snapshot anterior
+            current (IndexSnapshot): Snapshot novo
+
+        Returns:
+            set: IDs presentes no snapshot anterior cujo conteúdo mudou ou que deixaram de existir
+        """
+        def fingerprints(store):
+            # stores legados não têm hash; o texto serve de comparação
+            return {store.id_at(row): store.hash_at(row) or store.text_at(row) for row in range(len(store))}
+
+        before, after = fingerprints(previous.chunk_store), fingerprints(current.chunk_store)
+        return {chunk_id for chunk_id, fingerprint in before.items() if after.get(chunk_id) != fingerprint}
+
+    def add_reload_listener(self, callback):
+        """
+        Registra uma função chamada após cada recarga bem-sucedida do índice.
+
+        Args:
+            callback (callable): Recebe (snapshot_anterior, snapshot_novo)
+        """
+        self._reload_listeners.append(callback)
+
+    def _load_index_meta(self) -> Dict[str, Any]:
+        if not os.path.exists(FAISS_JSON_META_PATH):
+            # índices anteriores aos metadados eram sempre IndexFlatL2
+            return {'index_type': 'flat', 'metric': 'l2', 'params': {}}
+        with open(FAISS_JSON_META_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @property
+    def metric(self) -> str:
+        return self.index_meta.get('metric', 'l2')
+
+    @property
+    def similarity_threshold(self) -> float:
+        """Limiar de relevância: o calibrado salvo com o índice ou o padrão da métrica em config.py."""
+        if 'threshold' in self.index_meta:
+            return self.index_meta['threshold']
+        if self.metric == 'cosine':
+            return JSON_COSINE_SIMILARITY_THRESHOLD
+        return JSON_SIMILARITY_THRESHOLD
+
+    def is_relevant(self, score: float) -> bool:
+        """
+        Indica se o score de um resultado passa o limiar de relevância.
+
+        Para L2 o score é uma distância (menor é melhor); para cosseno é uma
+        similaridade (maior é melhor).
+        """
+        if self.metric == 'cosine':
+            return score >= self.similarity_threshold
+        return score <= self.similarity_threshold
+
+    def is_relevant_hit(self, hit: Dict[str, Any]) -> bool:
+        """
+        Indica se um resultado de retrieve é relevante.
+
+        Resultados híbridos passam pelo limiar vetorial ou pelo BM25: score de
+        ao menos BM25_MIN_SCORE com os termos do chunk cobrindo BM25_MIN_COVERAGE
+        da consulta (termos exatos raros, como siglas).
+        """
+        if hit.get('bm25_score', 0.0) >= BM25_MIN_SCORE and hit.get('bm25_coverage', 0.0) >= BM25_MIN_COVERAGE:
+            return True
+        vector_score = hit.get('vector_score', hit['score'])
+        return vector_score is not None and self.is_relevant(vector_score)
+
+    def save_threshold(self, threshold: float):
+        """Grava um limiar calibrado junto aos metadados do índice."""
+        # Cópia: o dicionário do snapshot publicado pode estar em uso por buscas concorrentes
+        with self._reload_lock:
+            snapshot = self._snapshot
+            self._snapshot = snapshot._replace(meta=dict(snapshot.meta, threshold=float(threshold)))
+        self._save_index_meta()
+
+    def _save_index_meta(self):
+        meta = self.index_meta
+        with atomic_path(FAISS_JSON_META_PATH) as tmp_path:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    def _save_index(self, embedding_store: EmbeddingStore = None):
         if self.index is not None and self.index.ntotal > 0:
             logger.info(f"Salvando índice FAISS para JSONs com {self.index.ntotal} vetores...")
-            faiss.write_index(self.index, FAISS_JSON_INDEX_PATH)
-            with open(FAISS_JSON_MAPPING_PATH, 'wb') as f:
-                pickle.dump(self.id_to_text_map, f)
+            # Cada arquivo é substituído atomicamente; o índice vai por último,
+            # pois é a mudança dele que sinaliza uma nova versão do corpus.
+            if embedding_store is not None:
+                embedding_store.save(FAISS_JSON_EMBEDDINGS_PATH)
+            with atomic_path(FAISS_JSON_CHUNKS_PATH) as tmp_path:
+                self.chunk_store.save(tmp_path)
+            self._snapshot.bm25.save(FAISS_JSON_BM25_PATH)
+            self._save_index_meta()
+            # Mapeamento legado mantido para ferramentas externas; a ordem das linhas vem do ChunkStore.
+            with atomic_path(FAISS_JSON_MAPPING_PATH) as tmp_path:
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump(self.chunk_store.to_mapping(), f)
+            with atomic_path(FAISS_JSON_INDEX_PATH) as tmp_path:
+                faiss.write_index(self.index, tmp_path)
             logger.info("Índice FAISS para JSONs salvo com sucesso.")
         else:
             logger.warning("Índice FAISS para JSONs vazio, não foi salvo.")
 
-    def extract_chunks_from_json(self, json_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def extract_chunks_from_json(self, json_data: List[Dict[str, Any]],
+                                 known_texts: Dict[str, str] = None) -> List[Dict[str, Any]]:
+        """
+        Valida e pré-processa os itens de um arquivo JSON.
+
+        Args:
+            json_data (list): Itens com 'id', 'text' e 'metadata'
+            known_texts (dict): Textos já pré-processados por hash de conteúdo, reaproveitados sem passar pelo spaCy
+
+        Returns:
+            list: Chunks com 'id', 'text' (pré-processado), 'metadata' e 'hash'
+        """
+        known_texts = known_texts or {}
         chunks = []
         for item in json_data:
             chunk_id = item.get("id")
@@ -79,7 +351,10 @@ class JSONProcessor:
                 logger.warning(f"Item JSON inválido encontrado (faltando 'id' ou 'text'): {item}")
                 continue
             
-            cleaned_text = self.text_processor.preprocess(text)
+            digest = content_hash(chunk_id, text, metadata)
+            cleaned_text = known_texts.get(digest)
+            if cleaned_text is None:
+                cleaned_text = self.text_processor.preprocess(text)
             if not cleaned_text:
                 logger.warning(f"Texto limpo vazio para o chunk {chunk_id}")
                 continue
@@ -87,17 +362,27 @@ class JSONProcessor:
             chunks.append({
                 "id": chunk_id,
                 "text": cleaned_text,
-                "metadata": metadata
+                "metadata": metadata,
+                "hash": digest
             })
         return chunks
 
-    def process_json_directory(self, json_dir: str):
-        logger.info(f"Iniciando processamento do diretório JSON: {json_dir}")
+    def load_chunks(self, json_dir: str, known_texts: Dict[str, str] = None) -> List[Dict[str, Any]]:
+        """
+        Lê e pré-processa os chunks de todos os arquivos JSON de um diretório.
+
+        Args:
+            json_dir (str): Diretório com os arquivos JSON
+            known_texts (dict): Textos já pré-processados por hash de conteúdo
+
+        Returns:
+            list: Chunks válidos com 'id', 'text', 'metadata' e 'hash', sem duplicatas
+        """
         if not os.path.exists(json_dir):
             logger.error(f"Diretório JSON não encontrado: {json_dir}")
-            return
+            return []
         
-        json_files = [f for f in os.listdir(json_dir) if f.endswith('.json')]
+        json_files = sorted(f for f in os.listdir(json_dir) if f.endswith('.json'))
         logger.info(f"Encontrados {len(json_files)} arquivos JSON em {json_dir}")
 
         all_chunks = []
@@ -111,27 +396,33 @@ class JSONProcessor:
                 if isinstance(json_data, dict):
                     json_data = [json_data]
 
-                chunks = self.extract_chunks_from_json(json_data)
+                chunks = self.extract_chunks_from_json(json_data, known_texts)
                 all_chunks.extend(chunks)
                 logger.info(f"Extraídos {len(chunks)} chunks do arquivo {json_file}")
             except json.JSONDecodeError as e:
                 logger.error(f"Erro ao decodificar JSON do arquivo {json_file}: {e}", exc_info=True)
             except Exception as e:
                 logger.error(f"Erro inesperado ao processar {json_file}: {e}", exc_info=True)
-        
-        if not all_chunks:
-            logger.warning("Nenhum chunk válido extraído de todos os arquivos JSON.")
-            return
 
-        logger.info(f"Total de chunks extraídos de todos os JSONs: {len(all_chunks)}")
+        unique_chunks, seen = [], set()
+        for chunk in all_chunks:
+            if chunk['hash'] in seen:
+                logger.warning(f"Chunk duplicado ignorado: {chunk['id']}")
+                continue
+            seen.add(chunk['hash'])
+            unique_chunks.append(chunk)
+        return unique_chunks
 
-        self.index = faiss.IndexFlatL2(self.embedding_model.get_sentence_embedding_dimension())
-        self.id_to_text_map = {}
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Gera os embeddings de uma lista de textos em lotes de EMBEDDING_BATCH_SIZE.
 
-        texts = [chunk['text'] for chunk in all_chunks]
-        ids = [chunk['id'] for chunk in all_chunks]
-        metadatas = [chunk['metadata'] for chunk in all_chunks]
+        Args:
+            texts (list): Textos já pré-processados
 
+        Returns:
+            numpy.ndarray: Matriz float32 com um vetor por texto
+        """
         logger.info(f"Gerando embeddings para {len(texts)} textos...")
         all_embeddings = []
         for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
@@ -142,39 +433,366 @@ class JSONProcessor:
         
         embeddings_array = np.array(all_embeddings).astype('float32')
         logger.info(f"Embeddings gerados. Shape: {embeddings_array.shape}")
+        return embeddings_array
+
+    def process_json_directory(self, json_dir: str, incremental: bool = False):
+        """
+        Processa os JSONs e reconstrói (ou atualiza) o índice.
 
-        self.index.add(embeddings_array)
-        logger.info(f"{self.index.ntotal} vetores adicionados ao índice FAISS.")
+        No modo incremental, o texto pré-processado e o embedding de cada
+        chunk são reaproveitados pelo hash do conteúdo; apenas chunks novos ou
+        alterados passam pelo spaCy e pelo modelo. Se o índice salvo tiver
+        IDMap e o mesmo tipo/métrica, os vetores removidos e adicionados são
+        aplicados com ``remove_ids``/``add_with_ids``; caso contrário, o índice
+        é reconstruído a partir dos embeddings salvos.
 
-        for i, chunk_id in enumerate(ids):
-            self.id_to_text_map[chunk_id] = {
-                'text': all_chunks[i]['text'],
-                'metadata': all_chunks[i]['metadata']
-            }
+        Args:
+            json_dir (str): Diretório com os arquivos JSON
+            incremental (bool): Reaproveita embeddings e atualiza o índice existente
+
+        Raises:
+            RuntimeError: Se o índice foi carregado mapeado do disco (mmap=True)
+        """
+        if self.mmap:
+            raise RuntimeError("Índice mapeado do disco é somente leitura; use JSONProcessor(mmap=False) para processar JSONs")
+        logger.info(f"Iniciando processamento do diretório JSON: {json_dir} (incremental={incremental})")
+        if incremental:
+            embedding_store = EmbeddingStore.load(FAISS_JSON_EMBEDDINGS_PATH, embedding_model_id())
+        else:
+            embedding_store = EmbeddingStore(embedding_model_id())
+
+        all_chunks = self.load_chunks(json_dir, embedding_store.texts())
         
-        self._save_index()
+        if not all_chunks:
+            logger.warning("Nenhum chunk válido extraído de todos os arquivos JSON.")
+            return
+
+        logger.info(f"Total de chunks extraídos de todos os JSONs: {len(all_chunks)}")
+
+        pending = [chunk for chunk in all_chunks if chunk['hash'] not in embedding_store]
+        logger.info(f"{len(all_chunks) - len(pending)} chunks inalterados, {len(pending)} novos ou alterados")
+        if pending:
+            embeddings_array = self.embed_texts([chunk['text'] for chunk in pending])
+            for chunk, vector in zip(pending, embeddings_array):
+                embedding_store.put(chunk['hash'], chunk['text'], vector)
+        embedding_store.retain(chunk['hash'] for chunk in all_chunks)
+
+        chunk_store = ChunkStore.from_records(
+            [chunk['id'] for chunk in all_chunks],
+            [chunk['text'] for chunk in all_chunks],
+            [chunk['metadata'] for chunk in all_chunks],
+            labels=[label_from_hash(chunk['hash']) for chunk in all_chunks],
+            hashes=[chunk['hash'] for chunk in all_chunks]
+        )
+
+        index, meta = self._update_index(chunk_store, embedding_store) if incremental else (None, None)
+        if index is None:
+            vectors = np.vstack([embedding_store.get(chunk['hash'])[1] for chunk in all_chunks])
+            index, meta = self._build_index(vectors, chunk_store.labels)
+        logger.info(f"{index.ntotal} vetores no índice FAISS.")
+
+        self._snapshot = IndexSnapshot.create(index, chunk_store, meta)
+        self._save_index(embedding_store)
         logger.info("Processamento de diretório JSON concluído e índice salvo.")
 
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def _prepare_vectors(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.array(vectors, dtype='float32')
+        if FAISS_METRIC == 'cosine':
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _build_index(self, vectors: np.ndarray, labels: np.ndarray):
+        vectors = self._prepare_vectors(vectors)
+        dimension = vectors.shape[1]
+
+        logger.info(f"Construindo índice FAISS do tipo '{FAISS_INDEX_TYPE}' ({FAISS_METRIC})...")
+        index, params = build_index(FAISS_INDEX_TYPE, dimension, vectors, FAISS_METRIC, ids=labels)
+        meta = {
+            'index_type': FAISS_INDEX_TYPE,
+            'metric': FAISS_METRIC,
+            'params': params,
+            'id_map': True,
+            'dimension': dimension,
+            'ntotal': int(index.ntotal),
+            'embedding_model': EMBEDDING_MODEL,
+            'embedding_backend': EMBEDDING_BACKEND
+        }
+        # O limiar calibrado só continua válido no mesmo espaço de vetores e métrica
+        previous = self.index_meta
+        if 'threshold' in previous:
+            same_space = (
+                previous.get('metric', 'l2') == meta['metric']
+                and previous.get('embedding_model', EMBEDDING_MODEL) == meta['embedding_model']
+                and previous.get('embedding_backend', 'torch') == meta['embedding_backend']
+            )
+            if same_space:
+                meta['threshold'] = previous['threshold']
+            else:
+                logger.warning(
+                    f"Limiar calibrado {previous['threshold']:.4f} descartado: métrica ou modelo de embeddings "
+                    "mudou. Execute process_json.py calibrate novamente."
+                )
+        return index, meta
+
+    def _update_index(self, chunk_store: ChunkStore, embedding_store: EmbeddingStore):
+        compatible = (
+            self.index is not None and self.index.ntotal > 0
+            and self.index_meta.get('id_map')
+            and self.index_meta.get('index_type') == FAISS_INDEX_TYPE
+            and self.metric == FAISS_METRIC
+            and self.index_meta.get('embedding_backend', 'torch') == EMBEDDING_BACKEND
+        )
+        if not compatible:
+            logger.info("Índice atual incompatível com atualização incremental; reconstruindo a partir dos embeddings.")
+            return None, None
+
+        old_labels = set(self.chunk_store.labels.tolist())
+        new_labels = chunk_store.labels.tolist()
+        removed = np.array(sorted(old_labels - set(new_labels)), dtype=np.int64)
+        added_rows = [row for row, label in enumerate(new_labels) if label not in old_labels]
+
+        # A cópia mantém o índice publicado intacto para buscas concorrentes
+        index = faiss.clone_index(self.index)
+        if len(removed):
+            try:
+                index.remove_ids(removed)
+            except RuntimeError as e:
+                logger.info(f"Índice '{FAISS_INDEX_TYPE}' não suporta remoção de vetores; reconstruindo. ({e})")
+                return None, None
+        if added_rows:
+            vectors = np.vstack([embedding_store.get(chunk_store.hash_at(row))[1] for row in added_rows])
+            index.add_with_ids(self._prepare_vectors(vectors), chunk_store.labels[added_rows])
+        configure_search(index, FAISS_INDEX_TYPE, self.index_meta.get('params', {}))
+
+        meta = dict(self.index_meta, ntotal=int(index.ntotal))
+        logger.info(f"Índice atualizado incrementalmente: {len(removed)} vetores removidos, {len(added_rows)} adicionados")
+        return index, meta
+
+    def search(self, query: str, k: int = 5, filters: Dict[str, List[str]] = None,
+               mode: str = None) -> List[Dict[str, Any]]:
+        return self.search_many([query], k, filters, mode)[0]
+
+    def search_many(self, queries: List[str], k: int = 5, filters: Dict[str, List[str]] = None,
+                    mode: str = None) -> List[List[Dict[str, Any]]]:
+        """
+        Busca várias consultas com um único encode em lote e uma única chamada ao FAISS.
+
+        Args:
+            queries (list): Consultas a serem buscadas
+            k (int): Número de resultados por consulta
+            filters (dict): Campo de metadata -> valores aceitos (ver search_embeddings)
+            mode (str): "vector" ou "hybrid" (ver retrieve); por padrão, RETRIEVAL_MODE
+
+        Returns:
+            list: Para cada consulta, na mesma ordem, a lista de resultados
+        """
         if self.index is None or self.index.ntotal == 0:
             logger.warning("Índice JSON vazio, não há documentos para buscar")
-            return []
+            return [[] for _ in queries]
+        return self.retrieve(queries, self.embed_queries(queries), k, filters, mode=mode)
+
+    def retrieve(self, queries: List[str], embeddings: List[Any], k: int = 5, filters: Dict[str, List[str]] = None,
+                 filter_fallback: bool = False, mode: str = None) -> List[List[Dict[str, Any]]]:
+        """
+        Busca consultas já codificadas por embed_queries no modo configurado.
+
+        No modo "vector" é a busca do FAISS (search_embeddings). No modo "hybrid",
+        os HYBRID_CANDIDATES melhores do FAISS e do BM25 são fundidos por
+        reciprocal rank fusion: cada lista contribui 1 / (RRF_K + posição) ao
+        score do chunk. Resultados híbridos trazem 'score' (fusão),
+        'vector_score' (None se o chunk veio só do BM25), 'bm25_score' e
+        'bm25_coverage' (fração do IDF da consulta presente no chunk).
+
+        Args:
+            queries (list): Consultas originais, usadas na busca lexical
+            embeddings (list): Embeddings das consultas, na mesma ordem
+            k (int): Número de resultados por consulta
+            filters (dict): Campo de metadata -> valores aceitos (ver search_embeddings)
+            filter_fallback (bool): Sem candidatos no filtro, busca sem filtro
+            mode (str): "vector" ou "hybrid"; por padrão, RETRIEVAL_MODE
+
+        Returns:
+            list: Para cada consulta, na mesma ordem, a lista de resultados
+        """
+        mode = mode or RETRIEVAL_MODE
+        if mode == "vector":
+            return self.search_embeddings(embeddings, k, filters, filter_fallback)
+        if mode != "hybrid":
+            raise ValueError(f"Modo de busca desconhecido: {mode}. Opções: vector, hybrid")
+
+        # As duas buscas usam o mesmo snapshot: uma recarga no meio mudaria as linhas do BM25
+        snapshot = self._snapshot
+        candidates = max(k, HYBRID_CANDIDATES)
+        dense = self.search_embeddings(embeddings, candidates, filters, filter_fallback, snapshot=snapshot)
+
+        mask = None
+        if filters:
+            mask = np.isin(snapshot.chunk_store.labels, snapshot.metadata_index.labels_for(filters))
 
-        cleaned_query = self.text_processor.preprocess(query)
-        if not cleaned_query:
-            return []
-            
-        query_embedding = self.embedding_model.encode([cleaned_query]).astype('float32')
-        
-        D, I = self.index.search(query_embedding, k)
-        
         results = []
-        for i in range(k):
-            if I[0][i] != -1:
-                chunk_id = list(self.id_to_text_map.keys())[I[0][i]]
-                score = D[0][i]  # D é a distância, menor é melhor
-                original_text = self.id_to_text_map[chunk_id]['text']
-                metadata = self.id_to_text_map[chunk_id]['metadata']
-                results.append({'id': chunk_id, 'score': score, 'text': original_text, 'metadata': metadata})
-                
-        return results 
\ No newline at end of file
+        for query, dense_hits in zip(queries, dense):
+            tokens = self.text_processor.preprocess(query).split()
+            lexical = snapshot.bm25.top_k(tokens, candidates, mask) if tokens else []
+            if not lexical and mask is not None and filter_fallback:
+                lexical = snapshot.bm25.top_k(tokens, candidates) if tokens else []
+
+            fused = {}
+            for rank, hit in enumerate(dense_hits, start=1):
+                entry = fused.setdefault(hit['id'], dict(hit, vector_score=hit['score'], bm25_score=0.0,
+                                                         bm25_coverage=0.0, score=0.0))
+                entry['score'] += 1.0 / (RRF_K + rank)
+            coverage = snapshot.bm25.coverage(tokens, [row for row, _ in lexical]) if lexical else []
+            for rank, ((row, bm25_score), matched) in enumerate(zip(lexical, coverage), start=1):
+                chunk_id = snapshot.chunk_store.id_at(row)
+                if chunk_id not in fused:
+                    fused[chunk_id] = dict(snapshot.chunk_store.get(row), vector_score=None, score=0.0)
+                fused[chunk_id]['bm25_score'] = bm25_score
+                fused[chunk_id]['bm25_coverage'] = float(matched)
+                fused[chunk_id]['score'] += 1.0 / (RRF_K + rank)
+            results.append(sorted(fused.values(), key=lambda hit: hit['score'], reverse=True)[:k])
+        return results
+
+    def embed_queries(self, queries: List[str]) -> List[Any]:
+        """
+        Pré-processa e codifica consultas em um único lote.
+
+        Consultas cujo texto pré-processado já está no cache de embeddings (ou
+        repetido no mesmo lote) não passam pelo modelo.
+
+        Args:
+            queries (list): Consultas a serem codificadas
+
+        Returns:
+            list: Para cada consulta, o embedding float32, ou None se a consulta
+                  ficar vazia após o pré-processamento
+        """
+        embeddings = [None] * len(queries)
+        cleaned_queries = [self.text_processor.preprocess(query) for query in queries]
+        positions = [i for i, cleaned in enumerate(cleaned_queries) if cleaned]
+        if not positions:
+            return embeddings
+
+        texts = list(dict.fromkeys(cleaned_queries[i] for i in positions))
+        if self.embedding_cache is not None:
+            cached = dict(zip(texts, self.embedding_cache.get_many(texts)))
+        else:
+            cached = dict.fromkeys(texts)
+        missing = [text for text in texts if cached[text] is None]
+        if missing:
+            encoded = self._encode_queries(missing)
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many(missing, encoded)
+            cached.update(zip(missing, encoded))
+
+        for position in positions:
+            embeddings[position] = cached[cleaned_queries[position]]
+        return embeddings
+
+    def search_embeddings(self, embeddings: List[Any], k: int = 5, filters: Dict[str, List[str]] = None,
+                          filter_fallback: bool = False,
+                          snapshot: IndexSnapshot = None) -> List[List[Dict[str, Any]]]:
+        """
+        Busca embeddings já calculados por embed_queries em uma única chamada ao FAISS.
+
+        Com filtro, os rótulos aceitos vêm do índice invertido de metadados e são
+        passados ao FAISS como IDSelector, de modo que só a fatia filtrada do corpus
+        é percorrida. Índices que não aceitam seletor (pq) buscam
+        SEARCH_FILTER_OVERFETCH vezes mais candidatos e filtram o resultado.
+
+        Args:
+            embeddings (list): Embeddings das consultas (None é ignorado)
+            k (int): Número de resultados por consulta
+            filters (dict): Campo de metadata -> valores aceitos; um chunk passa se, em
+                todos os campos, algum de seus valores estiver entre os aceitos
+            filter_fallback (bool): Se nenhum chunk passar no filtro, devolve os
+                resultados sem filtro em vez de uma lista vazia
+            snapshot (IndexSnapshot): Snapshot a consultar; por padrão, o atual
+
+        Returns:
+            list: Para cada embedding, na mesma ordem, a lista de resultados
+        """
+        results = [[] for _ in embeddings]
+        if snapshot is None:
+            snapshot = self._snapshot
+        positions = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+        if snapshot.index is None or snapshot.index.ntotal == 0 or not positions:
+            return results
+
+        fetch_k, params = k, None
+        if filters:
+            allowed = snapshot.metadata_index.labels_for(filters)
+            if not len(allowed):
+                logger.info(f"Nenhum chunk atende ao filtro {filters}")
+                return self.search_embeddings(embeddings, k, snapshot=snapshot) if filter_fallback else results
+            # O seletor fica referenciado aqui durante a busca; os SearchParameters só guardam o ponteiro
+            selector = faiss.IDSelectorBatch(allowed)
+            params = search_parameters(snapshot.index, snapshot.meta.get('index_type', 'flat'),
+                                       snapshot.meta.get('params', {}), selector)
+            if params is None:
+                fetch_k = min(snapshot.index.ntotal, k * SEARCH_FILTER_OVERFETCH)
+
+        query_embeddings = np.vstack([embeddings[i] for i in positions]).astype('float32')
+        if snapshot.meta.get('metric', 'l2') == 'cosine':
+            faiss.normalize_L2(query_embeddings)
+        D, I = snapshot.index.search(query_embeddings, fetch_k, params=params)
+
+        unmatched = []
+        for row, position in enumerate(positions):
+            hits = self._resolve_hits(snapshot.chunk_store, D[row], I[row])
+            if filters and params is None:
+                hits = [hit for hit in hits if self._matches_filters(hit['metadata'], filters)]
+            if filters and not hits:
+                unmatched.append(position)
+            results[position] = hits[:k]
+
+        if unmatched and filter_fallback:
+            fallback = self.search_embeddings([embeddings[i] for i in unmatched], k, snapshot=snapshot)
+            for position, hits in zip(unmatched, fallback):
+                results[position] = hits
+        return results
+
+    @staticmethod
+    def _matches_filters(metadata: Dict[str, Any], filters: Dict[str, List[str]]) -> bool:
+        for field, accepted in filters.items():
+            value = metadata.get(field)
+            values = value if isinstance(value, list) else [value]
+            accepted = {str(a) for a in accepted}
+            if not any(str(v) in accepted for v in values if v is not None):
+                return False
+        return True
+
+    def _encode_queries(self, texts: List[str]) -> np.ndarray:
+        if self.embedding_scheduler is not None:
+            return self.embedding_scheduler.encode(texts)
+        return self.embedding_model.encode(texts, show_progress_bar=False).astype('float32')
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna métricas do índice e do agendador de embeddings."""
+        snapshot = self._snapshot
+        return {
+            'vectors': snapshot.index.ntotal if snapshot.index is not None else 0,
+            'index_type': snapshot.meta.get('index_type', 'flat'),
+            'reloads': self._reloads,
+            'embedding_backend': EMBEDDING_BACKEND,
+            'mmap': self.mmap,
+            'metric': self.metric,
+            'similarity_threshold': self.similarity_threshold,
+            'chunks': len(snapshot.chunk_store),
+            'metadata_fields': snapshot.metadata_index.stats(),
+            'retrieval_mode': RETRIEVAL_MODE,
+            'bm25_terms': len(snapshot.bm25.vocabulary),
+            'embedding_scheduler': self.embedding_scheduler.stats() if self.embedding_scheduler else None,
+            'embedding_cache': self.embedding_cache.stats() if self.embedding_cache else None
+        }
+
+    @staticmethod
+    def _resolve_hits(chunk_store: ChunkStore, distances, labels) -> List[Dict[str, Any]]:
+        hits = []
+        for distance, label in zip(distances, labels):
+            row = chunk_store.row_for_label(int(label))
+            if row != -1:
+                chunk = chunk_store.get(row)
+                # L2: distância (menor é melhor); cosine: similaridade (maior é melhor)
+                chunk['score'] = float(distance)
+                hits.append(chunk)
+        return hits
@@ -3,70 +3,218 @@ Módulo para mapear palavras-chave relacionadas e sinônimos.
 
 Este módulo permite melhorar a correspondência entre os termos usados pelos usuários
 e os termos oficiais presentes nos documentos e FAQs.
+
+O vocabulário (sinônimos e grupos temáticos) fica em arquivos JSON versionados
+em data/vocabulary/, editáveis sem mudar o código. Ele é compilado uma vez, na
+construção, em uma trie de palavras com chaves sem acento e em minúsculas, e as
+expansões de cada termo são pré-calculadas. Cada consulta é percorrida uma única
+vez, casando termos inteiros (com plural simples em -s/-es), de modo que "dp"
+não casa dentro de outras palavras e "matricula" casa com "matrícula".
 """
 
-class KeywordMapper:
+import json
+import logging
+import os
+import re
+import unicodedata
+
+from config import KEYWORD_VOCABULARY_DIR
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato dos arquivos de vocabulário aceita por este módulo
+VOCABULARY_VERSION = 1
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def fold(text):
+    """
+    Normaliza um texto para comparação: minúsculas e sem acentos.
+
+    Args:
+        text (str): Texto original
+
+    Returns:
+        str: Texto normalizado
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _tokens(text):
+    return _WORD_RE.findall(fold(text))
+
+
+class _TermTrie:
+    """Trie de sequências de palavras; cada nó terminal guarda os valores do termo."""
+
     def __init__(self):
-        """Inicializa o mapeador de palavras-chave com termos relacionados."""
-        
+        self.root = {}
+
+    def add(self, phrase, value):
+        node = self.root
+        for token in _tokens(phrase):
+            child = node.get(token)
+            if child is None:
+                child = node[token] = {}
+            # o plural simples leva ao mesmo nó ("faltas" casa com "falta"); fica em uma
+            # chave separada para não se confundir com um termo que já termine em -s
+            for plural in (token + "s", token + "es"):
+                node.setdefault((plural,), child)
+            node = child
+        node.setdefault(None, []).append(value)
+
+    def find_all(self, text):
+        """Retorna os valores de todos os termos presentes no texto, inclusive sobrepostos."""
+        tokens = _tokens(text)
+        root = self.root
+        found = []
+        for start in range(len(tokens)):
+            node = _child(root, tokens[start])
+            position = start + 1
+            while node is not None:
+                values = node.get(None)
+                if values:
+                    found.extend(values)
+                if position == len(tokens):
+                    break
+                node = _child(node, tokens[position])
+                position += 1
+        return found
+
+
+def _load_vocabulary(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get("version") != VOCABULARY_VERSION:
+        raise ValueError(
+            f"Versão de vocabulário não suportada em {path}: {data.get('version')} (esperada {VOCABULARY_VERSION})"
+        )
+    return data
+
+
+def _child(node, token):
+    child = node.get(token)
+    return child if child is not None else node.get((token,))
+
+
+class KeywordMapper:
+    def __init__(self, vocabulary_dir=KEYWORD_VOCABULARY_DIR):
+        """
+        Inicializa o mapeador de palavras-chave a partir dos arquivos de vocabulário.
+
+        Args:
+            vocabulary_dir (str): Diretório com synonyms.json e themes.json
+        """
+        synonyms = _load_vocabulary(os.path.join(vocabulary_dir, "synonyms.json"))
+        themes = _load_vocabulary(os.path.join(vocabulary_dir, "themes.json"))
+
+        self.synonym_map = synonyms["synonyms"]
+        self.thematic_keywords = {name: theme["keywords"] for name, theme in themes["themes"].items()}
+        self.theme_assuntos = {name: theme["assunto_principal"] for name, theme in themes["themes"].items()}
+
+        self._compile()
+        logger.info(
+            f"Vocabulário carregado: {len(self.synonym_map)} grupos de sinônimos (v{synonyms['version']}), "
+            f"{len(self.thematic_keywords)} grupos temáticos (v{themes['version']})"
+        )
+
+    def _compile(self):
+        # Grupo i = [termo oficial] + sinônimos; a trie devolve (grupo, posição no grupo)
+        self._groups = [[official] + list(synonyms) for official, synonyms in self.synonym_map.items()]
+        self._folded_groups = [[fold(term) for term in members] for members in self._groups]
+        self._trie = _TermTrie()
+        for group_index, members in enumerate(self._groups):
+            for position, term in enumerate(members):
+                self._trie.add(term, (group_index, position))
+
+        # Expansões fechadas por (grupo, posição casada): o termo oficial expande para os
+        # sinônimos; um sinônimo expande para o oficial e os demais sinônimos do grupo
+        self._expansions = []
+        for members, folded in zip(self._groups, self._folded_groups):
+            expansions = [tuple(zip(members[1:], folded[1:]))]
+            for position in range(1, len(members)):
+                expansions.append(tuple(
+                    (members[p], folded[p]) for p in range(len(members))
+                    if p != position and folded[p] != folded[position]
+                ))
+            self._expansions.append(expansions)
+
+        self._theme_names = list(self.thematic_keywords)
+        self._theme_trie = _TermTrie()
+        for theme_index, keywords in enumerate(self.thematic_keywords.values()):
+            for keyword in keywords:
+                self._theme_trie.add(keyword, theme_index)
+
+    def detect_themes(self, query):
+        """
+        Identifica os grupos temáticos mencionados na consulta.
+
+        Args:
+            query (str): Consulta do usuário
+
+        Returns:
+            list: Nomes dos grupos, na ordem do vocabulário
+        """
+        found = set(self._theme_trie.find_all(query))
+        return [self._theme_names[i] for i in sorted(found)]
+
+    def get_assuntos(self, query):
+        """
+        Obtém os valores de metadata.assunto_principal associados aos temas da consulta.
+
+        Args:
+            query (str): Consulta do usuário
+
+        Returns:
+            list: Valores de assunto_principal, sem repetições; vazia se nenhum tema foi identificado
+        """
+        assuntos = []
+        for theme in self.detect_themes(query):
+            assuntos.extend(self.theme_assuntos.get(theme, []))
+        return list(dict.fromkeys(assuntos))
+
+    def _match(self, query):
+        """
+        Encontra os termos do vocabulário presentes na consulta.
+
+        Returns:
+            tuple: ({grupo: [posições casadas, em ordem]}, conjunto de termos casados normalizados)
+        """
+        matched = {}
+        present = set()
+        for group_index, position in self._trie.find_all(query):
+            positions = matched.setdefault(group_index, [])
+            if position not in positions:
+                positions.append(position)
+            present.add(self._folded_groups[group_index][position])
+        return matched, present
+
+    def _related(self, matched, include_both):
+        """
+        Reúne os termos relacionados aos grupos casados.
+
+        Ordem determinística: grupos na ordem do vocabulário; dentro de cada
+        grupo, o termo oficial e depois os sinônimos na ordem em que foram definidos.
+
+        Returns:
+            dict: termo -> termo normalizado, sem repetições e na ordem descrita
+        """
+        terms = {}
+        for group_index in sorted(matched):
+            positions = matched[group_index]
+            official_found = 0 in positions
+            synonyms_found = [p for p in positions if p != 0]
+            expansions = self._expansions[group_index]
+            if official_found:
+                for term, folded in expansions[0]:
+                    terms.setdefault(term, folded)
+            if synonyms_found and (include_both or not official_found):
+                for term, folded in expansions[min(synonyms_found)]:
+                    terms.setdefault(term, folded)
+        return terms
 
-        self.synonym_map = {
-            "SPTrans": ["bilhete único", "bilhete unico", "transporte público", "transporte publico", "carteirinha de ônibus", "carteirinha de onibus", "passe escolar", "meia passagem"],
-            "matrícula": ["inscrição", "registro", "cadastro", "ingresso", "entrada", "adesão"],
-            "rematrícula": ["renovação", "continuidade", "renovar matrícula"],
-            "histórico escolar": ["histórico", "notas", "boletim", "desempenho acadêmico"],
-            "carteirinha": ["identificação", "cartão estudante", "cartão de acesso", "crachá", "id estudantil"],
-            "declaração": ["comprovante", "atestado", "certificado"],
-            "documentos": ["pendência", "pendentes", "entrega", "lista", "status"],
-            
-            "secretaria": ["atendimento", "administração escolar", "administração acadêmica", "setor acadêmico"],
-            "coordenação": ["coordenador", "coordenadora", "direção do curso", "chefia de departamento"],
-            "financeiro": ["tesouraria", "setor de pagamentos", "departamento financeiro", "setor de cobranças"],
-            "biblioteca": ["acervo", "livros", "consulta bibliográfica"],
-            
-            "trancamento": ["trancar", "suspender", "interromper", "pausa", "pausar curso"],
-            "cancelamento": ["cancelar", "desistir", "encerrar vínculo", "abandono", "desligamento"],
-            "transferência": ["transferir", "mudar de faculdade", "mudar de instituição", "trocar"],
-            "aproveitamento": ["equivalência", "dispensa de disciplina", "validação de créditos", "aproveitamento de estudos"],
-            
-            "perder": ["perdido", "encontrado", "achados e perdidos", "achado"],
-            "mensalidade": ["pagamento", "parcela", "valor mensal", "prestação", "cobrança", "vencimento"],
-            "abono de faltas": ["abono", "falta", "frequência", "justificativa de falta", "dispensa de presença"],
-            "boleto": ["fatura", "débito", "crédito", "pagamento", "acordo", "negociação"],
-            "bolsa": ["desconto", "auxílio", "ajuda financeira", "apoio financeiro", "incentivo"],
-            "FIES": ["financiamento estudantil", "crédito educativo", "financiamento de mensalidade"],
-            "PROUNI": ["programa universidade para todos", "bolsa governo", "bolsa federal"],
-            
-            "calendário acadêmico": ["datas", "prazos", "agenda", "cronograma"],
-            "férias": ["recesso", "descanso", "pausa entre semestres"],
-            "formatura": ["colação de grau", "cerimônia de conclusão", "outorga de grau"],
-            
-            "prova": ["avaliação", "teste", "exame", "verificação"],
-            "trabalho": ["atividade", "projeto", "tarefa", "exercício"],
-            "TCC": ["trabalho de conclusão", "monografia", "projeto final", "trabalho final"],
-            "dependência": ["dp", "disciplina pendente", "reprovação", "recuperação", "reprovei"],
-
-            "portal do aluno": ["sistema acadêmico", "área do aluno", "intranet", "ambiente virtual", "portal acadêmico"],
-            "AVA": ["ambiente virtual de aprendizagem", "plataforma de ensino", "sala virtual", "moodle"],
-            "adobe": ["laboratório", "informática", "software", "computador", "Photoshop", "Acrobat", "Illustrator"],
-            
-            "EAD": ["ensino a distância", "curso online", "educação a distância", "remoto", "virtual"],
-            "presencial": ["aula física", "no campus", "na faculdade", "unidade"],
-            "semi-presencial": ["híbrido", "parte online parte presencial", "flexível", "phygital"]
-        }
-        
-        self.thematic_keywords = {
-            "financeiro": ["desconto", "preço", "valor", "custo", "pagamento", "parcela", "fatura", "débito", "crédito", "boleto", "mensalidade", "vencimento"],
-            
-            "processo_seletivo": ["vestibular", "prova", "processo seletivo", "inscrição", "vaga", 
-                                 "classificação", "nota de corte", "edital", "cronograma", "lista de espera"],
-            
-            "documentação": ["documento", "certificado", "diploma", "comprovante", "protocolo", 
-                            "identidade", "histórico", "certificação", "atestado"],
-            
-            "calendário": ["data", "prazo", "período", "início", "término", "final", "começo", "cronograma"]
-        }
-    
     def expand_query(self, query):
         """
         Expande a consulta do usuário com termos relacionados.
@@ -75,34 +223,17 @@ class KeywordMapper:
             query (str): Consulta original do usuário
             
         Returns:
-            str: Consulta expandida com termos relacionados
+            str: Consulta expandida com termos relacionados, na ordem do vocabulário
         """
-        original_query = query.lower()
-        expanded_terms = []
-        
-        # expansão no synonym_map
-        for official_term, synonyms in self.synonym_map.items():
-            if official_term.lower() in original_query:
-                expanded_terms.extend(synonyms)
-        
-        for official_term, synonyms in self.synonym_map.items():
-            for synonym in synonyms:
-                if synonym.lower() in original_query:
-                    expanded_terms.append(official_term)
-                    expanded_terms.extend([s for s in synonyms if s.lower() != synonym.lower()])
-                    break
-        
-        expanded_terms = list(set(expanded_terms))
-        expanded_terms = [term for term in expanded_terms if term.lower() not in original_query]
+        matched, present = self._match(query)
+        expanded_terms = [
+            term for term, folded in self._related(matched, include_both=True).items() if folded not in present
+        ]
         
         if not expanded_terms:
             return query
         
-        expanded_query = query
-        if expanded_terms:
-            expanded_query += " " + " ".join(expanded_terms)
-            
-        return expanded_query
+        return query + " " + " ".join(expanded_terms)
     
     def get_related_terms(self, query):
         """
@@ -112,21 +243,7 @@ class KeywordMapper:
             query (str): Consulta original do usuário
             
         Returns:
-            list: Lista de termos relacionados
+            list: Lista de termos relacionados, na ordem do vocabulário
         """
-        query_lower = query.lower()
-        related_terms = []
-        
-        for official_term, synonyms in self.synonym_map.items():
-            if official_term.lower() in query_lower:
-                related_terms.extend(synonyms)
-            else:
-                for synonym in synonyms:
-                    if synonym.lower() in query_lower:
-                        related_terms.append(official_term)
-                        related_terms.extend([s for s in synonyms if s.lower() != synonym.lower()])
-                        break
-        
-        related_terms = list(set(related_terms))
-        
-        return related_terms 
\ No newline at end of file
+        matched, _ = self._match(query)
+        return list(self._related(matched, include_both=False))
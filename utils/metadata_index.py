@@ -0,0 +1,90 @@
+"""
+Índice invertido dos metadados dos chunks.
+
+Para cada campo de metadata (``nivel_educacional``, ``assunto_principal``,
+...) guarda, por valor, os rótulos FAISS dos chunks que o possuem. Um filtro
+vira um conjunto de rótulos que é passado ao FAISS como ``IDSelectorBatch``,
+de modo que a busca só percorre a fatia do corpus que interessa.
+
+Campos com lista de valores (como ``campus_atendimento``) indexam o chunk em
+cada um deles.
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+from utils.chunk_store import ChunkStore
+
+
+class MetadataIndex:
+    def __init__(self, postings: Dict[str, Dict[str, np.ndarray]], size: int):
+        """
+        Inicializa o índice a partir das listas de rótulos já montadas.
+
+        Args:
+            postings (dict): Campo -> valor -> rótulos int64 ordenados
+            size (int): Número de chunks indexados
+        """
+        self.postings = postings
+        self.size = size
+
+    @classmethod
+    def from_chunk_store(cls, chunk_store: ChunkStore) -> "MetadataIndex":
+        """
+        Monta o índice com os metadados de todos os chunks de um store.
+
+        Args:
+            chunk_store (ChunkStore): Chunks do snapshot
+
+        Returns:
+            MetadataIndex: Índice invertido campo -> valor -> rótulos
+        """
+        labels = chunk_store.labels.tolist()
+        collected: Dict[str, Dict[str, List[int]]] = {}
+        for row, label in enumerate(labels):
+            for field, value in chunk_store.metadata_at(row).items():
+                for item in value if isinstance(value, list) else [value]:
+                    if isinstance(item, (str, int, float, bool)):
+                        collected.setdefault(field, {}).setdefault(str(item), []).append(label)
+
+        postings = {
+            field: {value: np.unique(np.asarray(found, dtype=np.int64)) for value, found in values.items()}
+            for field, values in collected.items()
+        }
+        return cls(postings, len(labels))
+
+    def fields(self) -> List[str]:
+        """Retorna os campos de metadata indexados."""
+        return list(self.postings)
+
+    def values(self, field: str) -> List[str]:
+        """Retorna os valores conhecidos de um campo."""
+        return list(self.postings.get(field, {}))
+
+    def labels_for(self, filters: Dict[str, List[str]]) -> np.ndarray:
+        """
+        Resolve um filtro nos rótulos dos chunks que o satisfazem.
+
+        Um chunk passa se, em todos os campos do filtro, algum de seus valores
+        estiver entre os aceitos (união dentro do campo, interseção entre campos).
+
+        Args:
+            filters (dict): Campo de metadata -> valores aceitos
+
+        Returns:
+            numpy.ndarray: Rótulos int64 ordenados (vazio se nenhum chunk passar)
+        """
+        selected = None
+        for field, accepted in filters.items():
+            values = self.postings.get(field, {})
+            found = [values[str(value)] for value in accepted if str(value) in values]
+            labels = np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+            selected = labels if selected is None else np.intersect1d(selected, labels, assume_unique=True)
+            if not len(selected):
+                break
+        return selected if selected is not None else np.empty(0, dtype=np.int64)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna o número de valores distintos por campo."""
+        return {field: len(values) for field, values in self.postings.items()}
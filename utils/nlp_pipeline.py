@@ -0,0 +1,53 @@
+"""
+Registro de pipelines spaCy compartilhados pelo processo.
+
+Cada modelo é carregado uma única vez e reutilizado por todos os
+TextProcessor, evitando cópias do ``pt_core_news_md`` por instância.
+"""
+
+import logging
+import os
+import threading
+
+import spacy
+
+from config import SPACY_MODEL
+
+logger = logging.getLogger(__name__)
+
+_pipelines = {}
+_lock = threading.Lock()
+
+
+def get_pipeline(model_name: str = SPACY_MODEL):
+    """
+    Obtém o pipeline spaCy compartilhado, carregando-o na primeira chamada.
+
+    Args:
+        model_name (str): Nome do modelo spaCy
+
+    Returns:
+        spacy.language.Language: Pipeline carregado
+    """
+    nlp = _pipelines.get(model_name)
+    if nlp is not None:
+        return nlp
+
+    with _lock:
+        nlp = _pipelines.get(model_name)
+        if nlp is None:
+            nlp = _load(model_name)
+            _pipelines[model_name] = nlp
+    return nlp
+
+
+def _load(model_name: str):
+    logger.info(f"Carregando modelo spaCy: {model_name}")
+    try:
+        nlp = spacy.load(model_name)
+    except OSError:
+        logger.warning(f"Modelo {model_name} não encontrado. Baixando...")
+        os.system(f"python -m spacy download {model_name}")
+        nlp = spacy.load(model_name)
+    logger.info(f"Modelo spaCy carregado com sucesso. Componentes: {', '.join(nlp.pipe_names)}")
+    return nlp
@@ -0,0 +1,161 @@
+"""
+Montagem dos prompts enviados ao Gemini.
+
+As partes estáticas (persona e diretrizes de resposta) são renderizadas uma
+única vez, na criação do PromptBuilder. A cada requisição só são montados o
+histórico, os chunks encontrados e a pergunta, respeitando um orçamento de
+tokens: quando ele estoura, saem primeiro as mensagens mais antigas do
+histórico e depois os chunks de pior colocação na busca.
+"""
+
+import logging
+import textwrap
+from typing import Any, Dict, List, Optional
+
+from config import MAX_CONTEXT_LENGTH, MAX_HISTORY_LENGTH
+from utils.token_usage import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DOCUMENTS_PREAMBLE = textwrap.dedent("""
+    VOCÊ É UM ASSISTENTE DE ALUNOS E DEVE RESPONDER ÀS PERGUNTAS **SOMENTE** BASEANDO-SE NAS "INFORMAÇÕES RELEVANTES DOS DOCUMENTOS" FORNECIDAS ABAIXO. NÃO INVENTE INFORMAÇÕES NEM USE CONHECIMENTO PRÉVIO. SE A RESPOSTA NÃO PUDER SER FORMULADA DIRETAMENTE DO CONTEXTO, INDIQUE CLARAMENTE QUE A INFORMAÇÃO NÃO FOI ENCONTRADA.
+
+    INFORMAÇÕES RELEVANTES DOS DOCUMENTOS:
+    Baseado nas seguintes informações dos nossos documentos:
+""")
+
+DOCUMENT_GUIDELINES = [
+    "Ao responder sobre abono de faltas, baseie-se estritamente nas informações dos documentos, especialmente no chunk_4_2 e chunk_5_1_1. Se o motivo da ausência não estiver explicitamente listado como justificativa para ABONO (apenas reservista ou luto), informe que o abono não é possível. Se a informação sobre 'Licença Médica' (chunk_5_1_1) for relevante para a pergunta do usuário e a duração do afastamento for de 7 dias ou mais (para graduação), forneça os detalhes sobre o 'Regime Especial de Trabalhos Domiciliares' e a necessidade de protocolar o atestado original em até 72 horas via Portal Acadêmico. Doenças simples ou \"fiquei doente\" sem atestado e sem atender aos critérios de duração de licença médica NÃO são motivos válidos para abono de faltas ou regime especial.",
+    "Se a pergunta for sobre 'Achados e Perdidos' e o contexto incluir o chunk_1_1, informe que o local para procurar e registrar itens perdidos é a Central de Atendimento ao Aluno.",
+    "Extrema importância: Responda de forma concisa e direta, extraindo a informação principal do contexto.",
+    "Mantenha um tom profissional e empático, utilizando linguagem acadêmica apropriada.",
+    "Ao citar informações que contenham links (URLs), evite repetir a URL explicitamente se ela já estiver incorporada em uma frase ou instrução no texto do documento. Em vez disso, foque em integrar a informação do link na sua explicação de forma fluida, referenciando o local ou a ação sem duplicar a URL literal.",
+    "Se as informações fornecidas não forem suficientes para uma resposta completa ou não abordarem a pergunta, use a frase EXATA: 'Peço desculpas, mas não encontrei informações detalhadas sobre isso em meus documentos. Recomendo que você procure em outros canais de comunicação oficial para obter a informação completa.'",
+    "Evite generalizações ou conselhos que não estejam explicitamente nos documentos.",
+    "Seja compreensivo e auxilie o usuário, caso ele não entenda a resposta, tente explicar de forma clara e objetiva.",
+]
+
+
+class PromptBuilder:
+    def __init__(self, persona: Dict[str, Any], max_context_tokens=MAX_CONTEXT_LENGTH,
+                 max_history=MAX_HISTORY_LENGTH):
+        """
+        Renderiza as partes estáticas do prompt.
+
+        Args:
+            persona (dict): Definição da persona (ver data/persona.py)
+            max_context_tokens (int): Orçamento de tokens para histórico e chunks
+            max_history (int): Número máximo de turnos (pergunta e resposta) do histórico
+        """
+        self.max_context_tokens = max_context_tokens
+        self.max_history = max_history
+        self.persona_instructions = self._render_persona(persona)
+        self.document_guidelines = "\nDIRETRIZES ADICIONAIS DE RESPOSTA:\n" + "\n".join(
+            f"{i}. {guideline}" for i, guideline in enumerate(DOCUMENT_GUIDELINES, start=1)
+        )
+
+    @staticmethod
+    def _render_persona(persona: Dict[str, Any]) -> str:
+        return textwrap.dedent(f"""
+            Você é {persona['nome']}, uma {persona['cargo']} de {persona['idade']}.
+
+            Suas características de personalidade são:
+            - Tom de voz: {persona['personalidade']['tom_de_voz']}
+            - Nível de formalidade: {persona['personalidade']['nivel_formalidade']}
+            - Traços principais: {', '.join(persona['personalidade']['tracos_principais'])}
+
+            Suas especialidades incluem:
+            {', '.join(persona['especialidades'])}
+
+            Diretrizes de comunicação:
+            - Usar linguagem acadêmica apropriada
+            - usar emojis
+            - Manter profissionalismo e empatia
+            - Priorizar soluções claras e objetivas
+
+            Se a pergunta envolver temas sensíveis ou restritos como {', '.join(persona['restricoes']['nao_fornecer'])},
+            você deve informar que não pode fornecer essas informações por questões de segurança e privacidade.
+
+            Se a situação exigir encaminhamento como em casos de {', '.join(persona['restricoes']['encaminhar_para_humano'])},
+            você deve sugerir o contato com o setor apropriado.
+        """)
+
+    @staticmethod
+    def render_chunk(result: Dict[str, Any]) -> str:
+        """
+        Renderiza um chunk encontrado na busca para o contexto do prompt.
+
+        Args:
+            result (dict): Resultado da busca com id, text e metadata
+
+        Returns:
+            str: Bloco de texto do chunk
+        """
+        sub_assunto = result['metadata'].get('sub_assunto', 'N/A')
+        return (
+            f"- ID: {result['id']}\n"
+            f"  Subtópico: {sub_assunto}\n"
+            f"  Texto: {result['text']}\n"
+            f"  (Fonte: {result['id']})\n\n"
+        )
+
+    def build(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None,
+              results: Optional[List[Dict[str, Any]]] = None) -> str:
+        """
+        Monta o prompt completo: persona, chunks, histórico e pergunta.
+
+        Args:
+            prompt (str): Pergunta do usuário
+            conversation_history (list): Histórico da conversa; uma última mensagem do
+                usuário é tratada como a própria pergunta e não se repete no histórico
+            results (list): Chunks encontrados, do mais para o menos relevante
+
+        Returns:
+            str: Prompt completo
+        """
+        history = list(conversation_history or [])
+        if history and history[-1]['role'] == 'user':
+            history.pop()
+        history = history[-2 * self.max_history:] if self.max_history else []
+
+        history_lines = [
+            f"{'Usuário' if message['role'] == 'user' else 'Assistente'}: {message['content']}\n"
+            for message in history
+        ]
+        chunks = [self.render_chunk(result) for result in results or []]
+
+        history_lines, chunks = self._fit_budget(history_lines, chunks)
+
+        # Partes montadas em uma lista e concatenadas uma única vez
+        parts = [self.persona_instructions, "\n\n"]
+        if chunks:
+            parts.append(DOCUMENTS_PREAMBLE)
+            parts.extend(chunks)
+            parts.append(self.document_guidelines)
+            parts.append("\n\n")
+        parts.append("Histórico da conversa:\n")
+        parts.extend(history_lines)
+        parts.append(f"\nUsuário: {prompt}\nAssistente:")
+        return "".join(parts)
+
+    def _fit_budget(self, history_lines: List[str], chunks: List[str]):
+        history_tokens = [estimate_tokens(line) for line in history_lines]
+        chunk_tokens = [estimate_tokens(chunk) for chunk in chunks]
+        total = sum(history_tokens) + sum(chunk_tokens)
+        dropped_history = dropped_chunks = 0
+
+        # Primeiro as mensagens mais antigas do histórico
+        while total > self.max_context_tokens and dropped_history < len(history_lines):
+            total -= history_tokens[dropped_history]
+            dropped_history += 1
+        # Depois os chunks de pior colocação, mantendo sempre o melhor
+        while total > self.max_context_tokens and len(chunks) - dropped_chunks > 1:
+            dropped_chunks += 1
+            total -= chunk_tokens[-dropped_chunks]
+
+        if dropped_history or dropped_chunks:
+            logger.info(
+                f"Contexto acima de {self.max_context_tokens} tokens: {dropped_history} mensagens do histórico "
+                f"e {dropped_chunks} chunks removidos (~{total} tokens)"
+            )
+        return history_lines[dropped_history:], chunks[:len(chunks) - dropped_chunks]
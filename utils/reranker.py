@@ -0,0 +1,137 @@
+"""
+Re-ranking dos candidatos da busca com um cross-encoder.
+
+A busca (FAISS/BM25) traz RERANKER_OVERFETCH vezes mais candidatos do que
+o necessário. O cross-encoder avalia cada par (pergunta, chunk) em um único
+lote, e só os RERANKER_TOP_K melhores que passam de RERANKER_MIN_SCORE vão
+para o prompt.
+
+Os scores ficam memorizados por (bucket da consulta, chunk). O bucket é a
+assinatura LSH (sinais de projeções aleatórias) do embedding da consulta,
+que já foi calculado para a busca. Assim, a mesma pergunta, ou uma quase
+idêntica, não passa de novo pelo modelo.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from sentence_transformers import CrossEncoder
+
+from config import (
+    RERANKER_MODEL, RERANKER_TOP_K, RERANKER_MIN_SCORE, RERANKER_CACHE_SIZE, RERANKER_LSH_BITS
+)
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker:
+    def __init__(self, model_name=RERANKER_MODEL, top_k=RERANKER_TOP_K, min_score=RERANKER_MIN_SCORE,
+                 cache_size=RERANKER_CACHE_SIZE, lsh_bits=RERANKER_LSH_BITS):
+        """
+        Carrega o cross-encoder.
+
+        Args:
+            model_name (str): Modelo CrossEncoder (sentence-transformers)
+            top_k (int): Máximo de chunks mantidos após o re-ranking
+            min_score (float): Score mínimo do cross-encoder para um chunk ser mantido
+            cache_size (int): Pares (bucket, chunk) com score memorizado
+            lsh_bits (int): Bits da assinatura LSH do embedding da consulta (até 62)
+        """
+        logger.info(f"Carregando cross-encoder {model_name}...")
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.model_name = model_name
+        self.top_k = top_k
+        self.min_score = min_score
+        self.lsh_bits = lsh_bits
+        self._scores = LRUCache(cache_size, ttl=None, max_bytes=None)
+        self._planes = None
+        self._planes_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._scored = 0
+        self._batches = 0
+        self._model_seconds = 0.0
+
+    def bucket(self, embedding: np.ndarray) -> int:
+        """
+        Calcula a assinatura LSH de um embedding de consulta.
+
+        Args:
+            embedding (numpy.ndarray): Embedding da consulta
+
+        Returns:
+            int: Bucket com lsh_bits bits
+        """
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        if self._planes is None:
+            with self._planes_lock:
+                if self._planes is None:
+                    rng = np.random.default_rng(0)
+                    self._planes = rng.standard_normal((self.lsh_bits, embedding.shape[0])).astype(np.float32)
+        bits = (self._planes @ embedding) > 0
+        return int(bits.astype(np.int64) @ (1 << np.arange(self.lsh_bits, dtype=np.int64)))
+
+    def rerank(self, query: str, hits: List[Dict[str, Any]], query_embedding: np.ndarray = None) -> List[Dict[str, Any]]:
+        """
+        Reordena os candidatos pelo score do cross-encoder.
+
+        Args:
+            query (str): Pergunta do usuário
+            hits (list): Candidatos da busca, com 'id' e 'text'
+            query_embedding (numpy.ndarray): Embedding da consulta; sem ele, nada é memorizado
+
+        Returns:
+            list: Até top_k candidatos com score >= min_score, do melhor para o pior,
+                  cada um com 'rerank_score'
+        """
+        if not hits:
+            return []
+
+        bucket = self.bucket(query_embedding) if query_embedding is not None else None
+        scores = [self._scores.get((bucket, hit['id'])) if bucket is not None else None for hit in hits]
+        pending = [i for i, score in enumerate(scores) if score is None]
+        if pending:
+            started = time.perf_counter()
+            predicted = self.model.predict([(query, hits[i]['text']) for i in pending],
+                                           batch_size=len(pending), show_progress_bar=False)
+            elapsed = time.perf_counter() - started
+            for i, score in zip(pending, np.asarray(predicted, dtype=np.float32).ravel().tolist()):
+                scores[i] = score
+                if bucket is not None:
+                    self._scores.put((bucket, hits[i]['id']), score)
+            with self._stats_lock:
+                self._scored += len(pending)
+                self._batches += 1
+                self._model_seconds += elapsed
+
+        ranked = sorted(
+            (dict(hit, rerank_score=score) for hit, score in zip(hits, scores)),
+            key=lambda hit: hit['rerank_score'], reverse=True
+        )
+        kept = [hit for hit in ranked if hit['rerank_score'] >= self.min_score][:self.top_k]
+        logger.info(
+            f"Re-ranking: {len(hits)} candidatos, {len(pending)} avaliados pelo modelo, {len(kept)} mantidos"
+        )
+        return kept
+
+    def clear(self):
+        """Descarta os scores memorizados (por exemplo, após recarregar o índice)."""
+        self._scores.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna métricas do modelo e do cache de scores."""
+        cache_stats = self._scores.stats()
+        with self._stats_lock:
+            return {
+                'model': self.model_name,
+                'pairs_scored': self._scored,
+                'batches': self._batches,
+                'avg_batch_ms': self._model_seconds * 1000.0 / self._batches if self._batches else 0.0,
+                'cache_hits': cache_stats['hits'],
+                'cache_misses': cache_stats['misses'],
+                'cache_hit_rate': cache_stats['hit_rate'],
+                'cache_size': cache_stats['size']
+            }
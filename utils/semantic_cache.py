@@ -0,0 +1,198 @@
+"""
+Cache semântico de respostas.
+
+Guarda o embedding normalizado de cada consulta respondida junto com a
+resposta e os IDs dos chunks usados. Uma nova consulta reaproveita a resposta
+quando a similaridade de cosseno com alguma consulta em cache passa do limiar,
+de modo que paráfrases da mesma pergunta não geram nova chamada ao Gemini.
+
+Os vetores ficam em uma matriz pré-alocada (capacity x dimensão); com poucas
+centenas ou milhares de entradas a busca exata por produto interno é mais
+barata do que manter um índice FAISS que precisa de remoções.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from config import SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    def __init__(self, capacity=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 ttl=SEMANTIC_CACHE_TTL_SECONDS):
+        """
+        Inicializa o cache semântico.
+
+        Args:
+            capacity (int): Número máximo de consultas em cache
+            threshold (float): Similaridade de cosseno mínima para reaproveitar uma resposta
+            ttl (float): Validade (s) de cada entrada; 0 ou None desativa a expiração
+        """
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._expires = np.full(capacity, np.inf)
+        self._last_used = np.zeros(capacity)
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * capacity
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        Procura a consulta em cache mais parecida com o embedding informado.
+
+        Args:
+            embedding (numpy.ndarray): Embedding da consulta (não precisa estar normalizado)
+
+        Returns:
+            dict: query, response, chunk_ids, source e similarity, ou None se nada passar do limiar
+        """
+        query = _normalize(embedding)
+        with self._lock:
+            slot, similarity = self._nearest(query, time.time())
+            if slot == -1 or similarity < self.threshold:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._last_used[slot] = time.monotonic()
+            return dict(self._entries[slot], similarity=similarity)
+
+    def put(self, query: str, embedding: np.ndarray, response: str,
+            chunk_ids: Iterable[str] = (), source: str = ""):
+        """
+        Armazena uma resposta para a consulta.
+
+        Uma consulta quase idêntica a uma já armazenada substitui a entrada
+        existente em vez de ocupar outra posição. Respostas sem nenhum chunk de
+        contexto não são armazenadas.
+
+        Args:
+            query (str): Consulta original (apenas para diagnóstico)
+            embedding (numpy.ndarray): Embedding da consulta
+            response (str): Resposta gerada
+            chunk_ids (iterable): IDs dos chunks usados no contexto da resposta
+            source (str): Origem da resposta (json+gemini, json+gemini+keywords)
+        """
+        chunk_ids = tuple(chunk_ids)
+        if not chunk_ids:
+            logger.debug(f"Resposta sem contexto dos documentos não entra no cache semântico: '{query}'")
+            return
+        vector = _normalize(embedding)
+        now = time.time()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, len(vector)), dtype='float32')
+
+            slot, similarity = self._nearest(vector, now)
+            if slot == -1 or similarity < 0.99:
+                slot = self._free_slot(now)
+
+            self._vectors[slot] = vector
+            self._valid[slot] = True
+            self._expires[slot] = now + self.ttl if self.ttl else np.inf
+            self._last_used[slot] = time.monotonic()
+            self._entries[slot] = {
+                'query': query,
+                'response': response,
+                'chunk_ids': chunk_ids,
+                'source': source
+            }
+
+    def invalidate_chunks(self, chunk_ids: Iterable[str], include_ungrounded: bool = False) -> int:
+        """
+        Remove as respostas que usaram algum dos chunks informados.
+
+        Args:
+            chunk_ids (iterable): IDs de chunks alterados ou removidos
+            include_ungrounded (bool): Também remove respostas geradas sem nenhum chunk,
+                que podem passar a ter contexto após a mudança dos documentos
+
+        Returns:
+            int: Número de entradas removidas
+        """
+        chunk_ids = set(chunk_ids)
+        removed = 0
+        with self._lock:
+            for slot in np.flatnonzero(self._valid):
+                used = self._entries[slot]['chunk_ids']
+                if chunk_ids.intersection(used) or (include_ungrounded and not used):
+                    self._drop(slot)
+                    removed += 1
+        return removed
+
+    def clear(self):
+        """Limpa todo o cache."""
+        with self._lock:
+            for slot in np.flatnonzero(self._valid):
+                self._drop(slot)
+
+    def __len__(self):
+        """Retorna o número de itens no cache."""
+        return int(self._valid.sum())
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna métricas de uso do cache.
+
+        Returns:
+            dict: hits, misses, taxa de acerto, evicções, tamanho, capacidade e limiar
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'size': int(self._valid.sum()),
+                'capacity': self.capacity,
+                'threshold': self.threshold
+            }
+
+    def _nearest(self, query: np.ndarray, now: float):
+        # Deve ser chamado com o lock adquirido
+        if self._vectors is None:
+            return -1, 0.0
+        self._expire(now)
+        if not self._valid.any():
+            return -1, 0.0
+        similarities = self._vectors @ query
+        similarities[~self._valid] = -np.inf
+        slot = int(np.argmax(similarities))
+        return slot, float(similarities[slot])
+
+    def _expire(self, now: float):
+        for slot in np.flatnonzero(self._valid & (self._expires <= now)):
+            self._drop(slot)
+
+    def _free_slot(self, now: float) -> int:
+        free = np.flatnonzero(~self._valid)
+        if len(free):
+            return int(free[0])
+        # cache cheio: descarta a entrada usada há mais tempo
+        slot = int(np.argmin(self._last_used))
+        self._drop(slot)
+        self._evictions += 1
+        return slot
+
+    def _drop(self, slot: int):
+        self._valid[slot] = False
+        self._entries[slot] = None
+        self._last_used[slot] = 0.0
+
+
+def _normalize(embedding: np.ndarray) -> np.ndarray:
+    vector = np.asarray(embedding, dtype='float32').ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
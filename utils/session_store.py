@@ -0,0 +1,354 @@
+"""
+Histórico das conversas por sessão.
+
+Cada sessão guarda apenas o que o prompt usa (papel e conteúdo das
+mensagens), limitada em número de mensagens e em caracteres. Sessões
+inativas por mais de SESSION_IDLE_TTL_SECONDS são descartadas e, acima de
+SESSION_MAX_SESSIONS, sai a sessão usada há mais tempo.
+
+Implementações: MemorySessionStore (memória do processo) e
+SQLiteSessionStore (arquivo local compartilhado entre os workers). Use
+create_session_store() para obter a configurada em config.SESSION_BACKEND.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Dict, List
+
+from config import (
+    SESSION_BACKEND, SESSION_SQLITE_PATH, SESSION_MAX_SESSIONS, SESSION_IDLE_TTL_SECONDS,
+    SESSION_MAX_MESSAGES, SESSION_MAX_CHARS
+)
+
+logger = logging.getLogger(__name__)
+
+# IDs de sessão vêm do navegador; limita o tamanho para não virar vetor de abuso de memória
+MAX_SESSION_ID_LENGTH = 128
+# Mensagens gravadas no SQLite entre duas remoções de sessões expiradas e excedentes
+SESSION_EVICT_INTERVAL = 100
+
+
+class SessionStore(ABC):
+    """Interface comum dos armazenamentos de sessão."""
+
+    @abstractmethod
+    def append(self, session_id: str, role: str, content: str):
+        ...
+
+    @abstractmethod
+    def history(self, session_id: str) -> List[Dict[str, str]]:
+        ...
+
+    @abstractmethod
+    def clear(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def __len__(self):
+        ...
+
+
+def _session_key(session_id) -> str:
+    # Sem truncar: dois IDs com o mesmo prefixo dividiriam o histórico
+    session_id = str(session_id)
+    if len(session_id) > MAX_SESSION_ID_LENGTH:
+        raise ValueError(f"ID de sessão maior que {MAX_SESSION_ID_LENGTH} caracteres")
+    return session_id
+
+
+class _Session:
+    __slots__ = ('messages', 'chars', 'last_seen')
+
+    def __init__(self):
+        self.messages = deque()  # tuplas (papel, conteúdo)
+        self.chars = 0
+        self.last_seen = time.monotonic()
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, max_sessions=SESSION_MAX_SESSIONS, idle_ttl=SESSION_IDLE_TTL_SECONDS,
+                 max_messages=SESSION_MAX_MESSAGES, max_chars=SESSION_MAX_CHARS):
+        """
+        Inicializa o armazenamento em memória.
+
+        Args:
+            max_sessions (int): Número máximo de sessões mantidas
+            idle_ttl (float): Tempo (s) sem mensagens até a sessão ser descartada
+            max_messages (int): Mensagens mantidas por sessão
+            max_chars (int): Caracteres mantidos por sessão
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._evicted = 0
+
+    def append(self, session_id: str, role: str, content: str):
+        """
+        Acrescenta uma mensagem ao histórico da sessão.
+
+        Args:
+            session_id (str): Identificador da sessão
+            role (str): 'user' ou 'assistant'
+            content (str): Texto da mensagem
+        """
+        session_id = _session_key(session_id)
+        content = content[-self.max_chars:]
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session()
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_seen = now
+            session.messages.append((role, content))
+            session.chars += len(content)
+            while len(session.messages) > self.max_messages or session.chars > self.max_chars:
+                _, removed = session.messages.popleft()
+                session.chars -= len(removed)
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._evicted += 1
+
+    def history(self, session_id: str) -> List[Dict[str, str]]:
+        """
+        Retorna uma cópia do histórico da sessão.
+
+        Args:
+            session_id (str): Identificador da sessão
+
+        Returns:
+            list: Mensagens {'role', 'content'}, da mais antiga para a mais recente
+        """
+        session_id = _session_key(session_id)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            if time.monotonic() - session.last_seen > self.idle_ttl:
+                del self._sessions[session_id]
+                self._evicted += 1
+                return []
+            return [{'role': role, 'content': content} for role, content in session.messages]
+
+    def clear(self, session_id: str):
+        """Remove o histórico da sessão."""
+        with self._lock:
+            self._sessions.pop(_session_key(session_id), None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retorna métricas do armazenamento.
+
+        Returns:
+            dict: sessões ativas, mensagens, caracteres e sessões descartadas
+        """
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'sessions': len(self._sessions),
+                'messages': sum(len(s.messages) for s in self._sessions.values()),
+                'chars': sum(s.chars for s in self._sessions.values()),
+                'evicted': self._evicted,
+                'max_sessions': self.max_sessions
+            }
+
+    def _expire(self, now: float):
+        # Deve ser chamado com o lock adquirido; as sessões estão em ordem de uso
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen <= self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            self._evicted += 1
+
+    def __len__(self):
+        """Retorna o número de sessões ativas."""
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    def __init__(self, path=SESSION_SQLITE_PATH, max_sessions=SESSION_MAX_SESSIONS,
+                 idle_ttl=SESSION_IDLE_TTL_SECONDS, max_messages=SESSION_MAX_MESSAGES,
+                 max_chars=SESSION_MAX_CHARS):
+        """
+        Inicializa o armazenamento em SQLite, compartilhado pelos processos da mesma máquina
+        e preservado entre reinícios.
+
+        Args:
+            path (str): Arquivo do banco
+            max_sessions (int): Número máximo de sessões mantidas
+            idle_ttl (float): Tempo (s) sem mensagens até a sessão ser descartada
+            max_messages (int): Mensagens mantidas por sessão
+            max_chars (int): Caracteres mantidos por sessão
+        """
+        self.path = path
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._appends = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL,"
+                " role TEXT NOT NULL, content TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, last_seen REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+
+    def _connection(self):
+        # sqlite3 não permite compartilhar conexões entre threads nem entre processos após fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, session_id: str, role: str, content: str):
+        """
+        Acrescenta uma mensagem ao histórico da sessão.
+
+        Args:
+            session_id (str): Identificador da sessão
+            role (str): 'user' ou 'assistant'
+            content (str): Texto da mensagem
+        """
+        session_id = _session_key(session_id)
+        content = content[-self.max_chars:]
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (session_id, last_seen) VALUES (?, ?)", (session_id, now))
+            conn.execute("INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+                         (session_id, role, content))
+
+            # mantém as mensagens mais recentes dentro dos limites de quantidade e de caracteres
+            rows = conn.execute(
+                "SELECT id, LENGTH(content) FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, self.max_messages + 1)
+            ).fetchall()
+            kept_chars, cutoff = 0, None
+            for position, (message_id, length) in enumerate(rows):
+                kept_chars += length
+                if position >= self.max_messages or kept_chars > self.max_chars:
+                    cutoff = message_id
+                    break
+            if cutoff is not None:
+                conn.execute("DELETE FROM messages WHERE session_id = ? AND id <= ?", (session_id, cutoff))
+
+            # Sessões expiradas e excedentes saem a cada SESSION_EVICT_INTERVAL mensagens deste processo
+            with self._lock:
+                self._appends += 1
+                evict = self._appends % SESSION_EVICT_INTERVAL == 0
+            if evict:
+                self._evict(conn, now)
+
+    def _evict(self, conn, now: float):
+        expired = conn.execute(
+            "SELECT session_id FROM sessions WHERE last_seen < ?", (now - self.idle_ttl,)
+        ).fetchall()
+        (sessions,) = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        if sessions - len(expired) > self.max_sessions:
+            expired += conn.execute(
+                "SELECT session_id FROM sessions WHERE last_seen >= ? ORDER BY last_seen ASC LIMIT ?",
+                (now - self.idle_ttl, sessions - len(expired) - self.max_sessions)
+            ).fetchall()
+        if expired:
+            conn.executemany("DELETE FROM messages WHERE session_id = ?", expired)
+            conn.executemany("DELETE FROM sessions WHERE session_id = ?", expired)
+
+    def history(self, session_id: str) -> List[Dict[str, str]]:
+        """
+        Retorna o histórico da sessão.
+
+        Args:
+            session_id (str): Identificador da sessão
+
+        Returns:
+            list: Mensagens {'role', 'content'}, da mais antiga para a mais recente
+        """
+        session_id = _session_key(session_id)
+        conn = self._connection()
+        row = conn.execute("SELECT last_seen FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return []
+        if time.time() - row[0] > self.idle_ttl:
+            self.clear(session_id)
+            return []
+        rows = conn.execute(
+            "SELECT role, content FROM messages WHERE session_id = ? ORDER BY id", (session_id,)
+        ).fetchall()
+        return [{'role': role, 'content': content} for role, content in rows]
+
+    def clear(self, session_id: str):
+        """Remove o histórico da sessão."""
+        session_id = _session_key(session_id)
+        with self._connection() as conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retorna métricas do armazenamento.
+
+        Returns:
+            dict: sessões, mensagens e caracteres armazenados
+        """
+        conn = self._connection()
+        sessions = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        messages, chars = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(content)), 0) FROM messages"
+        ).fetchone()
+        return {
+            'backend': 'sqlite',
+            'sessions': sessions,
+            'messages': messages,
+            'chars': chars,
+            'max_sessions': self.max_sessions
+        }
+
+    def __len__(self):
+        """Retorna o número de sessões armazenadas."""
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_session_store(backend=SESSION_BACKEND):
+    """
+    Cria o armazenamento de sessões configurado.
+
+    Args:
+        backend (str): "memory" (por processo) ou "sqlite" (compartilhado entre workers)
+
+    Returns:
+        SessionStore: Instância do armazenamento
+    """
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        logger.info(f"Usando histórico de sessões compartilhado em {SESSION_SQLITE_PATH}")
+        return SQLiteSessionStore()
+    raise ValueError(f"Backend de sessões desconhecido: {backend}. Opções: memory, sqlite")
@@ -0,0 +1,179 @@
+"""
+Inicialização em segundo plano dos componentes pesados do app.
+
+Modelos (SentenceTransformer, spaCy, cross-encoder), o índice FAISS e o
+cliente do Gemini são carregados em paralelo, em threads, enquanto o
+servidor já atende a página inicial, os arquivos estáticos e as sondas
+/healthz e /readyz. Cada etapa registra seu estado e tempo de carga;
+quando todas as obrigatórias terminam, os callbacks de on_ready recebem os
+componentes carregados. Se uma etapa obrigatória falha, a inicialização
+termina em falha: quem espera é liberado na hora e o app não fica pronto.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from config import STARTUP_WORKERS
+
+logger = logging.getLogger(__name__)
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+
+class _Stage:
+    __slots__ = ('name', 'loader', 'required', 'state', 'seconds', 'error', 'component')
+
+    def __init__(self, name, loader, required):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.state = PENDING
+        self.seconds = None
+        self.error = None
+        self.component = None
+
+
+class StartupManager:
+    def __init__(self, max_workers=STARTUP_WORKERS):
+        """
+        Inicializa o gerenciador sem iniciar nenhuma carga.
+
+        Args:
+            max_workers (int): Etapas carregadas ao mesmo tempo
+        """
+        self.max_workers = max_workers
+        self._stages: Dict[str, _Stage] = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        # Liberado ao ficar pronto ou ao falhar uma etapa obrigatória
+        self._done = threading.Event()
+        self._failed = False
+        self._started_at = None
+        self._finished_at = None
+
+    def add(self, name: str, loader: Callable[[], Any], required: bool = True):
+        """
+        Registra uma etapa de carga.
+
+        Args:
+            name (str): Nome do componente (usado em /readyz e em on_ready)
+            loader (callable): Função sem argumentos que cria o componente
+            required (bool): Se o app só fica pronto depois desta etapa
+        """
+        self._stages[name] = _Stage(name, loader, required)
+
+    def on_ready(self, callback: Callable[[Dict[str, Any]], None]):
+        """
+        Registra uma função chamada uma vez, quando todas as etapas obrigatórias terminam.
+
+        Args:
+            callback (callable): Recebe o dicionário nome -> componente carregado
+        """
+        self._callbacks.append(callback)
+
+    def start(self):
+        """Inicia a carga de todas as etapas em threads de segundo plano."""
+        self._started_at = time.perf_counter()
+        logger.info(f"Carregando {len(self._stages)} componentes em segundo plano: {', '.join(self._stages)}")
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="startup")
+        for stage in self._stages.values():
+            executor.submit(self._load, stage)
+        executor.shutdown(wait=False)
+        if not self._stages:
+            self._finish()
+
+    def _load(self, stage: _Stage):
+        stage.state = LOADING
+        started = time.perf_counter()
+        try:
+            stage.component = stage.loader()
+            stage.state = READY
+        except Exception as e:
+            stage.error = str(e)
+            stage.state = FAILED
+            logger.error(f"Falha ao carregar '{stage.name}': {e}", exc_info=True)
+        stage.seconds = time.perf_counter() - started
+        if stage.state == READY:
+            logger.info(f"Componente '{stage.name}' carregado em {stage.seconds:.2f}s")
+
+        with self._lock:
+            if stage.state == FAILED and stage.required and not self._failed:
+                self._failed = True
+                self._finished_at = time.perf_counter()
+                logger.error(f"Inicialização falhou: componente obrigatório '{stage.name}' não carregou")
+                self._done.set()
+                return
+            done = all(s.state in (READY, FAILED) for s in self._stages.values())
+            required_ready = all(s.state == READY for s in self._stages.values() if s.required)
+            if not done or not required_ready or self._finished_at is not None:
+                return
+            self._finished_at = time.perf_counter()
+        self._finish()
+
+    def _finish(self):
+        components = {name: stage.component for name, stage in self._stages.items() if stage.state == READY}
+        for callback in self._callbacks:
+            try:
+                callback(components)
+            except Exception as e:
+                logger.error(f"Erro em callback de inicialização: {e}", exc_info=True)
+        self._ready.set()
+        self._done.set()
+        total = (self._finished_at or time.perf_counter()) - self._started_at
+        logger.info(f"Inicialização concluída em {total:.2f}s")
+
+    @property
+    def ready(self) -> bool:
+        """Indica se todas as etapas obrigatórias terminaram e os callbacks rodaram."""
+        return self._ready.is_set()
+
+    @property
+    def failed(self) -> bool:
+        """Indica se alguma etapa obrigatória falhou (o app não ficará pronto)."""
+        return self._failed
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Bloqueia até o app ficar pronto ou a inicialização falhar.
+
+        Args:
+            timeout (float): Tempo máximo de espera (s); None espera indefinidamente
+
+        Returns:
+            bool: True se o app ficou pronto
+        """
+        self._done.wait(timeout)
+        return self.ready
+
+    async def wait_async(self, timeout: float, interval: float = 0.1) -> bool:
+        """Versão assíncrona de wait, que não ocupa threads enquanto espera."""
+        deadline = time.monotonic() + timeout
+        while not self._done.is_set() and time.monotonic() < deadline:
+            await asyncio.sleep(interval)
+        return self.ready
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Retorna o estado de cada etapa, para /readyz e /api/metrics.
+
+        Returns:
+            dict: 'ready', 'failed' e, por componente, estado, obrigatoriedade, tempo de carga (s) e erro
+        """
+        return {
+            'ready': self.ready,
+            'failed': self.failed,
+            'components': {
+                name: {
+                    'state': stage.state,
+                    'required': stage.required,
+                    'seconds': round(stage.seconds, 3) if stage.seconds is not None else None,
+                    'error': stage.error
+                }
+                for name, stage in self._stages.items()
+            }
+        }
@@ -0,0 +1,139 @@
+"""
+Contabilidade de tokens das chamadas ao Gemini.
+
+Usa o ``usage_metadata`` que já vem na resposta de ``generate_content``;
+quando ele não está disponível, estima pelo tamanho do texto (cerca de 4
+caracteres por token), sem chamadas extras à API.
+
+A versão fixada em requirements.txt (google-generativeai 0.3.2) ainda não
+retorna ``usage_metadata``, então com ela todas as contagens são
+estimativas; ``stats()`` informa o método em 'counting'.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+from config import TOKEN_USAGE_RECENT
+
+logger = logging.getLogger(__name__)
+
+# Média de caracteres por token usada na estimativa local
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima o número de tokens de um texto.
+
+    Args:
+        text (str): Texto a ser estimado
+
+    Returns:
+        int: Número aproximado de tokens
+    """
+    if not text:
+        return 0
+    return max(1, round(len(text) / CHARS_PER_TOKEN))
+
+
+class TokenUsageTracker:
+    def __init__(self, recent=TOKEN_USAGE_RECENT):
+        """
+        Inicializa os contadores.
+
+        Args:
+            recent (int): Quantidade de requisições recentes mantidas individualmente
+        """
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=recent)
+        self._totals = self._empty()
+        self._by_source: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def _empty():
+        return {'requests': 0, 'prompt_tokens': 0, 'output_tokens': 0, 'total_tokens': 0, 'estimated': 0}
+
+    def record_response(self, source: str, response, prompt: str, output: str) -> Dict[str, Any]:
+        """
+        Registra o uso de uma geração a partir da resposta da API.
+
+        Args:
+            source (str): Origem da resposta (json+gemini, gemini, ...)
+            response: Resposta do generate_content (pode ser None)
+            prompt (str): Prompt enviado, usado se não houver usage_metadata
+            output (str): Texto gerado, usado se não houver usage_metadata
+
+        Returns:
+            dict: Uso registrado para esta requisição
+        """
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+        output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+        if prompt_tokens:
+            return self.record(source, prompt_tokens, output_tokens)
+        return self.record(source, estimate_tokens(prompt), estimate_tokens(output), estimated=True)
+
+    def record(self, source: str, prompt_tokens: int, output_tokens: int, estimated: bool = False) -> Dict[str, Any]:
+        """
+        Registra o uso de tokens de uma requisição.
+
+        Args:
+            source (str): Origem da resposta
+            prompt_tokens (int): Tokens do prompt
+            output_tokens (int): Tokens gerados
+            estimated (bool): Se os valores são estimativas locais
+
+        Returns:
+            dict: Uso registrado para esta requisição
+        """
+        entry = {
+            'timestamp': time.time(),
+            'source': source,
+            'prompt_tokens': int(prompt_tokens),
+            'output_tokens': int(output_tokens),
+            'total_tokens': int(prompt_tokens) + int(output_tokens),
+            'estimated': estimated
+        }
+        with self._lock:
+            self._recent.append(entry)
+            for counters in (self._totals, self._by_source.setdefault(source, self._empty())):
+                counters['requests'] += 1
+                counters['prompt_tokens'] += entry['prompt_tokens']
+                counters['output_tokens'] += entry['output_tokens']
+                counters['total_tokens'] += entry['total_tokens']
+                counters['estimated'] += estimated
+
+        logger.info(
+            f"Tokens ({source}): prompt={entry['prompt_tokens']}, saída={entry['output_tokens']}"
+            f"{' (estimado)' if estimated else ''}"
+        )
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna os contadores agregados, por origem e das requisições recentes.
+
+        Returns:
+            dict: 'counting' ("api", "estimated" ou "mixed", conforme a origem das
+                  contagens; None sem requisições), 'chars_per_token' da estimativa, 'totals', 'by_source' e 'recent'
+        """
+        with self._lock:
+            estimated, requests = self._totals['estimated'], self._totals['requests']
+            if requests == 0:
+                counting = None
+            elif estimated == 0:
+                counting = 'api'
+            elif estimated == requests:
+                counting = 'estimated'
+            else:
+                counting = 'mixed'
+            return {
+                'counting': counting,
+                'chars_per_token': CHARS_PER_TOKEN,
+                'totals': dict(self._totals),
+                'by_source': {source: dict(counters) for source, counters in self._by_source.items()},
+                'recent': list(self._recent)
+            }